@@ -15,5 +15,62 @@ class Settings(BaseSettings):
     REDIS_URL: str = "redis://localhost:6379"
     AI_RATE_LIMIT_PER_DAY: int = 5
     FRONTEND_URL: str = "http://localhost:3000"
+    GC_INTERVAL_SECONDS: float = 30.0
+    GC_BATCH_SIZE: int = 500
+    IMPORT_BATCH_SIZE: int = 5000
+    IMPORT_MAX_NODES: int = 200000
+    SNAPSHOT_COMPACT_INTERVAL_SECONDS: float = 60.0
+    SNAPSHOT_COMPACT_MIN_CHANGES: int = 200
+    SNAPSHOT_COMPACT_BATCH: int = 20
+    SNAPSHOT_MAX_DELTA: int = 2000
+    # Verified-token cache in auth; entries never outlive the token's exp
+    JWT_CACHE_ENABLED: bool = True
+    JWT_CACHE_SIZE: int = 10000
+    JWT_CACHE_TTL_SECONDS: float = 300.0
+    # Mindmap access decisions: short-lived in process, longer in Redis (invalidated explicitly)
+    ACCESS_CACHE_SIZE: int = 10000
+    ACCESS_CACHE_LOCAL_TTL_SECONDS: float = 5.0
+    ACCESS_CACHE_TTL_SECONDS: float = 60.0
+    # After an invalidation, roles read by requests already in flight are not cached for this long
+    ACCESS_CACHE_REVOKE_GUARD_SECONDS: float = 10.0
+    # Serialize node-heavy responses with orjson instead of Pydantic (needs orjson installed)
+    FAST_JSON_RESPONSES: bool = True
+    # Realtime fan-out: delay before the Redis subscriber reconnects
+    REALTIME_RETRY_SECONDS: float = 5.0
+    # Live dragging: how often coalesced positions are broadcast / written, and the batch cap per message
+    DRAG_BROADCAST_INTERVAL_SECONDS: float = 0.05
+    DRAG_PERSIST_INTERVAL_SECONDS: float = 0.25
+    DRAG_MAX_POSITIONS: int = 500
+    # A map's drag is over after this long without positions; its moves are then logged (one version bump)
+    DRAG_SETTLE_SECONDS: float = 1.0
+    # Presence (selected node / cursor per socket): delta broadcast interval, and how long sessions outlive their last heartbeat
+    PRESENCE_BROADCAST_INTERVAL_SECONDS: float = 0.1
+    PRESENCE_TTL_SECONDS: int = 30
+    # Full mindmap payloads (GET /mindmaps/{id}) per (map, version): LRU in process, then Redis
+    MINDMAP_CACHE_ENABLED: bool = True
+    MINDMAP_CACHE_SIZE: int = 32
+    MINDMAP_CACHE_LOCAL_TTL_SECONDS: float = 60.0
+    MINDMAP_CACHE_TTL_SECONDS: int = 600
+    MINDMAP_CACHE_MAX_ENTRY_BYTES: int = 8 * 1024 * 1024
+    # A miss waits up to this long for another process already rebuilding the same version
+    MINDMAP_CACHE_WAIT_SECONDS: float = 2.0
+    MINDMAP_CACHE_LOCK_TTL_SECONDS: float = 10.0
+    # Write-behind votes (see services/vote_buffer.py): buffered in Redis, flushed to `votes` in batches
+    VOTE_WRITE_BEHIND: bool = False
+    VOTE_FLUSH_INTERVAL_SECONDS: float = 0.25
+    VOTE_FLUSH_BATCH: int = 1000
+    VOTE_FLUSH_LOCK_SECONDS: float = 10.0
+    # Popular-node rankings (Redis sorted sets, see services/popularity.py) are rebuilt from the database at least this often
+    POPULAR_RANKING_TTL_SECONDS: int = 3600
+    # Response compression (see middleware/compression.py): smallest body compressed, and per-encoding levels
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    # Precompressed bodies of versioned responses (strong ETag) kept in process
+    COMPRESSION_CACHE_SIZE: int = 128
+    COMPRESSION_CACHE_TTL_SECONDS: int = 600
+    COMPRESSION_CACHE_MAX_ENTRY_BYTES: int = 4 * 1024 * 1024
 
 settings = Settings()
\ No newline at end of file
@@ -7,7 +7,9 @@ engine = create_engine(
     settings.DIRECT_URL,
     echo=True,               # log SQL to stdout (dev only)
     future=True,              # use SQLAlchemy 2.0 style
-    pool_pre_ping=True
+    pool_pre_ping=True,
+    # psycopg2: send executemany UPDATEs (e.g. bulk layout writes) in pages, not row by row
+    **({"executemany_mode": "values_plus_batch"} if settings.DIRECT_URL.startswith("postgresql") else {})
 )
 
 # 2. Create a session factory (When called, returns a new SQLAlchemy ORM Session bound to our engine)
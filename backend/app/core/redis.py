@@ -0,0 +1,36 @@
+import redis
+from .config import settings
+
+# Shared Redis client (Upstash requires TLS)
+# Use lazy connection to avoid blocking on startup. Every caller must fail open:
+# Redis is an accelerator here, never the source of truth.
+redis_client = redis.from_url(
+    settings.REDIS_URL,
+    decode_responses=True,
+    ssl_cert_reqs=None,  # Required for Upstash
+    socket_connect_timeout=5,
+    socket_timeout=5
+)
+
+# Same server, raw bytes in and out: for cached response bodies (MessagePack isn't UTF-8)
+redis_bytes_client = redis.from_url(
+    settings.REDIS_URL,
+    ssl_cert_reqs=None,
+    socket_connect_timeout=5,
+    socket_timeout=5
+)
+
+# Deletes a lock only while it still holds the owner's token, as one atomic step: with a
+# GET then DELETE, a lock that expired in between and was taken by another process
+# would be deleted from under it
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def release_lock(client: redis.Redis, key: str, token: str) -> bool:
+    """Release lock `key` taken with SET NX by the holder of `token`; False if it no longer held it."""
+    return bool(client.eval(RELEASE_LOCK_SCRIPT, 1, key, token))
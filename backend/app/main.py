@@ -2,18 +2,26 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+import asyncio
 import uvicorn
 import os
 from datetime import datetime, timezone
 from app.routers import collaborators
 
 # Import routers
-from .routers import mindmaps, nodes, votes
+from .routers import mindmaps, nodes, votes, outlines, realtime, batch
 
 # Import database
 from .core.database import engine, Base
 from .core.config import settings
+from .middleware.compression import CompressionMiddleware
+from .services.garbage_collector import run_garbage_collector
+from .services.snapshots import run_snapshot_compactor
+from .services.drag import run_drag_flusher
+from .services.presence import run_presence_flusher, run_presence_listener
+from .services.realtime import run_event_publisher, run_realtime_listener
+from .services.vote_buffer import run_vote_flusher
 
 
 # Create tables on startup
@@ -21,9 +29,23 @@ from .core.config import settings
 async def lifespan(app: FastAPI):
     # Startup
     Base.metadata.create_all(bind=engine)
+    background_tasks = [
+        asyncio.create_task(run_garbage_collector()),
+        asyncio.create_task(run_snapshot_compactor()),
+        asyncio.create_task(run_event_publisher()),
+        asyncio.create_task(run_realtime_listener()),
+        asyncio.create_task(run_drag_flusher()),
+        asyncio.create_task(run_presence_flusher()),
+        asyncio.create_task(run_presence_listener()),
+        asyncio.create_task(run_vote_flusher()),
+    ]
     yield
     # Shutdown
-    pass
+    for task in background_tasks:
+        task.cancel()
+    for task in background_tasks:
+        with suppress(asyncio.CancelledError):
+            await task
 
 
 # Initialize FastAPI app
@@ -47,6 +69,11 @@ app.add_middleware(
 )
 
 
+# Compress large JSON / MessagePack responses (outermost, so it sees the final body)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+
 # Global error handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -78,6 +105,9 @@ async def internal_server_error_handler(request: Request, exc: Exception):
 app.include_router(mindmaps.router)
 app.include_router(nodes.router)
 app.include_router(votes.router)
+app.include_router(outlines.router)
+app.include_router(realtime.router)
+app.include_router(batch.router)
 
 app.include_router(collaborators.router)
 
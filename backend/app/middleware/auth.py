@@ -1,4 +1,7 @@
 # middleware/auth.py
+import hashlib
+from typing import Optional, Set
+from uuid import UUID
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt
@@ -7,14 +10,110 @@ from sqlalchemy.orm import Session
 
 from ..core.database import get_db
 from ..core.config import settings
+from ..core.redis import redis_client
 from ..models import User
+from ..utils.bulk import dialect_insert
+from ..utils.cache import TTLCache
 
 security = HTTPBearer()
 
+# Redis set of user ids that already have a User row
+KNOWN_USERS_KEY = "known_users"
+
 
 class AuthMiddleware:
     def __init__(self) -> None:
         self.supabase_jwt_secret: str = settings.SUPABASE_JWT_SECRET
+        # Verified payloads keyed by token digest, so a client's repeated token
+        # skips HS256 verification; disabled with JWT_CACHE_ENABLED=false
+        self.token_cache: Optional[TTLCache] = (
+            TTLCache(settings.JWT_CACHE_SIZE, settings.JWT_CACHE_TTL_SECONDS)
+            if settings.JWT_CACHE_ENABLED else None
+        )
+        # Ids of users whose row is known to exist (process-local copy of a Redis set)
+        self.known_users: Set[str] = set()
+
+    def is_known_user(self, user_id: str) -> bool:
+        if user_id in self.known_users:
+            return True
+        try:
+            known = bool(redis_client.sismember(KNOWN_USERS_KEY, user_id))
+        except Exception:
+            # If Redis is unavailable, fall back to the database (fail open)
+            return False
+        if known:
+            self.known_users.add(user_id)
+        return known
+
+    def provision_user(self, db: Session, user_id: str, payload: dict) -> None:
+        """Create the User row for a token's subject unless it is known to exist."""
+        if self.is_known_user(user_id):
+            return
+
+        email = payload.get("email") or ""
+        meta = payload.get("user_metadata") or {}
+        base_username = (
+            meta.get("username")
+            or meta.get("full_name")
+            or email
+            or user_id
+        )
+
+        # Ensure username is unique by appending suffix if needed
+        username = base_username
+        existing = db.query(User.id).filter(
+            User.username == username,
+            User.id != UUID(user_id)
+        ).first()
+        if existing:
+            # Append short unique suffix from user_id
+            username = f"{base_username} ({user_id[:8]})"
+
+        # Create new user with Supabase user_id as primary key; a row that
+        # already exists (or is created concurrently) is left untouched
+        db.execute(
+            dialect_insert(db, User.__table__).values(
+                id=UUID(user_id),
+                email=email,
+                username=username,
+                hashed_password="supabase-oauth",
+            ).on_conflict_do_nothing(index_elements=["id"])
+        )
+        db.commit()
+
+        self.known_users.add(user_id)
+        try:
+            redis_client.sadd(KNOWN_USERS_KEY, user_id)
+        except Exception:
+            pass
+
+    def verify_token(self, encoded_token: str) -> dict:
+        """
+        Decode and verify a Supabase JWT, returning its payload.
+        Raises JWTError / ExpiredSignatureError for invalid tokens.
+        """
+        cache_key = None
+        if self.token_cache is not None:
+            cache_key = hashlib.sha256(encoded_token.encode("utf-8")).digest()
+            payload = self.token_cache.get(cache_key)
+            if payload is not None:
+                return payload
+
+        payload = jwt.decode(
+            encoded_token,
+            self.supabase_jwt_secret,
+            algorithms=["HS256"],
+            audience="authenticated",
+            options={
+                "verify_iat": False,
+            },
+        )
+
+        # Only tokens with an expiry are cached, and never past it
+        if cache_key is not None and isinstance(payload.get("exp"), (int, float)):
+            self.token_cache.set(cache_key, payload, expires_at=payload["exp"])
+
+        return payload
 
     async def get_current_user(
         self,
@@ -23,20 +122,13 @@ class AuthMiddleware:
     ) -> str:
         """
         Verify Supabase JWT token and return user_id.
-        Auto-provision a User row on first login so collaborators/mindmaps work.
+        Auto-provision a User row on first login so collaborators/mindmaps work;
+        users already seen cost no database query here.
         """
         try:
             encoded_token = token.credentials
 
-            payload = jwt.decode(
-                encoded_token,
-                self.supabase_jwt_secret,
-                algorithms=["HS256"],
-                audience="authenticated",
-                options={
-                    "verify_iat": False,
-                },
-            )
+            payload = self.verify_token(encoded_token)
 
             user_id = payload.get("sub")
             if not isinstance(user_id, str) or not user_id:
@@ -45,37 +137,9 @@ class AuthMiddleware:
                     detail="Invalid token: no user ID found",
                 )
 
-            user = db.query(User).filter(User.id == user_id).first()
-
-            if not user:
-                email = payload.get("email") or ""
-                meta = payload.get("user_metadata") or {}
-                base_username = (
-                    meta.get("username")
-                    or meta.get("full_name")
-                    or email
-                    or user_id
-                )
-
-                # Ensure username is unique by appending suffix if needed
-                username = base_username
-                existing = db.query(User).filter(User.username == username).first()
-                if existing:
-                    # Append short unique suffix from user_id
-                    username = f"{base_username} ({user_id[:8]})"
-
-                # Create new user with Supabase user_id as primary key
-                user = User(
-                    id=user_id,
-                    email=email,
-                    username=username,
-                    hashed_password="supabase-oauth",
-                )
-                db.add(user)
-                db.commit()
-                db.refresh(user)
-
-            return str(user.id)
+            user_id = str(UUID(user_id))
+            self.provision_user(db, user_id, payload)
+            return user_id
 
         except ExpiredSignatureError:
             raise HTTPException(
@@ -109,7 +173,8 @@ async def get_current_user(
     db: Session = Depends(get_db),
 ) -> User:
     user_id = await auth.get_current_user(token, db)
-    user = db.query(User).filter(User.id == user_id).first()
+    # Primary-key lookup: the only User query on the request
+    user = db.get(User, UUID(user_id))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
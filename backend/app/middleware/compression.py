@@ -0,0 +1,215 @@
+# middleware/compression.py
+# Response compression: brotli, zstd (when their packages are installed) or gzip, picked
+# from the request's Accept-Encoding. Only 200 responses of compressible types and of at
+# least COMPRESSION_MIN_SIZE bytes are compressed; streamed bodies are compressed as they go.
+# Responses with a strong ETag (full maps and node lists, see services/versions.py) are
+# byte-identical for a given map, version and representation, so their compressed bytes
+# are cached per (path, ETag, encoding): repeat viewers of a hot map skip compression.
+# Encoded responses carry their ETag weakened (W/), since a strong ETag promises the same
+# bytes across encodings; If-None-Match compares weakly, so revalidation still works.
+import asyncio
+import gzip
+import zlib
+from typing import Callable, Dict, Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..core.config import settings
+from ..utils.cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # optional: gzip / zstd only
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: gzip / brotli only
+    zstandard = None
+
+COMPRESSIBLE_TYPES = {
+    "application/json", "application/msgpack", "application/x-msgpack",
+    "application/javascript", "application/xml", "image/svg+xml",
+}
+# Bodies this large are compressed off the event loop
+THREAD_MIN_SIZE = 64 * 1024
+
+
+class _StreamEncoder:
+    """Incremental compressor for streamed bodies."""
+
+    def __init__(self, compress: Callable[[bytes], bytes], finish: Callable[[], bytes]) -> None:
+        self.compress = compress
+        self.finish = finish
+
+
+def _gzip_stream() -> _StreamEncoder:
+    # wbits 31: gzip container
+    compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return _StreamEncoder(
+        lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush,
+    )
+
+
+def _brotli_stream() -> _StreamEncoder:
+    compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return _StreamEncoder(lambda chunk: compressor.process(chunk) + compressor.flush(), compressor.finish)
+
+
+def _zstd_stream() -> _StreamEncoder:
+    compressor = zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compressobj()
+    return _StreamEncoder(
+        lambda chunk: compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+        compressor.flush,
+    )
+
+
+# Encoding -> (one-shot compressor, streaming compressor factory), in order of preference
+ENCODERS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[], _StreamEncoder]]] = {}
+if brotli is not None:
+    ENCODERS["br"] = (lambda data: brotli.compress(data, quality=settings.COMPRESSION_BROTLI_QUALITY), _brotli_stream)
+if zstandard is not None:
+    ENCODERS["zstd"] = (
+        lambda data: zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compress(data), _zstd_stream
+    )
+ENCODERS["gzip"] = (lambda data: gzip.compress(data, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0), _gzip_stream)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """The preferred encoding among those the client accepts (q > 0), or None."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in ENCODERS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return media_type.startswith("text/") or media_type.endswith("+json") or media_type in COMPRESSIBLE_TYPES
+
+
+# Compressed bodies of strong-ETag responses: (path, query, etag, encoding) -> bytes
+compressed_cache = TTLCache(settings.COMPRESSION_CACHE_SIZE, settings.COMPRESSION_CACHE_TTL_SECONDS)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = settings.COMPRESSION_MIN_SIZE) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(scope, send, encoding, self.minimum_size).send)
+
+
+class _CompressingSend:
+    """Holds back the response start until the first body chunk shows whether to compress."""
+
+    def __init__(self, scope: Scope, send: Send, encoding: str, minimum_size: int) -> None:
+        self.scope = scope
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[Message] = None
+        self.stream: Optional[_StreamEncoder] = None
+        self.passthrough = False
+
+    def _cache_key(self, headers: Headers) -> Optional[tuple]:
+        etag = headers.get("etag")
+        if not etag or etag.startswith("W/"):
+            return None
+        return (self.scope["path"], self.scope.get("query_string", b""), etag, self.encoding)
+
+    def _set_encoded_headers(self, length: Optional[int]) -> None:
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        if length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(length)
+
+    async def _compress(self, body: bytes, key: Optional[tuple]) -> bytes:
+        compressed = compressed_cache.get(key) if key else None
+        if compressed is None:
+            compress = ENCODERS[self.encoding][0]
+            if len(body) >= THREAD_MIN_SIZE:
+                compressed = await asyncio.to_thread(compress, body)
+            else:
+                compressed = compress(body)
+            if key and len(compressed) <= settings.COMPRESSION_CACHE_MAX_ENTRY_BYTES:
+                compressed_cache.set(key, compressed)
+        return compressed
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = message["status"] != 200 or not _compressible(headers)
+            if self.passthrough:
+                await self._send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is not None:
+            chunk = self.stream.compress(body)
+            if not more_body:
+                chunk += self.stream.finish()
+            await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+            return
+
+        headers = Headers(raw=self.start["headers"])
+        if not more_body:
+            # Whole body in one message
+            if len(body) < self.minimum_size:
+                self.passthrough = True
+                await self._send(self.start)
+                await self._send(message)
+                return
+            compressed = await self._compress(body, self._cache_key(headers))
+            self._set_encoded_headers(len(compressed))
+            await self._send(self.start)
+            await self._send({"type": "http.response.body", "body": compressed})
+            return
+
+        # Streamed body: compress chunk by chunk unless it is known to be small
+        declared = headers.get("content-length")
+        if declared is not None and int(declared) < self.minimum_size:
+            self.passthrough = True
+            await self._send(self.start)
+            await self._send(message)
+            return
+        self.stream = ENCODERS[self.encoding][1]()
+        self._set_encoded_headers(None)
+        await self._send(self.start)
+        await self._send({"type": "http.response.body", "body": self.stream.compress(body), "more_body": True})
@@ -4,7 +4,8 @@ from .mindmap import MindMap
 from .node import Node
 from .vote import Vote
 from .collaborator import Collaborator
+from .snapshot import MindMapSnapshot, MindMapChange
 
 
 # Export all models
-__all__ = ["User", "MindMap", "Node", "Vote"]
\ No newline at end of file
+__all__ = ["User", "MindMap", "Node", "Vote", "MindMapSnapshot", "MindMapChange"]
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, DateTime, func
 from sqlalchemy.orm import relationship
 from ..core.database import Base
 from sqlalchemy.dialects.postgresql import UUID
@@ -11,6 +11,10 @@ class MindMap(Base):
     name = Column(String, nullable=False)
     owner_id = Column("created_by", UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Tombstone: set when the mindmap is deleted; purged by the garbage collector
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    # Bumped by every node, vote and collaborator write; served as the ETag of the map's GETs
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
 
     creator = relationship("User", back_populates="mindmaps")
     nodes = relationship(
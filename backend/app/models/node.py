@@ -9,7 +9,10 @@ class Node(Base):
     id = Column(Integer, primary_key=True)
     mindmap_id = Column(Integer, ForeignKey("mindmaps.id"), nullable=False)
     parent_id = Column(Integer, ForeignKey("nodes.id", ondelete="CASCADE"), nullable=True)
-    order_index = Column(Integer, nullable=False, server_default="0")
+    # Fractional sibling order (see utils/ordering.py); siblings sort by (order_key, id).
+    # "i" is the key of a first child, i.e. key_after(None). Keys compare byte by byte:
+    # "C" collation on Postgres (as in the migration), SQLite's default BINARY elsewhere
+    order_key = Column(String(collation="C").with_variant(String, "sqlite"), nullable=False, default="i")
     title = Column(String, nullable=False)
     content = Column(String, nullable=True)
     x_position = Column(Float, nullable=False, server_default="0")
@@ -18,6 +21,9 @@ class Node(Base):
     created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     like_count = Column(Integer, nullable=False, server_default="0")
+    # Tombstone: set when the node (and implicitly its subtree) is deleted;
+    # the rows are purged later by the background garbage collector
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
 
     # Use string names for relationships
     creator = relationship("User", back_populates="nodes")
@@ -0,0 +1,38 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, LargeBinary, String, func
+from ..core.database import Base
+
+
+class MindMapSnapshot(Base):
+    """
+    Compact binary encoding of a mindmap's visible nodes and votes
+    (see services/snapshots.py), valid up to change `version`.
+    """
+    __tablename__ = "mindmap_snapshots"
+
+    mindmap_id = Column(Integer, ForeignKey("mindmaps.id", ondelete="CASCADE"), primary_key=True)
+    # Id of the last MindMapChange folded into `data`
+    version = Column(BigInteger, nullable=False, default=0)
+    # Mindmap version up to which changes were folded and dropped from the log:
+    # delta sync can't serve clients older than this
+    horizon = Column(BigInteger, nullable=False, default=0, server_default="0")
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class MindMapChange(Base):
+    """
+    Change log on top of a snapshot: which nodes were touched since it was taken.
+    Replaying re-reads the current rows, so entries carry ids, not payloads.
+    """
+    __tablename__ = "mindmap_changes"
+
+    # Integer on SQLite, where only INTEGER PRIMARY KEY columns autoincrement
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    mindmap_id = Column(Integer, ForeignKey("mindmaps.id", ondelete="CASCADE"), nullable=False)
+    # 'node': re-read node_id and its votes; 'vote' / 'move': only node_id's votes / position
+    # changed; 'layout': re-read every position; 'reset': too much changed, rebuild from the tables
+    kind = Column(String(10), nullable=False)
+    node_id = Column(Integer, nullable=True)
+    # mindmaps.version the write committed as; orders changes for delta sync
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
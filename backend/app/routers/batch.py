@@ -0,0 +1,389 @@
+# routers/batch.py
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+from ..core.config import settings
+from ..core.database import get_db
+from ..models import Node, Vote
+from ..schemas.mindmap import (
+    BatchCreateNode, BatchNodeOperation, BatchOperationResult, BatchRequest, BatchResponse,
+    BatchUpdateNode, NodeResponse
+)
+from ..middleware.auth import get_current_user_id
+from ..utils import layout
+from ..utils.ordering import sibling_order_key
+from ..utils.roles import require_role
+from ..utils.tombstones import get_live_node, live_node_ids
+from ..utils.tree import find_cycle
+from ..services.popularity import invalidate_ranking, record_votes
+from ..services.snapshots import record_change
+from ..services.vote_buffer import buffer_vote, pending_voters
+from .collaborators import check_mindmap_access
+
+router = APIRouter(prefix="/api", tags=["batch"])
+
+# Upper bound on operations in a single batch request
+MAX_BATCH_OPERATIONS = 200
+
+
+class _Batch:
+    """
+    State shared by the operations of one batch: access checked once per map,
+    each map's parent links (loaded on the first move, then kept up to date),
+    refs of the nodes created so far, and what to log / relayout at the end.
+    Every operation validates before it writes, so a failed one leaves nothing behind.
+    """
+
+    def __init__(self, db: Session, user_id: str) -> None:
+        self.db = db
+        self.user_id = UUID(user_id) if isinstance(user_id, str) else user_id
+        self.roles: Dict[int, object] = {}
+        self.parents: Dict[int, Dict[int, Optional[int]]] = {}
+        self.refs: Dict[str, int] = {}
+        self.touched: Dict[int, Set[int]] = {}
+        self.voted: Dict[int, Set[int]] = {}
+        self.relayout: Set[int] = set()
+        self.deleted: Set[int] = set()
+
+    def require(self, mindmap_id: int, required_role: Optional[str] = None) -> None:
+        if mindmap_id not in self.roles:
+            try:
+                self.roles[mindmap_id] = check_mindmap_access(mindmap_id, self.user_id, self.db)
+            except HTTPException as e:
+                self.roles[mindmap_id] = e
+        role = self.roles[mindmap_id]
+        if isinstance(role, HTTPException):
+            raise role
+        require_role(role, required_role)
+
+    def resolve(self, node_id: Optional[int], ref: Optional[str], name: str) -> Optional[int]:
+        if node_id is not None and ref is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Give either {name}_id or {name}_ref, not both"
+            )
+        if ref is None:
+            return node_id
+        if ref not in self.refs:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown {name}_ref '{ref}' (refs must be created earlier in the batch)"
+            )
+        return self.refs[ref]
+
+    def live_node(self, node_id: Optional[int], detail: str = "Node not found") -> Node:
+        node = get_live_node(self.db, node_id) if node_id is not None else None
+        if not node:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
+        return node
+
+    def parent_links(self, mindmap_id: int) -> Dict[int, Optional[int]]:
+        """{node_id: parent_id} of the map's live nodes, as of this point in the batch."""
+        if mindmap_id not in self.parents:
+            self.parents[mindmap_id] = dict(
+                self.db.query(Node.id, Node.parent_id).filter(
+                    Node.mindmap_id == mindmap_id,
+                    Node.id.in_(live_node_ids(mindmap_id))
+                ).all()
+            )
+        return self.parents[mindmap_id]
+
+    def set_parent(self, node: Node, parent_id: Optional[int]) -> None:
+        # Only maps already loaded are kept up to date; the others load the flushed rows
+        if node.mindmap_id in self.parents:
+            self.parents[node.mindmap_id][node.id] = parent_id
+
+    def touch(self, node: Node, structure: bool = False) -> None:
+        self.touched.setdefault(node.mindmap_id, set()).add(node.id)
+        if structure:
+            self.relayout.add(node.mindmap_id)
+
+    def create_node(self, op: BatchCreateNode) -> Node:
+        self.require(op.mindmap_id, "editor")
+        if op.ref is not None and op.ref in self.refs:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Duplicate ref '{op.ref}'"
+            )
+
+        parent_id = self.resolve(op.parent_id, op.parent_ref, "parent")
+        parent = self.live_node(parent_id, "Parent node not found")
+        if parent.mindmap_id != op.mindmap_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parent node not found")
+
+        try:
+            order_key = sibling_order_key(
+                self.db, op.mindmap_id, parent.id, after_id=op.after_id, before_id=op.before_id
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        node = Node(
+            title=op.title,
+            content=op.content,
+            mindmap_id=op.mindmap_id,
+            parent_id=parent.id,
+            order_key=order_key,
+            x_position=0.0,
+            y_position=0.0,
+            created_by=self.user_id
+        )
+        self.db.add(node)
+        self.db.flush()
+        if op.ref is not None:
+            self.refs[op.ref] = node.id
+        self.set_parent(node, parent.id)
+        self.touch(node, structure=True)
+        return node
+
+    def update_node(self, op: BatchUpdateNode) -> Node:
+        node = self.live_node(self.resolve(op.node_id, op.node_ref, "node"))
+        self.require(node.mindmap_id, "editor")
+
+        # Same rules as PUT /api/nodes/{id}, plus the cycle check of the batch update
+        new_parent_id = node.parent_id
+        if op.parent_id is not None:
+            if op.parent_id == node.id:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Node cannot be its own parent")
+            new_parent_id = op.parent_id if op.parent_id != 0 else None
+            if new_parent_id is not None:
+                parent = get_live_node(self.db, new_parent_id)
+                if not parent or parent.mindmap_id != node.mindmap_id:
+                    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parent node not found")
+        reparented = new_parent_id != node.parent_id
+
+        if reparented and new_parent_id is not None:
+            parent_of = self.parent_links(node.mindmap_id)
+            # Tried in place, then put back: the move is applied only once fully validated
+            parent_of[node.id] = new_parent_id
+            try:
+                cyclic = find_cycle(parent_of, [node.id])
+            finally:
+                parent_of[node.id] = node.parent_id
+            if cyclic is not None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Moving node {node.id} would create a cycle"
+                )
+
+        order_key = node.order_key
+        if reparented or op.after_id is not None or op.before_id is not None:
+            try:
+                order_key = sibling_order_key(
+                    self.db, node.mindmap_id, new_parent_id, after_id=op.after_id, before_id=op.before_id
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        # Validated: apply
+        if op.title:
+            node.title = op.title
+        if op.content is not None:
+            node.content = op.content
+        if op.x_position is not None:
+            node.x_position = op.x_position
+        if op.y_position is not None:
+            node.y_position = op.y_position
+        structure_changed = order_key != node.order_key or reparented
+        node.parent_id = new_parent_id
+        node.order_key = order_key
+        self.db.flush()
+        self.set_parent(node, new_parent_id)
+        self.touch(node, structure=structure_changed)
+        return node
+
+    def delete_node(self, op: BatchNodeOperation) -> Node:
+        node = self.live_node(self.resolve(op.node_id, op.node_ref, "node"))
+        self.require(node.mindmap_id, "editor")
+        node.deleted_at = func.now()
+        self.db.flush()
+        # Its descendants go with it; no live node can be moved under them any more
+        self.parents.get(node.mindmap_id, {}).pop(node.id, None)
+        self.touch(node)
+        self.deleted.add(node.mindmap_id)
+        return node
+
+    def vote(self, op: BatchNodeOperation) -> Node:
+        node = self.live_node(self.resolve(op.node_id, op.node_ref, "node"))
+        self.require(node.mindmap_id)
+        if settings.VOTE_WRITE_BEHIND:
+            # Buffered once the batch has committed (see run_batch); voting twice is then no error
+            return node
+
+        existing_vote = self.db.query(Vote).filter(
+            Vote.node_id == node.id,
+            Vote.user_id == self.user_id
+        ).first()
+
+        if op.op == "vote":
+            if existing_vote:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="You have already voted on this node"
+                )
+            self.db.add(Vote(user_id=self.user_id, node_id=node.id))
+        else:
+            if not existing_vote:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vote not found")
+            self.db.delete(existing_vote)
+        self.db.flush()
+        self.voted.setdefault(node.mindmap_id, set()).add(node.id)
+        return node
+
+    def finish(self) -> None:
+        """One layout pass and one logged change per map, for the whole batch."""
+        for mindmap_id in self.relayout:
+            positions = layout.compute_layout(layout.load_tree(self.db, mindmap_id))
+            layout.apply_layout(self.db, positions)
+
+        for mindmap_id in set(self.touched) | set(self.voted):
+            record_change(
+                self.db, mindmap_id,
+                sorted(self.touched.get(mindmap_id, ())),
+                layout=mindmap_id in self.relayout,
+                voted_node_ids=sorted(self.voted.get(mindmap_id, ()))
+            )
+
+    def update_rankings(self) -> None:
+        """Bring the popular-node rankings up to date with the committed batch."""
+        for mindmap_id in self.deleted:
+            invalidate_ranking(mindmap_id)
+        for mindmap_id, node_ids in self.voted.items():
+            if mindmap_id not in self.deleted:
+                record_votes(self.db, mindmap_id, node_ids)
+
+
+def _node_responses(db: Session, node_ids: Set[int]) -> Dict[int, NodeResponse]:
+    """The given nodes as NodeResponse, with their votes, in one query."""
+    rows = db.query(Node, Vote.user_id).outerjoin(
+        Vote, Vote.node_id == Node.id
+    ).filter(Node.id.in_(node_ids)).all()
+
+    nodes: Dict[int, Node] = {}
+    user_votes: Dict[int, list] = {node_id: [] for node_id in node_ids}
+    for node, voter_id in rows:
+        nodes[node.id] = node
+        if voter_id is not None:
+            user_votes[node.id].append(voter_id)
+
+    return {
+        node_id: NodeResponse(
+            id=node.id,
+            title=node.title,
+            content=node.content,
+            x_position=node.x_position,
+            y_position=node.y_position,
+            parent_id=node.parent_id,
+            mindmap_id=node.mindmap_id,
+            order_key=node.order_key,
+            is_ai_generated=node.is_ai_generated,
+            vote_count=len(user_votes[node_id]),
+            user_votes=user_votes[node_id],
+            created_at=node.created_at
+        )
+        for node_id, node in nodes.items()
+    }
+
+
+@router.post("/batch", response_model=BatchResponse)
+async def run_batch(
+        batch: BatchRequest,
+        current_user_id: str = Depends(get_current_user_id),
+        db: Session = Depends(get_db)
+):
+    """
+    Apply a burst of node creates / updates / deletes and votes in one request
+    Operations run in order in a single transaction: access is checked once per
+    mindmap, each touched map is laid out once and logged as one change, and a
+    result (with the status the operation's own endpoint would return) comes
+    back per operation. A failed operation is skipped; with `atomic` it cancels
+    the whole batch instead, answering with its status.
+    """
+    try:
+        if len(batch.operations) > MAX_BATCH_OPERATIONS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"A batch can hold at most {MAX_BATCH_OPERATIONS} operations"
+            )
+
+        state = _Batch(db, current_user_id)
+        handlers = {
+            "create_node": state.create_node,
+            "update_node": state.update_node,
+            "delete_node": state.delete_node,
+            "vote": state.vote,
+            "unvote": state.vote,
+        }
+
+        results: List[BatchOperationResult] = []
+        # Write-behind votes: (result, mindmap_id, voted)
+        buffered: List[Tuple[BatchOperationResult, int, bool]] = []
+        for index, op in enumerate(batch.operations):
+            ref = getattr(op, "ref", None)
+            try:
+                node = handlers[op.op](op)
+            except HTTPException as e:
+                if batch.atomic:
+                    db.rollback()
+                    raise HTTPException(
+                        status_code=e.status_code,
+                        detail=f"Operation {index} ({op.op}) failed: {e.detail}"
+                    )
+                results.append(BatchOperationResult(
+                    index=index, op=op.op, status=e.status_code, ref=ref, error=str(e.detail)
+                ))
+                continue
+            result = BatchOperationResult(
+                index=index, op=op.op,
+                status=status.HTTP_201_CREATED if op.op in ("create_node", "vote") else status.HTTP_200_OK,
+                ref=ref, node_id=node.id
+            )
+            results.append(result)
+            if settings.VOTE_WRITE_BEHIND and op.op in ("vote", "unvote"):
+                buffered.append((result, node.mindmap_id, op.op == "vote"))
+
+        state.finish()
+        db.commit()
+        state.update_rankings()
+
+        for result, mindmap_id, voted in buffered:
+            if not buffer_vote(mindmap_id, result.node_id, current_user_id, voted):
+                result.status = status.HTTP_503_SERVICE_UNAVAILABLE
+                result.error = "Vote buffer unavailable"
+
+        # Fill in the created / updated nodes (with their new positions) and vote counts
+        succeeded = [result for result in results if result.error is None]
+        node_ids = {result.node_id for result in succeeded if result.op in ("create_node", "update_node")}
+        nodes = _node_responses(db, node_ids) if node_ids else {}
+        voted_ids = {result.node_id for result in succeeded if result.op in ("vote", "unvote")}
+        vote_counts = dict(
+            db.query(Vote.node_id, func.count()).filter(Vote.node_id.in_(voted_ids)).group_by(Vote.node_id).all()
+        ) if voted_ids else {}
+
+        # Merge votes not flushed yet (write-behind)
+        pending = {}
+        for mindmap_id in set(state.touched) | {mindmap_id for _, mindmap_id, _ in buffered}:
+            pending.update(pending_voters(db, mindmap_id))
+
+        for result in succeeded:
+            voters = pending.get(result.node_id)
+            if result.node_id in node_ids:
+                result.node = nodes.get(result.node_id)
+                if result.node is not None and voters is not None:
+                    result.node.user_votes = list(voters)
+                    result.node.vote_count = len(voters)
+            if result.op in ("vote", "unvote"):
+                result.vote_count = len(voters) if voters is not None else vote_counts.get(result.node_id, 0)
+
+        return BatchResponse(results=results)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to run batch: {str(e)}"
+        )
@@ -1,9 +1,10 @@
 """
 Collaborators router - handles mindmap collaboration and invitations
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import and_
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Tuple
 from uuid import UUID
 from datetime import datetime
 
@@ -13,6 +14,11 @@ from ..middleware.auth import get_current_user
 from ..models.user import User
 from ..models.mindmap import MindMap
 from ..models.collaborator import Collaborator
+from ..models.node import Node
+from ..services.access_cache import get_cached_role, cache_role, invalidate_access
+from ..services.versions import bump_version, current_etag, not_modified, not_modified_response, with_etag
+from ..utils.roles import require_role
+from ..utils.tombstones import tombstoned_ancestry
 from ..schemas.collaborator import (
     CollaboratorInvite,
     CollaboratorUpdate,
@@ -28,49 +34,106 @@ def check_mindmap_access(
         mindmap_id: int,
         user_id: str,
         db: Session,
-        required_role: str = None
-) -> MindMap:
+        required_role: str = None,
+        use_cache: bool = True
+) -> str:
     """
     Check if user has access to mindmap
-    Returns the mindmap if access is granted, raises HTTPException otherwise
+    Returns the user's role ('owner', 'editor' or 'viewer') if access is granted,
+    raises HTTPException otherwise. Granted roles are cached (see services/access_cache.py);
+    use_cache=False reads the database, e.g. right after another process changed access.
     """
-    mindmap = db.query(MindMap).filter(MindMap.id == mindmap_id).first()
-    if not mindmap:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Mindmap not found"
-        )
-
     # Convert user_id to UUID for comparison
     user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
 
-    # Check if user is the owner
-    if mindmap.owner_id == user_uuid:
-        return mindmap
+    role = get_cached_role(mindmap_id, user_uuid) if use_cache else None
 
-    # Check if user is a collaborator
-    collaboration = db.query(Collaborator).filter(
-        Collaborator.mindmap_id == mindmap_id,
-        Collaborator.user_id == user_uuid,
-        Collaborator.status == "accepted"
+    if role is None:
+        mindmap = db.query(MindMap.owner_id).filter(
+            MindMap.id == mindmap_id,
+            MindMap.deleted_at.is_(None)
+        ).first()
+        if not mindmap:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Mindmap not found"
+            )
+
+        # Check if user is the owner
+        if mindmap.owner_id == user_uuid:
+            role = "owner"
+        else:
+            # Check if user is a collaborator
+            collaboration = db.query(Collaborator.role).filter(
+                Collaborator.mindmap_id == mindmap_id,
+                Collaborator.user_id == user_uuid,
+                Collaborator.status == "accepted"
+            ).first()
+
+            if not collaboration:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="You don't have access to this mindmap"
+                )
+            role = collaboration.role
+
+        cache_role(mindmap_id, user_uuid, role)
+
+    # Check specific role if required
+    require_role(role, required_role)
+
+    return role
+
+
+def get_node_with_access(
+        node_id: int,
+        user_id: str,
+        db: Session,
+        required_role: str = None
+) -> Tuple[Node, str]:
+    """
+    Load a visible node together with the caller's role on its mindmap
+    Node, mindmap owner and collaborator role come from one joined query instead of
+    three sequential lookups. Returns (node, role), raises HTTPException otherwise.
+    """
+    user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
+
+    row = db.query(Node, MindMap.owner_id, Collaborator.role).join(
+        MindMap,
+        and_(MindMap.id == Node.mindmap_id, MindMap.deleted_at.is_(None))
+    ).outerjoin(
+        Collaborator,
+        and_(
+            Collaborator.mindmap_id == Node.mindmap_id,
+            Collaborator.user_id == user_uuid,
+            Collaborator.status == "accepted"
+        )
+    ).filter(
+        Node.id == node_id,
+        ~tombstoned_ancestry(node_id)
     ).first()
 
-    if not collaboration:
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Node not found"
+        )
+
+    node, owner_id, collaborator_role = row
+    if owner_id == user_uuid:
+        role = "owner"
+    elif collaborator_role:
+        role = collaborator_role
+    else:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have access to this mindmap"
         )
 
-    # Check specific role if required
-    if required_role:
-        role_hierarchy = {"viewer": 0, "editor": 1, "owner": 2}
-        if role_hierarchy.get(collaboration.role, 0) < role_hierarchy.get(required_role, 0):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"You need {required_role} role to perform this action"
-            )
+    cache_role(node.mindmap_id, user_uuid, role)
+    require_role(role, required_role)
 
-    return mindmap
+    return node, role
 
 
 @router.post("/mindmaps/{mindmap_id}/invite", response_model=CollaboratorResponse)
@@ -85,21 +148,15 @@ async def invite_collaborator(
     Only the owner or editors can invite collaborators
     """
     # Check if current user has access (owner or editor)
-    mindmap = check_mindmap_access(mindmap_id, current_user.id, db)
+    role = check_mindmap_access(mindmap_id, current_user.id, db)
 
-    # Only owner can invite
-    if mindmap.owner_id != current_user.id:
-        collaboration = db.query(Collaborator).filter(
-            Collaborator.mindmap_id == mindmap_id,
-            Collaborator.user_id == current_user.id,
-            Collaborator.status == "accepted"
-        ).first()
+    if role not in ("owner", "editor"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the owner or editors can invite collaborators"
+        )
 
-        if not collaboration or collaboration.role != "editor":
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Only the owner or editors can invite collaborators"
-            )
+    owner_id = db.query(MindMap.owner_id).filter(MindMap.id == mindmap_id).scalar()
 
     # Find user by email
     invited_user = db.query(User).filter(User.email == invitation.email).first()
@@ -117,7 +174,7 @@ async def invite_collaborator(
         )
 
     # Can't invite the owner
-    if invited_user.id == mindmap.owner_id:
+    if invited_user.id == owner_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User is already the owner of this mindmap"
@@ -145,6 +202,7 @@ async def invite_collaborator(
         existing.invited_at = datetime.utcnow()
         existing.invited_by = current_user.id
         existing.role = invitation.role
+        bump_version(db, mindmap_id, ["collaborators"])
         db.commit()
         db.refresh(existing)
         return existing
@@ -159,6 +217,7 @@ async def invite_collaborator(
     )
 
     db.add(new_collaborator)
+    bump_version(db, mindmap_id, ["collaborators"])
     db.commit()
     db.refresh(new_collaborator)
 
@@ -185,6 +244,7 @@ async def get_my_invitations(
         .filter(
             Collaborator.user_id == current_user.id,
             Collaborator.status == "pending",
+            MindMap.deleted_at.is_(None),
         )
         .all()
     )
@@ -229,9 +289,11 @@ async def accept_invitation(
 
     invitation.status = "accepted"
     invitation.accepted_at = datetime.utcnow()
+    bump_version(db, invitation.mindmap_id, ["collaborators"])
 
     db.commit()
     db.refresh(invitation)
+    invalidate_access(invitation.mindmap_id, current_user.id)
 
     return invitation
 
@@ -258,6 +320,7 @@ async def decline_invitation(
         )
 
     invitation.status = "declined"
+    bump_version(db, invitation.mindmap_id, ["collaborators"])
 
     db.commit()
 
@@ -267,17 +330,24 @@ async def decline_invitation(
 @router.get("/mindmaps/{mindmap_id}/collaborators", response_model=CollaboratorListResponse)
 async def get_collaborators(
         mindmap_id: int,
+        request: Request,
+        response: Response,
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     """
     Get all collaborators for a mindmap
     Only accessible by collaborators and owner
+    Carries the map's version as ETag; a matching If-None-Match gets 304 Not Modified
     """
     # Check if user has access
     check_mindmap_access(mindmap_id, current_user.id, db)
 
-    
+    etag = current_etag(db, mindmap_id)
+    if not_modified(request, etag):
+        return not_modified_response(etag)
+    with_etag(response, etag)
+
     collaborators = (
         db.query(
             Collaborator,
@@ -326,7 +396,10 @@ async def update_collaborator_role(
     Update a collaborator's role
     Only the owner can update roles
     """
-    mindmap = db.query(MindMap).filter(MindMap.id == mindmap_id).first()
+    mindmap = db.query(MindMap).filter(
+        MindMap.id == mindmap_id,
+        MindMap.deleted_at.is_(None)
+    ).first()
     if not mindmap:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -354,8 +427,10 @@ async def update_collaborator_role(
         )
 
     collaborator.role = update.role
+    bump_version(db, mindmap_id, ["collaborators"])
     db.commit()
     db.refresh(collaborator)
+    invalidate_access(mindmap_id, user_id)
 
     return collaborator
 
@@ -371,7 +446,10 @@ async def remove_collaborator(
     Remove a collaborator from a mindmap
     Owner can remove anyone, collaborators can remove themselves
     """
-    mindmap = db.query(MindMap).filter(MindMap.id == mindmap_id).first()
+    mindmap = db.query(MindMap).filter(
+        MindMap.id == mindmap_id,
+        MindMap.deleted_at.is_(None)
+    ).first()
     if not mindmap:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -401,6 +479,8 @@ async def remove_collaborator(
         )
 
     db.delete(collaborator)
+    bump_version(db, mindmap_id, ["collaborators"])
     db.commit()
+    invalidate_access(mindmap_id, user_id)
 
     return {"message": "Collaborator removed successfully"}
\ No newline at end of file
@@ -1,14 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import or_
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import or_, func
 from sqlalchemy.orm import Session, joinedload
-from typing import List
+from typing import List, Optional, Tuple
 from ..core.database import get_db
 from ..models import MindMap, Node, Vote, Collaborator
 from ..schemas.mindmap import (
-    MindMapCreate, MindMapUpdate, MindMapResponse,
-    MindMapListResponse, SuccessResponse
+    MindMapCreate, MindMapUpdate, MindMapClone, MindMapResponse,
+    MindMapListResponse, MindMapChangesResponse, SuccessResponse
 )
 from ..middleware.auth import get_current_user_id
+from ..utils.ordering import key_after
+from ..utils.serialization import (
+    FastJSONResponse, MsgpackResponse, columnar_mindmap, fast_json_enabled, wants_msgpack
+)
+from ..utils.tombstones import live_node_ids
+from ..services.clone import clone_nodes
+from ..services.snapshots import changes_since, load_mindmap_nodes, parse_node_fields
+from ..services.access_cache import invalidate_access
+from ..services.mindmap_cache import cached_payload
+from ..services.vote_buffer import apply_pending_votes, pending_voters
+from ..services.versions import (
+    bump_version, current_version, etag_variant, make_etag, not_modified, not_modified_response, with_etag
+)
 from .collaborators import check_mindmap_access
 
 router = APIRouter(prefix="/api/mindmaps", tags=["mindmaps"])
@@ -41,7 +56,7 @@ async def create_mindmap(
             title=mindmap_data.title,
             content=mindmap_data.title,
             mindmap_id=new_mindmap.id,
-            order_index=0,
+            order_key=key_after(None),
             x_position=0.0,
             y_position=0.0,
             created_by=current_user_id
@@ -56,7 +71,7 @@ async def create_mindmap(
         ).filter(MindMap.id == new_mindmap.id).first()
 
         nodes_response = []
-        for node in sorted(mindmap_with_nodes.nodes, key=lambda n: n.order_index):
+        for node in sorted(mindmap_with_nodes.nodes, key=lambda n: (n.order_key, n.id)):
             votes = db.query(Vote).filter(Vote.node_id == node.id).all()
 
             node_data = {
@@ -67,7 +82,7 @@ async def create_mindmap(
                 "y_position": node.y_position,
                 "parent_id": node.parent_id,
                 "mindmap_id": node.mindmap_id,
-                "order_index": node.order_index,
+                "order_key": node.order_key,
                 "is_ai_generated": node.is_ai_generated,
                 "vote_count": len(votes),
                 "user_votes": [vote.user_id for vote in votes],
@@ -86,7 +101,8 @@ async def create_mindmap(
             "nodes": nodes_response,
             "owner_id": mindmap_with_nodes.owner_id,
             "total_collaborators": total_collaborators,
-            "created_at": mindmap_with_nodes.created_at
+            "created_at": mindmap_with_nodes.created_at,
+            "version": mindmap_with_nodes.version
         }
 
         return MindMapResponse(**response_data)
@@ -118,7 +134,10 @@ async def get_all_mindmaps(
                 & (Collaborator.user_id == current_user_id)
                 & (Collaborator.status == "accepted"),
             )
-            .filter(or_(MindMap.owner_id == current_user_id, Collaborator.id.isnot(None)))
+            .filter(
+                or_(MindMap.owner_id == current_user_id, Collaborator.id.isnot(None)),
+                MindMap.deleted_at.is_(None),
+            )
             .offset(skip)
             .limit(limit)
             .all()
@@ -127,7 +146,10 @@ async def get_all_mindmaps(
         # Add node count to each mindmap
         result = []
         for mindmap in mindmaps:
-            node_count = db.query(Node).filter(Node.mindmap_id == mindmap.id).count()
+            node_count = db.query(Node).filter(
+                Node.mindmap_id == mindmap.id,
+                Node.id.in_(live_node_ids(mindmap.id))
+            ).count()
             total_collaborators = db.query(Collaborator).filter(Collaborator.mindmap_id == mindmap.id).count()
 
             mindmap_dict = {
@@ -149,68 +171,189 @@ async def get_all_mindmaps(
         )
 
 
+def _mindmap_data(db: Session, mindmap_id: int, version: int, node_fields: Optional[Tuple[str, ...]] = None) -> dict:
+    """A MindMapResponse-shaped dict of the map and its visible nodes."""
+    # Fetch mindmap and its visible nodes (tombstoned subtrees are skipped),
+    # served from the map's snapshot plus the changes logged since
+    mindmap = db.query(MindMap).filter(MindMap.id == mindmap_id).first()
+    nodes_response = load_mindmap_nodes(db, mindmap_id, node_fields)
+
+    # Compute collaborators count for this mindmap
+    total_collaborators = db.query(Collaborator).filter(
+        Collaborator.mindmap_id == mindmap.id
+    ).count()
+
+    return {
+        "id": mindmap.id,
+        "title": mindmap.name,
+        "nodes": nodes_response,
+        "owner_id": mindmap.owner_id,
+        "total_collaborators": total_collaborators,
+        "created_at": mindmap.created_at,
+        "version": version
+    }
+
+
+def _render_mindmap(response_data: dict, msgpack_requested: bool) -> bytes:
+    if msgpack_requested:
+        return MsgpackResponse(columnar_mindmap(response_data)).body
+    # Node dicts are already NodeResponse-shaped: skip the second validation
+    if fast_json_enabled():
+        return FastJSONResponse(response_data).body
+    return JSONResponse(jsonable_encoder(MindMapResponse(**response_data))).body
+
+
 @router.get("/{mindmap_id}", response_model=MindMapResponse)
 async def get_mindmap_data(
         mindmap_id: int,
+        request: Request,
+        fields: Optional[str] = Query(None, description="Comma-separated node fields to return (default: all)"),
         current_user_id: str = Depends(get_current_user_id),
         db: Session = Depends(get_db)
 ):
     """
     Get a specific mindmap with all its nodes
+    Carries the map's version as ETag; a matching If-None-Match gets 304 Not Modified
+    With Accept: application/msgpack, answers in MessagePack with the nodes as columns
+    With ?fields=, nodes only carry those fields (unselected columns are not even read)
+    Full payloads are served from a per-version cache (see services/mindmap_cache.py)
     """
     try:
         # Verify user has access (owner or any collaborator)
         check_mindmap_access(mindmap_id, current_user_id, db)
+        node_fields = parse_node_fields(fields)
+
+        # Read the version before the data: a concurrent write only makes the ETag stale
+        version = current_version(db, mindmap_id)
+        msgpack_requested = wants_msgpack(request)
+        variant = etag_variant(",".join(node_fields) if node_fields else None, "msgpack" if msgpack_requested else None)
+        etag = make_etag(mindmap_id, version, variant)
+        # Buffered votes (write-behind) are not part of any version yet: no ETag or cache until flushed
+        pending = pending_voters(db, mindmap_id)
+        if pending:
+            etag = None
+        elif not_modified(request, etag):
+            return not_modified_response(etag, vary="Accept")
+
+        if node_fields is None:
+            media_type = MsgpackResponse.media_type if msgpack_requested else "application/json"
+            if pending:
+                response_data = _mindmap_data(db, mindmap_id, version)
+                apply_pending_votes(response_data["nodes"], pending)
+                body = _render_mindmap(response_data, msgpack_requested)
+            else:
+                # Full payloads are cached per version, already serialized
+                body = await cached_payload(
+                    mindmap_id, version, "msgpack" if msgpack_requested else None,
+                    lambda: _render_mindmap(_mindmap_data(db, mindmap_id, version), msgpack_requested)
+                )
+            return with_etag(Response(body, media_type=media_type), etag, vary="Accept")
+
+        response_data = _mindmap_data(db, mindmap_id, version, node_fields)
+        apply_pending_votes(response_data["nodes"], pending)
+        if msgpack_requested:
+            return with_etag(MsgpackResponse(columnar_mindmap(response_data)), etag, vary="Accept")
+        if fast_json_enabled():
+            return with_etag(FastJSONResponse(response_data), etag, vary="Accept")
+        # Sparse nodes don't validate as NodeResponse
+        return with_etag(JSONResponse(jsonable_encoder(response_data)), etag, vary="Accept")
 
-        # Fetch mindmap with nodes
-        mindmap = db.query(MindMap).options(
-            joinedload(MindMap.nodes)
-        ).filter(MindMap.id == mindmap_id).first()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch mindmap: {str(e)}"
+        )
 
-        # Convert nodes to a response format
-        nodes_response = []
-        for node in sorted(mindmap.nodes, key=lambda n: n.order_index):
-            votes = db.query(Vote).filter(Vote.node_id == node.id).all()
 
-            node_data = {
-                "id": node.id,
-                "title": node.title,
-                "content": node.content,
-                "x_position": node.x_position,
-                "y_position": node.y_position,
-                "parent_id": node.parent_id,
-                "mindmap_id": node.mindmap_id,
-                "order_index": node.order_index,
-                "is_ai_generated": node.is_ai_generated,
-                "vote_count": len(votes),
-                "user_votes": [vote.user_id for vote in votes],
-                "created_at": node.created_at
-            }
-            nodes_response.append(node_data)
+@router.get("/{mindmap_id}/changes", response_model=MindMapChangesResponse)
+async def get_mindmap_changes(
+        mindmap_id: int,
+        since: int = Query(..., ge=0, description="Version the client last synced (MindMapResponse.version)"),
+        current_user_id: str = Depends(get_current_user_id),
+        db: Session = Depends(get_db)
+):
+    """
+    Delta sync: nodes created, updated or deleted and vote changes since version `since`
+    Apply them, then pass the returned version as the next `since`.
+    When `full_reload` is set the map must be fetched again with GET /mindmaps/{id}.
+    """
+    try:
+        # Verify user has access (owner or any collaborator)
+        check_mindmap_access(mindmap_id, current_user_id, db)
 
-        # Compute collaborators count for this mindmap
-        total_collaborators = db.query(Collaborator).filter(
-            Collaborator.mindmap_id == mindmap.id
-        ).count()
+        # 404 for deleted maps
+        current_version(db, mindmap_id)
+        changes = changes_since(db, mindmap_id, since)
+
+        if fast_json_enabled():
+            return FastJSONResponse(changes)
+        return MindMapChangesResponse(**changes)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch changes: {str(e)}"
+        )
+
+
+@router.post("/{mindmap_id}/clone", response_model=MindMapListResponse, status_code=status.HTTP_201_CREATED)
+async def clone_mindmap(
+        mindmap_id: int,
+        clone_data: MindMapClone,
+        current_user_id: str = Depends(get_current_user_id),
+        db: Session = Depends(get_db)
+):
+    """
+    Copy a mindmap (e.g. a template) into a new mindmap owned by the current user.
+    Nodes are copied inside the database with their existing positions, so no
+    relayout is needed. Collaborators are not copied. With include_votes (editors
+    only), the current user's own votes come along.
+    """
+    try:
+        # Verify user has access (owner or any collaborator; editor to copy votes)
+        check_mindmap_access(
+            mindmap_id, current_user_id, db,
+            required_role="editor" if clone_data.include_votes else None
+        )
+
+        source_name = db.query(MindMap.name).filter(MindMap.id == mindmap_id).scalar()
+        title = clone_data.title.strip() if clone_data.title and clone_data.title.strip() else f"{source_name} (copy)"
+        new_mindmap = MindMap(
+            name=title,
+            owner_id=current_user_id
+        )
+        db.add(new_mindmap)
+        db.flush()
+
+        node_count = clone_nodes(
+            db, mindmap_id, new_mindmap.id, current_user_id,
+            include_votes=clone_data.include_votes
+        )
+        db.commit()
+        db.refresh(new_mindmap)
 
-        # Convert mindmap to response format
         response_data = {
-            "id": mindmap.id,
-            "title": mindmap.name,
-            "nodes": nodes_response,
-            "owner_id": mindmap.owner_id,
-            "total_collaborators": total_collaborators,
-            "created_at": mindmap.created_at
+            "id": new_mindmap.id,
+            "title": new_mindmap.name,
+            "owner_id": new_mindmap.owner_id,
+            "node_count": node_count,
+            "total_collaborators": 0,
+            "created_at": new_mindmap.created_at
         }
 
-        return MindMapResponse(**response_data)
+        return MindMapListResponse(**response_data)
 
     except HTTPException:
         raise
     except Exception as e:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch mindmap: {str(e)}"
+            detail=f"Failed to clone mindmap: {str(e)}"
         )
 
 
@@ -228,7 +371,8 @@ async def update_mindmap(
         # Find the mindmap
         mindmap = db.query(MindMap).filter(
             MindMap.id == mindmap_id,
-            MindMap.owner_id == current_user_id
+            MindMap.owner_id == current_user_id,
+            MindMap.deleted_at.is_(None)
         ).first()
 
         if not mindmap:
@@ -240,6 +384,7 @@ async def update_mindmap(
         # Update only the name field (the only field that exists)
         if mindmap_data.title:
             mindmap.name = mindmap_data.title
+            bump_version(db, mindmap_id, ["mindmap"])
 
         db.commit()
         db.refresh(mindmap)
@@ -256,7 +401,8 @@ async def update_mindmap(
             "owner_id": mindmap.owner_id,
             "nodes": [],
             "total_collaborators": total_collaborators,
-            "created_at": mindmap.created_at
+            "created_at": mindmap.created_at,
+            "version": mindmap.version
         }
 
         return MindMapResponse(**response_data)
@@ -278,13 +424,16 @@ async def delete_mindmap(
         db: Session = Depends(get_db)
 ):
     """
-    Delete a mindmap and all its nodes
+    Delete a mindmap and all its nodes.
+    The mindmap is tombstoned and disappears from every read path at once;
+    its nodes and votes are purged in the background by the garbage collector.
     """
     try:
         # Find the mindmap
         mindmap = db.query(MindMap).filter(
             MindMap.id == mindmap_id,
-            MindMap.owner_id == current_user_id
+            MindMap.owner_id == current_user_id,
+            MindMap.deleted_at.is_(None)
         ).first()
 
         if not mindmap:
@@ -293,11 +442,12 @@ async def delete_mindmap(
                 detail="Mindmap not found"
             )
 
-        # Delete all votes for nodes in this mindmap (cascade should handle this)
-        # Delete all nodes in this mindmap (cascade should handle this)
-        # Delete the mindmap
-        db.delete(mindmap)
+        # Tombstone the mindmap; nodes, votes and collaborators are purged later
+        mindmap.deleted_at = func.now()
+        # Tells connected clients the map is gone
+        bump_version(db, mindmap_id, ["deleted"])
         db.commit()
+        invalidate_access(mindmap_id)
 
         return SuccessResponse(
             message=f"Mindmap '{mindmap.name}' deleted successfully"
@@ -1,23 +1,46 @@
 # routers/nodes.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List, Optional
+from uuid import UUID
 from ..core.database import get_db
 from ..models import MindMap, Node, Vote
 from ..schemas.mindmap import (
-    NodeCreate, NodeUpdate, NodeCreateResponse, NodeResponse,
+    NodeCreate, NodeUpdate, NodeCreateResponse, NodeResponse, NodeContentResponse,
+    NodeBatchCreate, NodeBatchItem, NodeBatchUpdate,
     SuccessResponse, AISuggestionResponse, AISuggestion
 )
 from ..middleware.auth import get_current_user_id
 from ..utils import layout
+from ..utils.ordering import key_after, sibling_order_key
+from ..utils.serialization import (
+    FastJSONResponse, MsgpackResponse, columnar_nodes, fast_json_enabled, wants_msgpack
+)
+from ..utils.tombstones import get_live_node, live_node_ids
+from ..utils.tree import find_cycle
 from ..services.ai_context import build_branch_context
+from ..services.popularity import invalidate_ranking
+from ..services.snapshots import load_mindmap_nodes, parse_node_fields, record_change
+from ..services.vote_buffer import apply_pending_votes, pending_voters
+from ..services.versions import current_etag, etag_variant, not_modified, not_modified_response, with_etag
 from ..services.ai import generate_node_suggestions
 from ..services.rate_limit import check_ai_rate_limit, increment_ai_usage, get_remaining_ai_uses
-from .collaborators import check_mindmap_access
+from .collaborators import check_mindmap_access, get_node_with_access
 
 router = APIRouter(prefix="/api", tags=["nodes"])
 
+# Upper bound on nodes created by a single batch request (nested children included)
+MAX_BATCH_NODES = 500
+# Upper bound on nodes whose content is fetched by a single request
+MAX_CONTENT_IDS = 500
+
+
+def _count_batch_items(items: List[NodeBatchItem]) -> int:
+    return sum(1 + _count_batch_items(item.children) for item in items)
+
 
 # NODE CRUD OPERATIONS
 
@@ -33,48 +56,52 @@ async def create_node(
     """
     try:
         # Verify user has access (owner or editor collaborator)
-        mindmap = check_mindmap_access(mindmap_id, current_user_id, db, required_role="editor")
+        check_mindmap_access(mindmap_id, current_user_id, db, required_role="editor")
 
         # Verify parent node exists if specified
         if node_data.parent_id:
-            parent_node = db.query(Node).filter(
-                Node.id == node_data.parent_id,
-                Node.mindmap_id == mindmap_id
-            ).first()
+            parent_node = get_live_node(db, node_data.parent_id)
 
-            if not parent_node:
+            if not parent_node or parent_node.mindmap_id != mindmap_id:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Parent node not found"
                 )
 
-        # Compute the next order_index among siblings (same parent within this mindmap)
+        # Place the node among its siblings (appended unless neighbours are given)
         parent_id = node_data.parent_id if node_data.parent_id else None
-        max_order = db.query(func.max(Node.order_index)).filter(
-            Node.mindmap_id == mindmap_id,
-            Node.parent_id == parent_id
-        ).scalar()
-        next_order_index = (max_order + 1) if max_order is not None else 0
+        try:
+            order_key = sibling_order_key(
+                db, mindmap_id, parent_id,
+                after_id=node_data.after_id,
+                before_id=node_data.before_id
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
 
         new_node = Node(
             title=node_data.title,
             content=node_data.content,
             mindmap_id=mindmap_id,
             parent_id=parent_id,
-            order_index=next_order_index,
+            order_key=order_key,
             # TODO: implement smarter backend layout; for now default to origin
             x_position=0.0,
             y_position=0.0,
-            created_by=current_user_id
+            created_by=UUID(current_user_id) if isinstance(current_user_id, str) else current_user_id
         )
 
         db.add(new_node)
-        db.commit()
-        db.refresh(new_node)
+        db.flush()
 
+        # Laid out in the same transaction: one version, already placed
         tree = layout.load_tree(db, mindmap_id)
         positions = layout.compute_layout(tree)
         layout.apply_layout(db, positions)
+        record_change(db, mindmap_id, [new_node.id], layout=True)
         db.commit()
         db.refresh(new_node)
 
@@ -83,7 +110,7 @@ async def create_node(
             "mindmap_id": new_node.mindmap_id,
             "x_position": new_node.x_position,
             "y_position": new_node.y_position,
-            "order_index": new_node.order_index,
+            "order_key": new_node.order_key,
             "created_at": new_node.created_at
         }
 
@@ -99,29 +126,92 @@ async def create_node(
         )
 
 
-@router.get("/mindmaps/{mindmap_id}/nodes", response_model=List[NodeResponse])
-async def get_mindmap_nodes(
+@router.post("/mindmaps/{mindmap_id}/nodes:batch", response_model=List[NodeResponse], status_code=status.HTTP_201_CREATED)
+async def create_nodes_batch(
         mindmap_id: int,
+        batch: NodeBatchCreate,
         current_user_id: str = Depends(get_current_user_id),
         db: Session = Depends(get_db)
 ):
     """
-    Get all nodes for a specific mindmap
+    Create several nodes, optionally nested, in a single transaction.
+    Order keys are assigned in one pass and the layout is computed once,
+    so accepting N AI suggestions costs about as much as accepting one.
+    Created nodes are returned level by level, parents before their children.
     """
     try:
-        # Verify user has access (owner or any collaborator)
-        check_mindmap_access(mindmap_id, current_user_id, db)
+        # Verify user has access (owner or editor collaborator)
+        check_mindmap_access(mindmap_id, current_user_id, db, required_role="editor")
 
-        # Get all nodes for this mindmap
-        nodes = db.query(Node).filter(
-            Node.mindmap_id == mindmap_id
-        ).order_by(Node.id).all()
+        parent_node = get_live_node(db, batch.parent_id)
 
-        # Convert to response format
-        result = []
-        for node in nodes:
-            votes = db.query(Vote).filter(Vote.node_id == node.id).all()
+        if not parent_node or parent_node.mindmap_id != mindmap_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Parent node not found"
+            )
 
+        if _count_batch_items(batch.nodes) > MAX_BATCH_NODES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"A batch can create at most {MAX_BATCH_NODES} nodes"
+            )
+
+        # Only the existing parent has siblings to append after; nested children start fresh
+        top_keys = []
+        order_key = sibling_order_key(db, mindmap_id, batch.parent_id)
+        for _ in batch.nodes:
+            top_keys.append(order_key)
+            order_key = key_after(order_key)
+
+        # Insert level by level: one flush per tree level gives children their parent ids
+        created_by = UUID(current_user_id) if isinstance(current_user_id, str) else current_user_id
+        created: List[Node] = []
+        level = list(zip([batch.parent_id] * len(batch.nodes), batch.nodes, top_keys))
+
+        while level:
+            new_nodes = [
+                (Node(
+                    title=item.title,
+                    content=item.content,
+                    mindmap_id=mindmap_id,
+                    parent_id=parent_id,
+                    order_key=order_key,
+                    is_ai_generated=item.is_ai_generated,
+                    x_position=0.0,
+                    y_position=0.0,
+                    created_by=created_by
+                ), item)
+                for parent_id, item, order_key in level
+            ]
+            db.add_all([node for node, _ in new_nodes])
+            db.flush()
+
+            created.extend(node for node, _ in new_nodes)
+            level = []
+            for node, item in new_nodes:
+                order_key = key_after(None)
+                for child in item.children:
+                    level.append((node.id, child, order_key))
+                    order_key = key_after(order_key)
+
+        # Single layout pass for the whole batch
+        tree = layout.load_tree(db, mindmap_id)
+        positions = layout.compute_layout(tree)
+        layout.apply_layout(db, positions)
+        record_change(db, mindmap_id, [node.id for node in created], layout=True)
+        db.commit()
+
+        # Reload the created rows (with their computed positions) in one query
+        created_ids = [node.id for node in created]
+        nodes_by_id = {
+            node.id: node
+            for node in db.query(Node).filter(Node.id.in_(created_ids)).all()
+        }
+
+        result = []
+        for node_id in created_ids:
+            node = nodes_by_id[node_id]
             node_data = {
                 "id": node.id,
                 "title": node.title,
@@ -130,10 +220,10 @@ async def get_mindmap_nodes(
                 "y_position": node.y_position,
                 "parent_id": node.parent_id,
                 "mindmap_id": node.mindmap_id,
-                "order_index": node.order_index,
+                "order_key": node.order_key,
                 "is_ai_generated": node.is_ai_generated,
-                "vote_count": len(votes),
-                "user_votes": [vote.user_id for vote in votes],
+                "vote_count": 0,
+                "user_votes": [],
                 "created_at": node.created_at
             }
             result.append(NodeResponse(**node_data))
@@ -143,33 +233,118 @@ async def get_mindmap_nodes(
     except HTTPException:
         raise
     except Exception as e:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch nodes: {str(e)}"
+            detail=f"Failed to create nodes: {str(e)}"
         )
 
 
-@router.get("/nodes/{node_id}", response_model=NodeResponse)
-async def get_node(
-        node_id: int,
+@router.get("/mindmaps/{mindmap_id}/nodes", response_model=List[NodeResponse])
+async def get_mindmap_nodes(
+        mindmap_id: int,
+        request: Request,
+        response: Response,
+        fields: Optional[str] = Query(None, description="Comma-separated node fields to return (default: all)"),
         current_user_id: str = Depends(get_current_user_id),
         db: Session = Depends(get_db)
 ):
     """
-    Get a specific node
+    Get all nodes for a specific mindmap
+    Carries the map's version as ETag; a matching If-None-Match gets 304 Not Modified
+    With Accept: application/msgpack, answers in MessagePack with the nodes as columns
+    With ?fields=, nodes only carry those fields (unselected columns are not even read),
+    e.g. ?fields=parent_id,title,x_position,y_position,vote_count for the canvas
     """
     try:
-        # Get the node first
-        node = db.query(Node).filter(Node.id == node_id).first()
+        # Verify user has access (owner or any collaborator)
+        check_mindmap_access(mindmap_id, current_user_id, db)
+        node_fields = parse_node_fields(fields)
+
+        msgpack_requested = wants_msgpack(request)
+        variant = etag_variant(",".join(node_fields) if node_fields else None, "msgpack" if msgpack_requested else None)
+        etag = current_etag(db, mindmap_id, variant)
+        # Buffered votes (write-behind) are not part of any version yet: no ETag until flushed
+        pending = pending_voters(db, mindmap_id)
+        if pending:
+            etag = None
+        elif not_modified(request, etag):
+            return not_modified_response(etag, vary="Accept")
+
+        # Visible nodes with their votes, from the map's snapshot plus logged changes
+        nodes = sorted(load_mindmap_nodes(db, mindmap_id, node_fields), key=lambda node: node["id"])
+        apply_pending_votes(nodes, pending)
+
+        if msgpack_requested:
+            return with_etag(MsgpackResponse(columnar_nodes(nodes)), etag, vary="Accept")
+        if fast_json_enabled():
+            return with_etag(FastJSONResponse(nodes), etag, vary="Accept")
+        if node_fields:
+            # Sparse nodes don't validate as NodeResponse
+            return with_etag(JSONResponse(jsonable_encoder(nodes)), etag, vary="Accept")
+        with_etag(response, etag, vary="Accept")
+        return [NodeResponse(**node) for node in nodes]
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch nodes: {str(e)}"
+        )
+
 
-        if not node:
+@router.get("/mindmaps/{mindmap_id}/nodes/content", response_model=List[NodeContentResponse])
+async def get_nodes_content(
+        mindmap_id: int,
+        ids: List[int] = Query(..., description="Ids of the nodes whose content to return"),
+        current_user_id: str = Depends(get_current_user_id),
+        db: Session = Depends(get_db)
+):
+    """
+    Get the content of several nodes of a mindmap at once
+    Complements node reads with ?fields= that leave `content` out. Ids of
+    deleted nodes or of other maps are skipped.
+    """
+    try:
+        if len(ids) > MAX_CONTENT_IDS:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Node not found"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {MAX_CONTENT_IDS} node ids per request"
             )
 
         # Verify user has access (owner or any collaborator)
-        check_mindmap_access(node.mindmap_id, current_user_id, db)
+        check_mindmap_access(mindmap_id, current_user_id, db)
+
+        rows = db.query(Node.id, Node.content).filter(
+            Node.id.in_(set(ids)),
+            Node.mindmap_id == mindmap_id,
+            Node.id.in_(live_node_ids(mindmap_id))
+        ).order_by(Node.id).all()
+
+        return [NodeContentResponse(id=node_id, content=content) for node_id, content in rows]
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch node content: {str(e)}"
+        )
+
+
+@router.get("/nodes/{node_id}", response_model=NodeResponse)
+async def get_node(
+        node_id: int,
+        current_user_id: str = Depends(get_current_user_id),
+        db: Session = Depends(get_db)
+):
+    """
+    Get a specific node
+    """
+    try:
+        # Load the node and verify user has access (owner or any collaborator)
+        node, _ = get_node_with_access(node_id, current_user_id, db)
 
         # Get vote information
         votes = db.query(Vote).filter(Vote.node_id == node.id).all()
@@ -183,12 +358,14 @@ async def get_node(
             "y_position": node.y_position,
             "parent_id": node.parent_id,
             "mindmap_id": node.mindmap_id,
-            "order_index": node.order_index,
+            "order_key": node.order_key,
             "is_ai_generated": node.is_ai_generated,
             "vote_count": len(votes),
             "user_votes": [vote.user_id for vote in votes],
             "created_at": node.created_at
         }
+        # Votes not flushed yet (write-behind)
+        apply_pending_votes([response_data], pending_voters(db, node.mindmap_id))
 
         return NodeResponse(**response_data)
 
@@ -212,17 +389,8 @@ async def update_node(
     Update a node
     """
     try:
-        # Get the node first
-        node = db.query(Node).filter(Node.id == node_id).first()
-
-        if not node:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Node not found"
-            )
-
-        # Verify user has access (owner or editor collaborator)
-        check_mindmap_access(node.mindmap_id, current_user_id, db, required_role="editor")
+        # Load the node and verify user has access (owner or editor collaborator)
+        node, _ = get_node_with_access(node_id, current_user_id, db, required_role="editor")
 
         # Verify the parent node exists if being updated
         if node_data.parent_id is not None:
@@ -233,12 +401,9 @@ async def update_node(
                 )
 
             if node_data.parent_id != 0:
-                parent_node = db.query(Node).filter(
-                    Node.id == node_data.parent_id,
-                    Node.mindmap_id == node.mindmap_id
-                ).first()
+                parent_node = get_live_node(db, node_data.parent_id)
 
-                if not parent_node:
+                if not parent_node or parent_node.mindmap_id != node.mindmap_id:
                     raise HTTPException(
                         status_code=status.HTTP_404_NOT_FOUND,
                         detail="Parent node not found"
@@ -253,11 +418,27 @@ async def update_node(
             node.x_position = node_data.x_position
         if node_data.y_position is not None:
             node.y_position = node_data.y_position
+        reparented = False
         if node_data.parent_id is not None:
-            node.parent_id = node_data.parent_id if node_data.parent_id != 0 else None
-        if node_data.order_index is not None:
-            node.order_index = node_data.order_index
+            new_parent_id = node_data.parent_id if node_data.parent_id != 0 else None
+            reparented = new_parent_id != node.parent_id
+            node.parent_id = new_parent_id
+
+        # A moved node is appended to its new siblings unless neighbours are given
+        if reparented or node_data.after_id is not None or node_data.before_id is not None:
+            try:
+                node.order_key = sibling_order_key(
+                    db, node.mindmap_id, node.parent_id,
+                    after_id=node_data.after_id,
+                    before_id=node_data.before_id
+                )
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
+                )
 
+        record_change(db, node.mindmap_id, [node.id])
         db.commit()
         db.refresh(node)
 
@@ -273,7 +454,7 @@ async def update_node(
             "y_position": node.y_position,
             "parent_id": node.parent_id,
             "mindmap_id": node.mindmap_id,
-            "order_index": node.order_index,
+            "order_key": node.order_key,
             "is_ai_generated": node.is_ai_generated,
             "vote_count": len(votes),
             "user_votes": [vote.user_id for vote in votes],
@@ -292,34 +473,203 @@ async def update_node(
         )
 
 
-@router.delete("/nodes/{node_id}", response_model=SuccessResponse)
-async def delete_node(
-        node_id: int,
+@router.put("/mindmaps/{mindmap_id}/nodes:batch", response_model=List[NodeResponse])
+async def update_nodes_batch(
+        mindmap_id: int,
+        batch: NodeBatchUpdate,
         current_user_id: str = Depends(get_current_user_id),
         db: Session = Depends(get_db)
 ):
     """
-    Delete a node and all its children
+    Update several nodes of one mindmap atomically (multi-select moves and reorders).
+    Access is checked once, parent changes are validated together (including
+    cycles formed across the batch), and the layout is recomputed once if the
+    tree structure changed. Positions sent in the batch are kept over the
+    recomputed ones.
     """
     try:
-        # Get the node first
-        node = db.query(Node).filter(Node.id == node_id).first()
+        # Verify user has access (owner or editor collaborator)
+        check_mindmap_access(mindmap_id, current_user_id, db, required_role="editor")
+
+        node_ids = [update.id for update in batch.updates]
 
-        if not node:
+        if len(set(node_ids)) != len(node_ids):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Each node can only appear once in a batch"
+            )
+
+        if len(node_ids) > MAX_BATCH_NODES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"A batch can update at most {MAX_BATCH_NODES} nodes"
+            )
+
+        live_ids = live_node_ids(mindmap_id)
+        nodes_by_id = {
+            node.id: node
+            for node in db.query(Node).filter(
+                Node.id.in_(node_ids),
+                Node.mindmap_id == mindmap_id,
+                Node.id.in_(live_ids)
+            ).all()
+        }
+
+        missing = [node_id for node_id in node_ids if node_id not in nodes_by_id]
+        if missing:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail="Node not found"
+                detail=f"Nodes not found: {missing}"
             )
 
-        # Verify user has access (owner or editor collaborator)
-        check_mindmap_access(node.mindmap_id, current_user_id, db, required_role="editor")
+        # Validate all parent changes together against the map's current structure
+        reparented = {
+            update.id: (update.parent_id if update.parent_id != 0 else None)
+            for update in batch.updates
+            if update.parent_id is not None
+        }
+
+        if reparented:
+            parent_of = dict(
+                db.query(Node.id, Node.parent_id).filter(
+                    Node.mindmap_id == mindmap_id,
+                    Node.id.in_(live_ids)
+                ).all()
+            )
+
+            for node_id, parent_id in reparented.items():
+                if parent_id == node_id:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Node cannot be its own parent"
+                    )
+                if parent_id is not None and parent_id not in parent_of:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Parent node not found"
+                    )
+
+            parent_of.update(reparented)
+            cyclic = find_cycle(parent_of, reparented.keys())
+            if cyclic is not None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Moving node {cyclic} would create a cycle"
+                )
+
+        # Update fields
+        structure_changed = bool(reparented)
+        for update in batch.updates:
+            node = nodes_by_id[update.id]
+            if update.title:
+                node.title = update.title
+            if update.content is not None:
+                node.content = update.content
+            if update.x_position is not None:
+                node.x_position = update.x_position
+            if update.y_position is not None:
+                node.y_position = update.y_position
+            moved = update.id in reparented and reparented[update.id] != node.parent_id
+            if update.id in reparented:
+                node.parent_id = reparented[update.id]
+            if moved or update.after_id is not None or update.before_id is not None:
+                # Flush earlier changes so neighbour lookups see this batch's moves
+                db.flush()
+                try:
+                    node.order_key = sibling_order_key(
+                        db, mindmap_id, node.parent_id,
+                        after_id=update.after_id,
+                        before_id=update.before_id
+                    )
+                except ValueError as e:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=str(e)
+                    )
+                structure_changed = True
+
+        if structure_changed:
+            db.flush()
+            tree = layout.load_tree(db, mindmap_id)
+            positions = layout.compute_layout(tree)
+            # Positions sent in the batch win over the computed ones
+            for update in batch.updates:
+                if update.id in positions and (update.x_position is not None or update.y_position is not None):
+                    x, y = positions[update.id]
+                    positions[update.id] = (
+                        update.x_position if update.x_position is not None else x,
+                        update.y_position if update.y_position is not None else y
+                    )
+            layout.apply_layout(db, positions)
+
+        record_change(db, mindmap_id, node_ids, layout=structure_changed)
+        db.commit()
+
+        # Read the updated nodes back together with their votes in one query
+        rows = db.query(Node, Vote.user_id).outerjoin(
+            Vote, Vote.node_id == Node.id
+        ).filter(Node.id.in_(node_ids)).all()
+
+        user_votes: Dict[int, list] = {node_id: [] for node_id in node_ids}
+        for node, voter_id in rows:
+            nodes_by_id[node.id] = node
+            if voter_id is not None:
+                user_votes[node.id].append(voter_id)
+
+        result = []
+        for node_id in node_ids:
+            node = nodes_by_id[node_id]
+            node_data = {
+                "id": node.id,
+                "title": node.title,
+                "content": node.content,
+                "x_position": node.x_position,
+                "y_position": node.y_position,
+                "parent_id": node.parent_id,
+                "mindmap_id": node.mindmap_id,
+                "order_key": node.order_key,
+                "is_ai_generated": node.is_ai_generated,
+                "vote_count": len(user_votes[node_id]),
+                "user_votes": user_votes[node_id],
+                "created_at": node.created_at
+            }
+            result.append(NodeResponse(**node_data))
+
+        return result
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update nodes: {str(e)}"
+        )
+
+
+@router.delete("/nodes/{node_id}", response_model=SuccessResponse)
+async def delete_node(
+        node_id: int,
+        current_user_id: str = Depends(get_current_user_id),
+        db: Session = Depends(get_db)
+):
+    """
+    Delete a node and all its children.
+    Only the node itself is tombstoned here; the subtree is hidden from every read
+    path immediately and purged in the background by the garbage collector.
+    """
+    try:
+        # Load the node and verify user has access (owner or editor collaborator)
+        node, _ = get_node_with_access(node_id, current_user_id, db, required_role="editor")
 
         # Store node content for a response message
         node_content = node.content
 
-        # Delete the node and let CASCADE handle children
-        db.delete(node)
+        # Tombstone the node; its children are hidden through it
+        node.deleted_at = func.now()
+        record_change(db, node.mindmap_id, [node.id])
         db.commit()
+        invalidate_ranking(node.mindmap_id)
 
         return SuccessResponse(
             message=f"Node '{node_content}' and its children deleted successfully"
@@ -361,14 +711,8 @@ async def suggest_ai_nodes(
             headers={"X-RateLimit-Remaining": str(remaining), "X-RateLimit-Limit": str(limit)}
         )
 
-    # Get the node first
-    node = db.query(Node).filter(Node.id == node_id).first()
-
-    if not node:
-        raise HTTPException(status_code=404, detail="Node not found")
-
-    # Verify user has access (owner or any collaborator can request suggestions)
-    check_mindmap_access(node.mindmap_id, current_user_id, db)
+    # Load the node and verify user has access (owner or any collaborator can request suggestions)
+    node, _ = get_node_with_access(node_id, current_user_id, db)
 
     context_nodes = build_branch_context(db, node_id)
 
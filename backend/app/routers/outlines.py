@@ -0,0 +1,198 @@
+# routers/outlines.py
+import zlib
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import Iterator, Optional
+from ..core.config import settings
+from ..core.database import SessionLocal, get_db
+from ..models import MindMap, Node
+from ..schemas.mindmap import OutlineImportResponse
+from ..middleware.auth import get_current_user_id
+from ..utils import layout
+from ..utils.ordering import sibling_order_key
+from ..utils.tombstones import get_live_node, live_node_ids
+from ..services.snapshots import record_change
+from ..services.outlines import PARSERS, WRITERS, OutlineImporter, OutlineParseError, outline_rows_query
+from .collaborators import check_mindmap_access
+
+router = APIRouter(prefix="/api", tags=["outlines"])
+
+# Rows fetched per round trip from the server-side cursor, and bytes per streamed chunk
+EXPORT_FETCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def _stream_export(mindmap_id: int, title: str, fmt: str, gzip: bool) -> Iterator[bytes]:
+    """
+    Yield the exported document in ~EXPORT_CHUNK_SIZE pieces.
+    Runs after the endpoint has returned, so it uses its own session rather than
+    the request's; rows come from a server-side cursor, keeping memory flat.
+    """
+    writer = WRITERS[fmt][0]
+    compressor = zlib.compressobj(wbits=31) if gzip else None  # 31: gzip container
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            outline_rows_query(mindmap_id),
+            execution_options={"yield_per": EXPORT_FETCH_SIZE}
+        )
+
+        buffer, size = [], 0
+        for piece in writer(rows, title):
+            buffer.append(piece)
+            size += len(piece)
+            if size >= EXPORT_CHUNK_SIZE:
+                data = "".join(buffer).encode("utf-8")
+                buffer, size = [], 0
+                data = compressor.compress(data) if compressor else data
+                if data:
+                    yield data
+
+        data = "".join(buffer).encode("utf-8")
+        if compressor:
+            data = compressor.compress(data) + compressor.flush()
+        if data:
+            yield data
+    finally:
+        db.close()
+
+
+# OUTLINE IMPORT
+
+@router.post("/mindmaps/{mindmap_id}/import", response_model=OutlineImportResponse, status_code=status.HTTP_201_CREATED)
+async def import_outline(
+        mindmap_id: int,
+        request: Request,
+        format: str = Query(..., description="ndjson, json, markdown or opml"),
+        parent_id: Optional[int] = Query(None, description="Node to import under (defaults to the root)"),
+        current_user_id: str = Depends(get_current_user_id),
+        db: Session = Depends(get_db)
+):
+    """
+    Import an outline as a subtree of an existing node.
+    The request body is parsed as it streams in and written in large batches
+    (COPY on Postgres), then the layout is computed once for the whole map.
+    Everything happens in one transaction: a malformed document imports nothing.
+    """
+    try:
+        # Verify user has access (owner or editor collaborator)
+        check_mindmap_access(mindmap_id, current_user_id, db, required_role="editor")
+
+        parser_class = PARSERS.get(format)
+        if not parser_class:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unsupported format '{format}', expected one of: {', '.join(PARSERS)}"
+            )
+
+        if parent_id is not None:
+            parent_node = get_live_node(db, parent_id)
+        else:
+            parent_node = db.query(Node).filter(
+                Node.mindmap_id == mindmap_id,
+                Node.parent_id.is_(None),
+                Node.id.in_(live_node_ids(mindmap_id))
+            ).first()
+
+        if not parent_node or parent_node.mindmap_id != mindmap_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Parent node not found"
+            )
+
+        # Imported top-level nodes go after the parent's existing children
+        importer = OutlineImporter(
+            db, mindmap_id, parent_node.id, current_user_id,
+            top_prefix=sibling_order_key(db, mindmap_id, parent_node.id),
+            batch_size=settings.IMPORT_BATCH_SIZE,
+            max_nodes=settings.IMPORT_MAX_NODES,
+        )
+
+        parser = parser_class()
+        try:
+            async for chunk in request.stream():
+                importer.add(parser.feed(chunk))
+            importer.add(parser.close())
+        except OutlineParseError as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+
+        imported = importer.finish()
+        if imported == 0:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="The outline contains no nodes"
+            )
+
+        # Single layout pass for the whole import
+        tree = layout.load_tree(db, mindmap_id)
+        positions = layout.compute_layout(tree)
+        layout.apply_layout(db, positions)
+        record_change(db, mindmap_id, reset=True)
+        db.commit()
+
+        return OutlineImportResponse(
+            mindmap_id=mindmap_id,
+            parent_id=parent_node.id,
+            imported=imported
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to import outline: {str(e)}"
+        )
+
+
+# OUTLINE EXPORT
+
+@router.get("/mindmaps/{mindmap_id}/export")
+async def export_outline(
+        mindmap_id: int,
+        format: str = Query("ndjson", description="ndjson, json or opml"),
+        gzip: bool = Query(False, description="Compress the download as .gz"),
+        current_user_id: str = Depends(get_current_user_id),
+        db: Session = Depends(get_db)
+):
+    """
+    Download a whole mindmap as an outline, streamed with constant memory.
+    Nodes are written in document order (parents before children, siblings by
+    order_key), so every format can be imported back with the import endpoint.
+    """
+    try:
+        # Verify user has access (owner or any collaborator)
+        check_mindmap_access(mindmap_id, current_user_id, db)
+
+        if format not in WRITERS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unsupported format '{format}', expected one of: {', '.join(WRITERS)}"
+            )
+
+        title = db.query(MindMap.name).filter(MindMap.id == mindmap_id).scalar()
+        _, media_type, extension = WRITERS[format]
+        filename = f"mindmap-{mindmap_id}.{extension}"
+        if gzip:
+            media_type, filename = "application/gzip", filename + ".gz"
+
+        return StreamingResponse(
+            _stream_export(mindmap_id, title, format, gzip),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to export mindmap: {str(e)}"
+        )
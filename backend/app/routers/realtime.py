@@ -0,0 +1,164 @@
+# routers/realtime.py
+import asyncio
+import json
+import time
+import uuid
+from typing import Optional, Tuple
+from uuid import UUID
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+from jose.exceptions import JWTError
+from starlette.websockets import WebSocketState
+from ..core.database import SessionLocal
+from ..middleware.auth import auth
+from ..services.drag import buffer, parse_positions
+from ..services.presence import load_sessions, parse_presence, presence_message, registry
+from ..services.realtime import hub
+from ..services.versions import current_version
+from .collaborators import check_mindmap_access
+
+router = APIRouter(tags=["realtime"])
+
+# Close codes sent when a socket is refused: 4000 + the HTTP status (4000-4999 are free for applications)
+CLOSE_CODES = {
+    status.HTTP_401_UNAUTHORIZED: 4401,
+    status.HTTP_403_FORBIDDEN: 4403,
+    status.HTTP_404_NOT_FOUND: 4404,
+}
+
+
+def _bearer_token(websocket: WebSocket) -> str:
+    # Browsers can't set headers on WebSockets, so the token may come as ?token=
+    token = websocket.query_params.get("token")
+    if token:
+        return token
+    scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+    return credentials if scheme.lower() == "bearer" else ""
+
+
+def _authorize(websocket: WebSocket, mindmap_id: int) -> Tuple[str, str, int, Optional[float]]:
+    """
+    Verify the socket's Supabase JWT and the user's access; returns the user id,
+    their role, the map's version and when the token expires (epoch seconds).
+    Blocking (database and Redis): run it off the event loop.
+    """
+    try:
+        payload = auth.verify_token(_bearer_token(websocket))
+        user_id = str(UUID(payload.get("sub")))
+        expires_at = float(payload["exp"]) if payload.get("exp") is not None else None
+    except (JWTError, TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
+
+    db = SessionLocal()
+    try:
+        role = check_mindmap_access(mindmap_id, user_id, db)
+        return user_id, role, current_version(db, mindmap_id), expires_at
+    finally:
+        db.close()
+
+
+def _recheck_access(mindmap_id: int, user_id: str) -> str:
+    # From the database: other processes' cached roles may not be invalidated yet
+    db = SessionLocal()
+    try:
+        return check_mindmap_access(mindmap_id, user_id, db, use_cache=False)
+    finally:
+        db.close()
+
+
+async def _refuse(websocket: WebSocket, e: HTTPException) -> None:
+    await websocket.close(code=CLOSE_CODES.get(e.status_code, 1008), reason=str(e.detail))
+
+
+def _handle_message(mindmap_id: int, session: str, role: str, message: str) -> str:
+    """Apply a client message; returns an error detail for the client, if any."""
+    try:
+        data = json.loads(message)
+    except ValueError:
+        return "Invalid message"
+    if not isinstance(data, dict) or data.get("type") not in ("move", "presence"):
+        return "Unknown message type"
+
+    if data["type"] == "presence":
+        try:
+            node_id, cursor = parse_presence(data)
+        except ValueError as e:
+            return str(e)
+        registry.update(mindmap_id, session, node_id, cursor)
+        return ""
+
+    if role not in ("owner", "editor"):
+        return "Editor access required"
+    try:
+        positions = parse_positions(data.get("positions"))
+    except ValueError as e:
+        return str(e)
+    buffer.add(mindmap_id, positions)
+    return ""
+
+
+@router.websocket("/ws/mindmaps/{mindmap_id}")
+async def mindmap_socket(websocket: WebSocket, mindmap_id: int):
+    """
+    Realtime channel of a mindmap, authenticated with the same Supabase JWT as the API
+    Sends {"type": "hello", "version": ...} on connect, then a compact
+    {"type": "change", "version", "kinds", "node_ids"} event after every committed
+    write to the map's nodes, votes or collaborators (from any server), and
+    {"type": "pong"} for each "ping". Clients fetch the data with /changes?since=.
+    Editors stream drags as {"type": "move", "positions": [[node_id, x, y], ...]};
+    viewers receive them coalesced as {"type": "move", "mindmap_id", "positions"}
+    (see services/drag.py).
+    Every socket is also a presence session (id in the hello): it receives everyone's
+    sessions right after the hello, then {"type": "presence", "updated", "left"}
+    deltas, and reports its own with {"type": "presence", "node_id", "cursor"}
+    (see services/presence.py).
+    Access is re-checked after every collaborator change or deletion of the map, and
+    the socket is closed (4403 / 4404) once it is lost, or (4401) when the token expires.
+    """
+    await websocket.accept()
+    try:
+        user_id, role, version, expires_at = await asyncio.to_thread(_authorize, websocket, mindmap_id)
+    except HTTPException as e:
+        await _refuse(websocket, e)
+        return
+
+    async def check_access() -> None:
+        nonlocal role
+        try:
+            role = await asyncio.to_thread(_recheck_access, mindmap_id, user_id)
+        except HTTPException as e:
+            if websocket.application_state == WebSocketState.CONNECTED:
+                await _refuse(websocket, e)
+
+    session = uuid.uuid4().hex
+    others = await asyncio.to_thread(load_sessions, mindmap_id)
+    hub.join(mindmap_id, websocket, check_access)
+    registry.join(mindmap_id, session, user_id, others)
+    try:
+        await websocket.send_json({"type": "hello", "mindmap_id": mindmap_id, "version": version, "session": session})
+        others = [item for item in registry.sessions(mindmap_id) if item["session"] != session]
+        await websocket.send_text(presence_message(mindmap_id, others, []))
+        # Until check_access closes the socket
+        while websocket.application_state == WebSocketState.CONNECTED:
+            timeout = expires_at - time.time() if expires_at is not None else None
+            try:
+                message = await asyncio.wait_for(websocket.receive_text(), timeout)
+            except asyncio.TimeoutError:
+                await _refuse(websocket, HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired"
+                ))
+                break
+            if message == "ping":
+                await websocket.send_json({"type": "pong"})
+                continue
+            error = _handle_message(mindmap_id, session, role, message)
+            if error:
+                await websocket.send_json({"type": "error", "detail": error})
+    except WebSocketDisconnect:
+        pass
+    except RuntimeError:
+        # Sending or receiving raced with check_access closing the socket
+        if websocket.application_state == WebSocketState.CONNECTED:
+            raise
+    finally:
+        registry.leave(mindmap_id, session)
+        hub.leave(mindmap_id, websocket)
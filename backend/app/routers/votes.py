@@ -1,14 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List
 from ..core.database import get_db
 from ..models import MindMap, Node, Vote
 from ..schemas.mindmap import VoteResponse, SuccessResponse
 from ..middleware.auth import get_current_user_id
-from .collaborators import check_mindmap_access
+from ..utils.tombstones import live_node_ids
+from ..services.popularity import record_votes, top_voted
+from ..services.snapshots import record_change
+from ..services.vote_buffer import buffer_vote, pending_voters
+from .collaborators import check_mindmap_access, get_node_with_access
 
 router = APIRouter(prefix="/api", tags=["votes"])
 
+# Upper bound on `limit` for popular nodes
+MAX_POPULAR_NODES = 100
+
 
 # VOTE OPERATIONS
 
@@ -20,19 +29,15 @@ async def vote_on_node(
 ):
     """
     Vote on a specific node
+    With VOTE_WRITE_BEHIND the vote is buffered in Redis and written in a later batch;
+    voting twice is then not an error.
     """
     try:
-        # Get the node first
-        node = db.query(Node).filter(Node.id == node_id).first()
-
-        if not node:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Node not found"
-            )
+        # Load the node and verify user has access (owner or any collaborator can vote)
+        node, _ = get_node_with_access(node_id, current_user_id, db)
 
-        # Verify user has access (owner or any collaborator can vote)
-        check_mindmap_access(node.mindmap_id, current_user_id, db)
+        if buffer_vote(node.mindmap_id, node_id, current_user_id, voted=True):
+            return VoteResponse(user_id=current_user_id, node_id=node_id, created_at=datetime.now(timezone.utc))
 
         # Check if user already voted on this node
         existing_vote = db.query(Vote).filter(
@@ -53,8 +58,10 @@ async def vote_on_node(
         )
 
         db.add(new_vote)
+        record_change(db, node.mindmap_id, voted_node_ids=[node_id])
         db.commit()
         db.refresh(new_vote)
+        record_votes(db, node.mindmap_id, [node_id])
 
         return VoteResponse(
             user_id=new_vote.user_id,
@@ -80,20 +87,17 @@ async def remove_vote_from_node(
 ):
     """
     Remove vote from a specific node
+    With VOTE_WRITE_BEHIND the removal is buffered like votes (and not an error without a vote).
     """
     try:
-        # Get the node first
-        node = db.query(Node).filter(Node.id == node_id).first()
+        # Load the node and verify user has access (owner or any collaborator can remove their vote)
+        node, _ = get_node_with_access(node_id, current_user_id, db)
 
-        if not node:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Node not found"
+        if buffer_vote(node.mindmap_id, node_id, current_user_id, voted=False):
+            return SuccessResponse(
+                message="Vote removed successfully"
             )
 
-        # Verify user has access (owner or any collaborator can remove their vote)
-        check_mindmap_access(node.mindmap_id, current_user_id, db)
-
         # Find existing vote
         existing_vote = db.query(Vote).filter(
             Vote.node_id == node_id,
@@ -108,7 +112,9 @@ async def remove_vote_from_node(
 
         # Remove vote
         db.delete(existing_vote)
+        record_change(db, node.mindmap_id, voted_node_ids=[node_id])
         db.commit()
+        record_votes(db, node.mindmap_id, [node_id])
 
         return SuccessResponse(
             message="Vote removed successfully"
@@ -134,21 +140,22 @@ async def get_node_votes(
     Get all votes for a specific node
     """
     try:
-        # Get the node first
-        node = db.query(Node).filter(Node.id == node_id).first()
-
-        if not node:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Node not found"
-            )
-
-        # Verify user has access (owner or any collaborator can view votes)
-        check_mindmap_access(node.mindmap_id, current_user_id, db)
+        # Load the node and verify user has access (owner or any collaborator can view votes)
+        node, _ = get_node_with_access(node_id, current_user_id, db)
 
         # Get all votes for this node
         votes = db.query(Vote).filter(Vote.node_id == node_id).all()
 
+        # Votes not flushed yet (write-behind) count as cast now
+        voters = pending_voters(db, node.mindmap_id).get(node_id)
+        if voters is not None:
+            flushed = {vote.user_id for vote in votes}
+            now = datetime.now(timezone.utc)
+            votes = [vote for vote in votes if vote.user_id in voters] + [
+                Vote(user_id=user_id, node_id=node_id, created_at=now)
+                for user_id in voters if user_id not in flushed
+            ]
+
         # Convert to response format
         result = []
         for vote in votes:
@@ -187,13 +194,19 @@ async def get_mindmap_vote_summary(
         vote_summary = db.query(
             Node.id,
             Node.title,
-            db.func.count(Vote.user_id).label('vote_count')
+            func.count(Vote.user_id).label('vote_count')
         ).outerjoin(Vote).filter(
-            Node.mindmap_id == mindmap_id
+            Node.mindmap_id == mindmap_id,
+            Node.id.in_(live_node_ids(mindmap_id))
         ).group_by(Node.id, Node.title).all()
 
+        # Votes not flushed yet (write-behind)
+        pending = pending_voters(db, mindmap_id)
+
         result = []
         for node_id, node_title, vote_count in vote_summary:
+            if node_id in pending:
+                vote_count = len(pending[node_id])
             result.append({
                 "node_id": node_id,
                 "node_title": node_title,
@@ -222,31 +235,55 @@ async def get_popular_nodes(
         mindmap_id: int,
         current_user_id: str = Depends(get_current_user_id),
         db: Session = Depends(get_db),
-        limit: int = 10
+        limit: int = Query(10, ge=1, le=MAX_POPULAR_NODES)
 ):
     """
     Get the most popular nodes (highest voted) in a mindmap
+    Read from the map's vote ranking (see services/popularity.py) rather than counting
+    every vote of the map; when fewer than `limit` nodes have votes, unvoted ones fill the rest.
     """
     try:
         # Verify user has access (owner or any collaborator)
         check_mindmap_access(mindmap_id, current_user_id, db)
 
-        # Get nodes ordered by vote count
-        popular_nodes = db.query(
-            Node,
-            db.func.count(Vote.user_id).label('vote_count')
-        ).outerjoin(Vote).filter(
-            Node.mindmap_id == mindmap_id
-        ).group_by(Node.id).order_by(
-            db.func.count(Vote.user_id).desc()
-        ).limit(limit).all()
+        # Votes not flushed yet (write-behind) can move nodes in or out of the top `limit`
+        pending = pending_voters(db, mindmap_id)
+        counts = dict(top_voted(db, mindmap_id, limit + len(pending)))
+        counts.update({node_id: len(voters) for node_id, voters in pending.items()})
+        ranked = sorted(
+            (node_id for node_id, count in counts.items() if count > 0),
+            key=lambda node_id: (-counts[node_id], node_id)
+        )
 
-        result = []
-        for node, vote_count in popular_nodes:
-            # Get user votes for this node
-            votes = db.query(Vote).filter(Vote.node_id == node.id).all()
-            user_votes = [vote.user_id for vote in votes]
+        nodes = {
+            node.id: node for node in db.query(Node).filter(
+                Node.id.in_(ranked),
+                Node.mindmap_id == mindmap_id,
+                Node.id.in_(live_node_ids(mindmap_id))
+            ).all()
+        } if ranked else {}
+        ranked = [node_id for node_id in ranked if node_id in nodes][:limit]
+
+        if len(ranked) < limit:
+            # Fewer voted nodes than asked for: fill in with unvoted ones
+            unvoted = db.query(Node).filter(
+                Node.mindmap_id == mindmap_id,
+                Node.id.in_(live_node_ids(mindmap_id)),
+                Node.id.notin_(ranked)
+            ).order_by(Node.id).limit(limit - len(ranked)).all()
+            nodes.update((node.id, node) for node in unvoted)
+            ranked += [node.id for node in unvoted]
+
+        # Voters of every returned node in one query
+        user_votes = {node_id: [] for node_id in ranked}
+        if ranked:
+            for node_id, user_id in db.query(Vote.node_id, Vote.user_id).filter(Vote.node_id.in_(ranked)).all():
+                user_votes[node_id].append(user_id)
+        user_votes.update({node_id: voters for node_id, voters in pending.items() if node_id in user_votes})
 
+        result = []
+        for node_id in ranked:
+            node = nodes[node_id]
             node_data = {
                 "id": node.id,
                 "title": node.title,
@@ -255,8 +292,8 @@ async def get_popular_nodes(
                 "y_position": node.y_position,
                 "parent_id": node.parent_id,
                 "mindmap_id": node.mindmap_id,
-                "vote_count": vote_count or 0,
-                "user_votes": user_votes,
+                "vote_count": len(user_votes[node_id]),
+                "user_votes": user_votes[node_id],
                 "created_at": node.created_at
             }
             result.append(node_data)
@@ -290,23 +327,43 @@ async def get_vote_analytics(
         # Verify user has access (owner or any collaborator)
         check_mindmap_access(mindmap_id, current_user_id, db)
 
+        live_ids = live_node_ids(mindmap_id)
+
+        # Votes not flushed yet (write-behind): their nodes' voters replace the stored ones
+        pending = pending_voters(db, mindmap_id)
+        if pending:
+            live_pending = {node_id for node_id, in db.query(Node.id).filter(
+                Node.id.in_(list(pending)),
+                Node.id.in_(live_ids)
+            )}
+            pending = {node_id: voters for node_id, voters in pending.items() if node_id in live_pending}
+        stored_votes = db.query(Vote).join(Node).filter(
+            Node.mindmap_id == mindmap_id,
+            Node.id.in_(live_ids),
+            Node.id.notin_(list(pending))
+        )
+
         # Get total vote counts
-        total_votes = db.query(Vote).join(Node).filter(
-            Node.mindmap_id == mindmap_id
-        ).count()
+        total_votes = stored_votes.count() + sum(len(voters) for voters in pending.values())
 
         # Get unique voters
-        unique_voters = db.query(Vote.user_id).join(Node).filter(
-            Node.mindmap_id == mindmap_id
-        ).distinct().count()
+        if pending:
+            voter_ids = {user_id for user_id, in stored_votes.with_entities(Vote.user_id).distinct()}
+            voter_ids.update(user_id for voters in pending.values() for user_id in voters)
+            unique_voters = len(voter_ids)
+        else:
+            unique_voters = stored_votes.with_entities(Vote.user_id).distinct().count()
 
         # Get total nodes
-        total_nodes = db.query(Node).filter(Node.mindmap_id == mindmap_id).count()
+        total_nodes = db.query(Node).filter(
+            Node.mindmap_id == mindmap_id,
+            Node.id.in_(live_ids)
+        ).count()
 
         # Get nodes with votes vs without
-        nodes_with_votes = db.query(Node.id).join(Vote).filter(
-            Node.mindmap_id == mindmap_id
-        ).distinct().count()
+        nodes_with_votes = stored_votes.with_entities(Vote.node_id).distinct().count() + sum(
+            1 for voters in pending.values() if voters
+        )
 
         return {
             "mindmap_id": mindmap_id,
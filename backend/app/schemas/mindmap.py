@@ -1,6 +1,6 @@
 # schemas/mindmap.py
 from pydantic import BaseModel, field_validator, Field
-from typing import List, Optional
+from typing import Annotated, List, Literal, Optional, Union
 from datetime import datetime
 from uuid import UUID
 
@@ -46,6 +46,24 @@ class NodeCreate(BaseModel):
     title: str
     content: Optional[str] = None
     parent_id: int
+    # Optional neighbours among the new siblings; by default the node is appended
+    after_id: Optional[int] = None
+    before_id: Optional[int] = None
+
+
+# One node of a batch create; `children` are created underneath it in the same request
+class NodeBatchItem(BaseModel):
+    title: str
+    content: Optional[str] = None
+    is_ai_generated: bool = False
+    children: List["NodeBatchItem"] = Field(default_factory=list)
+
+
+# this is what the frontend sends when accepting several nodes at once
+#   (e.g. all AI suggestions); top-level items are attached to parent_id
+class NodeBatchCreate(BaseModel):
+    parent_id: int
+    nodes: List[NodeBatchItem] = Field(..., min_length=1)
 
 
 class MindMapCreate(MindMapBase):
@@ -56,6 +74,14 @@ class VoteCreate(VoteBase):
     pass
 
 
+# this is what the frontend sends to copy a mindmap (e.g. a team template)
+#   title defaults to "<source title> (copy)"; include_votes copies the caller's
+#   own votes and needs editor access
+class MindMapClone(BaseModel):
+    title: Optional[str] = None
+    include_votes: bool = False
+
+
 # UPDATE SCHEMAS
 
 class NodeUpdate(BaseModel):
@@ -64,7 +90,9 @@ class NodeUpdate(BaseModel):
     x_position: Optional[float] = None
     y_position: Optional[float] = None
     parent_id: Optional[int] = None
-    order_index: Optional[int] = None
+    # Reorder: place the node right after / before these siblings
+    after_id: Optional[int] = None
+    before_id: Optional[int] = None
 
     @classmethod
     @field_validator('title')
@@ -75,6 +103,58 @@ class NodeUpdate(BaseModel):
 
 
 
+# One entry of a batch update: the node id plus the same optional fields as NodeUpdate
+class NodeBatchUpdateItem(NodeUpdate):
+    id: int
+
+
+# this is what the frontend sends when moving or reordering a multi-selection
+class NodeBatchUpdate(BaseModel):
+    updates: List[NodeBatchUpdateItem] = Field(..., min_length=1)
+
+
+# BATCH SCHEMAS (POST /api/batch)
+# Nodes created earlier in the same batch are referenced by the `ref` given at creation,
+#   through `parent_ref` / `node_ref` instead of `parent_id` / `node_id`
+
+class BatchCreateNode(BaseModel):
+    op: Literal["create_node"]
+    mindmap_id: int
+    title: str
+    content: Optional[str] = None
+    parent_id: Optional[int] = None
+    parent_ref: Optional[str] = None
+    after_id: Optional[int] = None
+    before_id: Optional[int] = None
+    ref: Optional[str] = None
+
+
+class BatchUpdateNode(NodeUpdate):
+    op: Literal["update_node"]
+    node_id: Optional[int] = None
+    node_ref: Optional[str] = None
+
+
+# delete_node, vote and unvote only name their node
+class BatchNodeOperation(BaseModel):
+    op: Literal["delete_node", "vote", "unvote"]
+    node_id: Optional[int] = None
+    node_ref: Optional[str] = None
+
+
+BatchOperation = Annotated[
+    Union[BatchCreateNode, BatchUpdateNode, BatchNodeOperation],
+    Field(discriminator="op")
+]
+
+
+# this is what the frontend sends to apply a burst of edits in one request
+#   atomic: any failed operation cancels the whole batch (otherwise only that operation)
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1)
+    atomic: bool = False
+
+
 class MindMapUpdate(BaseModel):
     title: Optional[str] = None
 
@@ -90,13 +170,13 @@ class MindMapUpdate(BaseModel):
 # RESPONSE SCHEMAS
 
 # This is what the backend send to the frontend on node creation
-#   includes the backend-calculated order_index, X and Y positions
+#   includes the backend-calculated order_key, X and Y positions
 class NodeCreateResponse(BaseModel):
     id: int
     mindmap_id: int
     x_position: float
     y_position: float
-    order_index: int
+    order_key: str
     created_at: datetime
 
     class Config:
@@ -112,7 +192,7 @@ class NodeResponse(BaseModel):
     content: Optional[str]
     x_position: float
     y_position: float
-    order_index: int
+    order_key: str
     is_ai_generated: bool
     vote_count: int
     user_votes: List[UUID] = Field(default_factory=list)
@@ -122,6 +202,36 @@ class NodeResponse(BaseModel):
         from_attributes = True
 
 
+# Content of one node, fetched separately from sparse node reads (?fields=)
+class NodeContentResponse(BaseModel):
+    id: int
+    content: Optional[str]
+
+
+# Outcome of one batch operation, in request order
+#   status is the HTTP status the operation would have had on its own endpoint
+class BatchOperationResult(BaseModel):
+    index: int
+    op: str
+    status: int
+    ref: Optional[str] = None
+    node: Optional[NodeResponse] = None
+    node_id: Optional[int] = None
+    vote_count: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchOperationResult]
+
+
+# Returned by an outline import: how many nodes were created under which parent
+class OutlineImportResponse(BaseModel):
+    mindmap_id: int
+    parent_id: int
+    imported: int
+
+
 class VoteResponse(BaseModel):
     user_id: UUID
     node_id: int
@@ -137,11 +247,41 @@ class MindMapResponse(MindMapBase):
     nodes: List[NodeResponse] = []
     total_collaborators: int = 0
     created_at: datetime
+    # Pass as `since` to the changes endpoint to fetch later edits only
+    version: int = 0
 
     class Config:
         from_attributes = True
 
 
+# Vote-only change of a node in a delta sync
+class NodeVotesDelta(BaseModel):
+    node_id: int
+    vote_count: int
+    user_votes: List[UUID] = Field(default_factory=list)
+
+
+class NodePosition(BaseModel):
+    id: int
+    x_position: float
+    y_position: float
+
+
+# Returned by the changes endpoint: what happened to a mindmap after version `since`
+#   full_reload: the log no longer reaches back that far, fetch the whole map instead
+#   deleted_node_ids: tombstoned nodes (their subtrees are gone too)
+#   positions: every node's position, when a relayout moved them
+class MindMapChangesResponse(BaseModel):
+    mindmap_id: int
+    title: str
+    version: int
+    full_reload: bool = False
+    nodes: List[NodeResponse] = []
+    deleted_node_ids: List[int] = []
+    votes: List[NodeVotesDelta] = []
+    positions: List[NodePosition] = []
+
+
 class MindMapListResponse(BaseModel):
     id: int
     title: str
@@ -0,0 +1,100 @@
+# Cache of mindmap access decisions: (mindmap_id, user_id) -> role.
+# Checked in process first, then in Redis (a hash per mindmap, field = user id),
+# so permission checks on hot paths usually cost no database round trip.
+# Only granted access is cached; every change that can revoke or alter access
+# (role updates, removals, mindmap deletion) or grant it (accepted invitations)
+# must call invalidate_access.
+# A request that read a role just before an invalidation must not cache it afterwards:
+# invalidate_access leaves a short-lived "revoked" marker (for the map, or one of its
+# users), and cache_role only writes while no marker exists (WATCHed until the write).
+
+from typing import Optional
+from uuid import UUID
+import redis
+from ..core.config import settings
+from ..core.redis import redis_client
+from ..utils.cache import TTLCache
+
+_local = TTLCache(settings.ACCESS_CACHE_SIZE, settings.ACCESS_CACHE_LOCAL_TTL_SECONDS)
+# (mindmap_id, user_id or None) -> True while recently invalidated in this process
+_revoked = TTLCache(settings.ACCESS_CACHE_SIZE, settings.ACCESS_CACHE_REVOKE_GUARD_SECONDS)
+
+
+def _redis_key(mindmap_id: int) -> str:
+    return f"mindmap_access:{mindmap_id}"
+
+
+def _revoked_key(mindmap_id: int, user_id: Optional[UUID] = None) -> str:
+    if user_id is None:
+        return f"mindmap_access_revoked:{mindmap_id}"
+    return f"mindmap_access_revoked:{mindmap_id}:{user_id}"
+
+
+def _recently_revoked(mindmap_id: int, user_id: UUID) -> bool:
+    return _revoked.get((mindmap_id, None)) is not None or _revoked.get((mindmap_id, user_id)) is not None
+
+
+def get_cached_role(mindmap_id: int, user_id: UUID) -> Optional[str]:
+    role = _local.get((mindmap_id, user_id))
+    if role is not None:
+        return role
+
+    try:
+        role = redis_client.hget(_redis_key(mindmap_id), str(user_id))
+    except Exception:
+        # If Redis is unavailable, fall back to the database (fail open)
+        return None
+
+    if role is not None:
+        _local.set((mindmap_id, user_id), role)
+    return role
+
+
+def cache_role(mindmap_id: int, user_id: UUID, role: str) -> None:
+    """Cache a role just read from the database, unless access was invalidated meanwhile."""
+    if _recently_revoked(mindmap_id, user_id):
+        return
+
+    markers = [_revoked_key(mindmap_id), _revoked_key(mindmap_id, user_id)]
+    try:
+        with redis_client.pipeline() as pipe:
+            pipe.watch(*markers)
+            if pipe.exists(*markers):
+                return
+            pipe.multi()
+            pipe.hset(_redis_key(mindmap_id), str(user_id), role)
+            pipe.expire(_redis_key(mindmap_id), int(settings.ACCESS_CACHE_TTL_SECONDS))
+            pipe.execute()
+    except redis.WatchError:
+        # Invalidated while caching: the role read may already be stale
+        return
+    except Exception:
+        # Redis unavailable: cache in process only
+        pass
+
+    _local.set((mindmap_id, user_id), role)
+    if _recently_revoked(mindmap_id, user_id):
+        _local.delete((mindmap_id, user_id))
+
+
+def invalidate_access(mindmap_id: int, user_id: Optional[UUID] = None) -> None:
+    """Forget one user's cached role on a mindmap, or everyone's when user_id is None.
+    Other workers' in-process entries expire within ACCESS_CACHE_LOCAL_TTL_SECONDS."""
+    _revoked.set((mindmap_id, user_id), True)
+    if user_id is None:
+        _local.delete_matching(lambda key: key[0] == mindmap_id)
+    else:
+        _local.delete((mindmap_id, user_id))
+
+    try:
+        # Marker first, in one transaction: a concurrent cache_role either fails its
+        # WATCH or wrote before this and has its entry deleted here
+        pipe = redis_client.pipeline()
+        pipe.set(_revoked_key(mindmap_id, user_id), 1, px=int(settings.ACCESS_CACHE_REVOKE_GUARD_SECONDS * 1000))
+        if user_id is None:
+            pipe.delete(_redis_key(mindmap_id))
+        else:
+            pipe.hdel(_redis_key(mindmap_id), str(user_id))
+        pipe.execute()
+    except Exception:
+        pass
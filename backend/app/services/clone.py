@@ -0,0 +1,80 @@
+# Server-side copy of a mindmap.
+# Nodes (and optionally the cloning user's votes) are copied with INSERT ... SELECT inside the database:
+# a temporary old_id -> new_id table remaps ids and parent links, so no node is
+# loaded into Python and the existing layout positions are kept as they are.
+
+from uuid import UUID
+from sqlalchemy import Column, Integer, MetaData, Table, func, insert, literal, select
+from sqlalchemy.orm import Session
+from ..models import Node, Vote
+from ..utils.bulk import next_id_column
+from ..utils.tombstones import live_node_ids
+
+
+def clone_nodes(db: Session, source_id: int, target_id: int, user_id: str, include_votes: bool) -> int:
+    """
+    Copy the visible nodes of mindmap `source_id` into `target_id`
+    (same tree, order keys and positions; created by `user_id`).
+    With `include_votes`, `user_id`'s own votes are copied too: nobody else has access
+    to the copy, so other users' votes stay behind. Returns the number of nodes copied.
+    Runs inside the caller's transaction; the caller commits.
+    """
+    id_map = Table(
+        "clone_node_map",
+        MetaData(),
+        Column("old_id", Integer, primary_key=True),
+        Column("new_id", Integer, nullable=False),
+        prefixes=["TEMPORARY"],
+    )
+    # Dropped below on success; on failure the caller's rollback discards it
+    id_map.create(db.connection())
+
+    db.execute(
+        insert(id_map).from_select(
+            ["old_id", "new_id"],
+            select(Node.id, next_id_column(db, Node.__table__, Node.id)).where(
+                Node.mindmap_id == source_id,
+                Node.id.in_(live_node_ids(source_id)),
+            ),
+        )
+    )
+    # Counted rather than taken from rowcount, which drivers may not report for INSERT ... SELECT
+    copied = db.execute(select(func.count()).select_from(id_map)).scalar()
+
+    node_map = id_map.alias("node_map")
+    parent_map = id_map.alias("parent_map")
+    db.execute(
+        insert(Node.__table__).from_select(
+            [
+                "id", "mindmap_id", "parent_id", "order_key", "title", "content",
+                "x_position", "y_position", "is_ai_generated", "created_by",
+            ],
+            select(
+                node_map.c.new_id,
+                literal(target_id),
+                parent_map.c.new_id,
+                Node.order_key,
+                Node.title,
+                Node.content,
+                Node.x_position,
+                Node.y_position,
+                Node.is_ai_generated,
+                literal(UUID(str(user_id)), Node.created_by.type),
+            )
+            .join(node_map, node_map.c.old_id == Node.id)
+            .outerjoin(parent_map, parent_map.c.old_id == Node.parent_id),
+        )
+    )
+
+    if include_votes:
+        db.execute(
+            insert(Vote).from_select(
+                ["user_id", "node_id"],
+                select(Vote.user_id, id_map.c.new_id)
+                .join(id_map, id_map.c.old_id == Vote.node_id)
+                .where(Vote.user_id == UUID(str(user_id))),
+            )
+        )
+
+    id_map.drop(db.connection())
+    return copied
@@ -0,0 +1,243 @@
+# Live node dragging over the realtime socket (routers/realtime.py).
+# While dragging, editors send {"type": "move", "positions": [[node_id, x, y], ...]}.
+# Positions are coalesced per node, last write wins: every DRAG_BROADCAST_INTERVAL_SECONDS
+# the latest ones of the map's live nodes go out to its viewers (this process's sockets
+# directly, other processes through Redis), and every DRAG_PERSIST_INTERVAL_SECONDS they
+# are written with one bulk UPDATE per map, instead of one PUT /api/nodes/{id}
+# transaction per pointer event. Those writes are not logged: once a map has had no
+# positions for DRAG_SETTLE_SECONDS, its drag is over and the nodes it moved are logged
+# as "move" changes at once, so a drag bumps the map's version (invalidating its caches
+# and making clients sync) once, not on every write.
+
+# parse_positions: validate a move message's positions
+# buffer: positions waiting to be broadcast / persisted / logged, per map
+# live_node_subset: which of some node ids are live nodes of a map
+# persist_positions: write one batch of coalesced positions (not logged)
+# log_moves: log the nodes moved by finished drags, one change per map
+# run_drag_flusher: background loop started from the app lifespan
+
+import asyncio
+import json
+import logging
+import math
+import time
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models import Node
+from ..utils.tombstones import live_node_ids
+from .realtime import hub, publish
+from .snapshots import record_change
+
+logger = logging.getLogger(__name__)
+
+Positions = Dict[int, Tuple[float, float]]
+
+
+def parse_positions(raw: Any) -> List[Tuple[int, float, float]]:
+    """[[node_id, x, y], ...] from a move message; raises ValueError when malformed."""
+    if not isinstance(raw, list) or len(raw) > settings.DRAG_MAX_POSITIONS:
+        raise ValueError("positions must be a list of at most %d entries" % settings.DRAG_MAX_POSITIONS)
+
+    positions = []
+    for entry in raw:
+        if not isinstance(entry, list) or len(entry) != 3:
+            raise ValueError("each position must be [node_id, x, y]")
+        node_id, x, y = entry
+        if not isinstance(node_id, int) or isinstance(node_id, bool):
+            raise ValueError("node_id must be an integer")
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in (x, y)):
+            raise ValueError("x and y must be finite numbers")
+        positions.append((node_id, float(x), float(y)))
+    return positions
+
+
+class DragBuffer:
+    """Latest position per node and map, and what finished drags must log; only touched from the event loop."""
+
+    def __init__(self) -> None:
+        self._to_broadcast: Dict[int, Positions] = {}
+        self._to_persist: Dict[int, Positions] = {}
+        # Written but not logged yet, per map
+        self._moved: Dict[int, Set[int]] = {}
+        # When each map being dragged last got positions (time.monotonic())
+        self._last_added: Dict[int, float] = {}
+        # Ids already found to be live nodes of the map, during its current drag
+        self.live: Dict[int, Set[int]] = {}
+
+    def add(self, mindmap_id: int, positions: List[Tuple[int, float, float]]) -> None:
+        for pending in (self._to_broadcast, self._to_persist):
+            latest = pending.setdefault(mindmap_id, {})
+            for node_id, x, y in positions:
+                latest[node_id] = (x, y)
+        self._last_added[mindmap_id] = time.monotonic()
+
+    def take_broadcast(self) -> Dict[int, Positions]:
+        pending, self._to_broadcast = self._to_broadcast, {}
+        return pending
+
+    def take_persist(self) -> Dict[int, Positions]:
+        pending, self._to_persist = self._to_persist, {}
+        return pending
+
+    def persisted(self, written: Dict[int, List[int]]) -> None:
+        for mindmap_id, node_ids in written.items():
+            self._moved.setdefault(mindmap_id, set()).update(node_ids)
+
+    def take_settled(self, idle_seconds: float) -> Dict[int, Set[int]]:
+        """Nodes written by the drags without positions for idle_seconds, which are over."""
+        now = time.monotonic()
+        settled = {}
+        for mindmap_id, last_added in list(self._last_added.items()):
+            if now - last_added >= idle_seconds and mindmap_id not in self._to_persist:
+                del self._last_added[mindmap_id]
+                self.live.pop(mindmap_id, None)
+                moved = self._moved.pop(mindmap_id, None)
+                if moved:
+                    settled[mindmap_id] = moved
+        return settled
+
+
+buffer = DragBuffer()
+
+
+def move_message(mindmap_id: int, positions: Positions) -> str:
+    return json.dumps({
+        "type": "move",
+        "mindmap_id": mindmap_id,
+        "positions": [[node_id, x, y] for node_id, (x, y) in positions.items()],
+    }, separators=(",", ":"))
+
+
+def live_node_subset(db: Session, mindmap_id: int, node_ids: Iterable[int]) -> Set[int]:
+    """The ids among node_ids that are live (not tombstoned) nodes of the map."""
+    return {
+        node_id for (node_id,) in db.query(Node.id).filter(
+            Node.id.in_(list(node_ids)),
+            Node.mindmap_id == mindmap_id,
+            Node.id.in_(live_node_ids(mindmap_id))
+        ).all()
+    }
+
+
+def persist_positions(db: Session, pending: Dict[int, Positions]) -> Dict[int, List[int]]:
+    """
+    Write coalesced positions, one bulk UPDATE per map, without logging them
+    (see log_moves). Returns the ids written per map.
+    """
+    written = {}
+    for mindmap_id, positions in pending.items():
+        # Ignore ids of other maps and of deleted nodes
+        node_ids = sorted(live_node_subset(db, mindmap_id, positions))
+        if not node_ids:
+            continue
+
+        db.execute(
+            update(Node),
+            [
+                {"id": node_id, "x_position": positions[node_id][0], "y_position": positions[node_id][1]}
+                for node_id in node_ids
+            ],
+        )
+        written[mindmap_id] = node_ids
+
+    db.commit()
+    return written
+
+
+def log_moves(db: Session, moved: Dict[int, Set[int]]) -> None:
+    """Log the nodes moved by finished drags: one change (and version bump) per map."""
+    for mindmap_id, node_ids in moved.items():
+        record_change(db, mindmap_id, moved_node_ids=sorted(node_ids))
+    db.commit()
+
+
+def _in_session(write: Callable[[Session], Any]) -> Any:
+    db = SessionLocal()
+    try:
+        return write(db)
+    except Exception:
+        db.rollback()
+        logger.exception("Drag database access failed")
+        return None
+    finally:
+        db.close()
+
+
+def _check_live(unchecked: Dict[int, Set[int]]) -> Dict[int, Set[int]]:
+    return _in_session(lambda db: {
+        mindmap_id: live_node_subset(db, mindmap_id, node_ids) for mindmap_id, node_ids in unchecked.items()
+    }) or {}
+
+
+def _publish_all(messages: List[Tuple[int, str]]) -> None:
+    for mindmap_id, message in messages:
+        publish(mindmap_id, message, delivered_locally=True)
+
+
+async def broadcast_pending() -> None:
+    pending = buffer.take_broadcast()
+    if not pending:
+        return
+
+    # Only relay ids that are live nodes of the map; each is checked once per drag
+    unchecked = {
+        mindmap_id: set(positions) - buffer.live.get(mindmap_id, set())
+        for mindmap_id, positions in pending.items()
+    }
+    unchecked = {mindmap_id: node_ids for mindmap_id, node_ids in unchecked.items() if node_ids}
+    if unchecked:
+        for mindmap_id, node_ids in (await asyncio.to_thread(_check_live, unchecked)).items():
+            buffer.live.setdefault(mindmap_id, set()).update(node_ids)
+
+    messages = []
+    for mindmap_id, positions in pending.items():
+        live = buffer.live.get(mindmap_id, set())
+        positions = {node_id: position for node_id, position in positions.items() if node_id in live}
+        if positions:
+            messages.append((mindmap_id, move_message(mindmap_id, positions)))
+    if not messages:
+        return
+    for mindmap_id, message in messages:
+        await hub.broadcast(mindmap_id, message)
+    await asyncio.to_thread(_publish_all, messages)
+
+
+async def _persist_pending(idle_seconds: float) -> None:
+    pending = buffer.take_persist()
+    if pending:
+        written = await asyncio.to_thread(_in_session, lambda db: persist_positions(db, pending))
+        buffer.persisted(written or {})
+    settled = buffer.take_settled(idle_seconds)
+    if settled:
+        await asyncio.to_thread(_in_session, lambda db: log_moves(db, settled))
+
+
+async def run_drag_flusher() -> None:
+    """
+    Background loop started from the app lifespan.
+    Broadcasts coalesced positions every DRAG_BROADCAST_INTERVAL_SECONDS, persists
+    them every DRAG_PERSIST_INTERVAL_SECONDS and logs finished drags (everything
+    left is persisted and logged on shutdown).
+    """
+    loop = asyncio.get_running_loop()
+    next_persist = loop.time() + settings.DRAG_PERSIST_INTERVAL_SECONDS
+    try:
+        while True:
+            await asyncio.sleep(settings.DRAG_BROADCAST_INTERVAL_SECONDS)
+            try:
+                await broadcast_pending()
+                if loop.time() >= next_persist:
+                    next_persist = loop.time() + settings.DRAG_PERSIST_INTERVAL_SECONDS
+                    await _persist_pending(settings.DRAG_SETTLE_SECONDS)
+            except Exception:
+                logger.exception("Drag flush failed")
+    finally:
+        pending = buffer.take_persist()
+        if pending:
+            buffer.persisted(_in_session(lambda db: persist_positions(db, pending)) or {})
+        settled = buffer.take_settled(0)
+        if settled:
+            _in_session(lambda db: log_moves(db, settled))
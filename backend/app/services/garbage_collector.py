@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from typing import List, Optional
+from sqlalchemy import select, literal
+from sqlalchemy.orm import Session, aliased
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models import MindMap, Node
+
+logger = logging.getLogger(__name__)
+
+
+def _deepest_first(db: Session, anchor) -> List[int]:
+    """
+    Return the node ids of the subtrees selected by `anchor`, deepest nodes first.
+    Deleting in this order never removes a parent before its children, so the
+    parent_id ON DELETE CASCADE never fans out.
+    """
+    subtree = select(Node.id, literal(0).label("depth")).where(anchor).cte(
+        "gc_subtree", recursive=True
+    )
+
+    child = aliased(Node)
+    subtree = subtree.union_all(
+        select(child.id, subtree.c.depth + 1).where(child.parent_id == subtree.c.id)
+    )
+
+    rows = db.execute(select(subtree.c.id).order_by(subtree.c.depth.desc())).all()
+    return [row.id for row in rows]
+
+
+def _delete_nodes(db: Session, node_ids: List[int]) -> None:
+    # Bulk delete: votes go with the DB-level ON DELETE CASCADE
+    db.query(Node).filter(Node.id.in_(node_ids)).delete(synchronize_session=False)
+
+
+def _delete_in_batches(db: Session, node_ids: List[int], batch_size: int) -> None:
+    # The order is computed once per subtree; each batch is its own short transaction
+    for start in range(0, len(node_ids), batch_size):
+        _delete_nodes(db, node_ids[start:start + batch_size])
+        db.commit()
+
+
+def purge_tombstoned_nodes(db: Session, batch_size: int, mindmap_id: Optional[int] = None) -> int:
+    """Purge the oldest tombstoned subtree (of `mindmap_id` if given),
+    `batch_size` rows per transaction. Returns rows deleted."""
+    query = db.query(Node.id).filter(Node.deleted_at.isnot(None))
+    if mindmap_id is not None:
+        query = query.filter(Node.mindmap_id == mindmap_id)
+    tombstone = query.order_by(Node.deleted_at).first()
+    if not tombstone:
+        return 0
+
+    node_ids = _deepest_first(db, Node.id == tombstone.id)
+    _delete_in_batches(db, node_ids, batch_size)
+    return len(node_ids)
+
+
+def purge_tombstoned_mindmaps(db: Session, batch_size: int, mindmap_id: Optional[int] = None) -> int:
+    """Purge the nodes of the oldest tombstoned mindmap (`mindmap_id` if given),
+    `batch_size` rows per transaction, then the mindmap row itself. Returns rows deleted."""
+    query = db.query(MindMap.id).filter(MindMap.deleted_at.isnot(None))
+    if mindmap_id is not None:
+        query = query.filter(MindMap.id == mindmap_id)
+    mindmap = query.order_by(MindMap.deleted_at).first()
+    if not mindmap:
+        return 0
+
+    node_ids = _deepest_first(db, (Node.mindmap_id == mindmap.id) & Node.parent_id.is_(None))
+    _delete_in_batches(db, node_ids, batch_size)
+
+    # Collaborators go with the DB-level ON DELETE CASCADE
+    db.query(MindMap).filter(MindMap.id == mindmap.id).delete(synchronize_session=False)
+    db.commit()
+    return len(node_ids) + 1
+
+
+def collect_garbage(db: Session, batch_size: int, mindmap_id: Optional[int] = None) -> int:
+    """Purge the oldest tombstoned subtree and mindmap, optionally only within `mindmap_id`."""
+    return (
+        purge_tombstoned_nodes(db, batch_size, mindmap_id)
+        + purge_tombstoned_mindmaps(db, batch_size, mindmap_id)
+    )
+
+
+def _collect_once(batch_size: int) -> int:
+    db = SessionLocal()
+    try:
+        return collect_garbage(db, batch_size)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def run_garbage_collector() -> None:
+    """
+    Background loop started from the app lifespan.
+    Keeps purging while there is work, then sleeps for GC_INTERVAL_SECONDS.
+    Each batch of GC_BATCH_SIZE rows is its own short transaction, so editors are
+    never blocked for long.
+    """
+    while True:
+        try:
+            purged = await asyncio.to_thread(_collect_once, settings.GC_BATCH_SIZE)
+        except Exception:
+            logger.exception("Garbage collection pass failed")
+            purged = 0
+
+        if not purged:
+            await asyncio.sleep(settings.GC_INTERVAL_SECONDS)
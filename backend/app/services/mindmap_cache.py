@@ -0,0 +1,153 @@
+# Read-through cache of full mindmap payloads (GET /api/mindmaps/{id}, all node fields).
+# Bodies are stored already serialized, per (map, version, representation): an LRU in
+# process first, then Redis, shared by every process. Every write to a map's nodes, votes
+# or collaborators bumps its version (see services/versions.py), so a write never has to
+# delete anything: the next read asks for a key that doesn't exist yet, and entries of
+# older versions age out.
+# Concurrent misses are collapsed: within a process, requests for a version being built
+# wait for that build; across processes, the builder holds a short Redis lock and the
+# others poll for its result (for at most MINDMAP_CACHE_WAIT_SECONDS, then build anyway).
+# Callers are async routes: Redis round trips and builds (database reads, serializing)
+# run in worker threads, so a miss never blocks the event loop.
+
+# cached_payload: the body for a map version, built by the given callable on a miss
+# clear_local: empty this process's tier (tests)
+
+import asyncio
+import logging
+import time
+import uuid
+from typing import Callable, Dict, Optional, Tuple
+from ..core.config import settings
+from ..core.redis import redis_bytes_client, release_lock
+from ..utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# How often a waiting miss checks Redis for the other process's result
+POLL_SECONDS = 0.05
+
+Key = Tuple[int, int, str]
+
+_local = TTLCache(settings.MINDMAP_CACHE_SIZE, settings.MINDMAP_CACHE_LOCAL_TTL_SECONDS)
+# Builds in progress in this process; followers get None when the build failed
+_inflight: Dict[Key, "asyncio.Future[Optional[bytes]]"] = {}
+
+
+def _redis_key(key: Key) -> str:
+    mindmap_id, version, variant = key
+    return f"mindmap_payload:{mindmap_id}:{version}:{variant}"
+
+
+def _remember(key: Key, body: bytes) -> None:
+    mindmap_id, version, variant = key
+    # Older versions of the map will not be asked for again
+    _local.delete_matching(lambda other: other[0] == mindmap_id and other[1] < version)
+    _local.set(key, body)
+
+
+def _redis_get(key: Key) -> Optional[bytes]:
+    try:
+        return redis_bytes_client.get(_redis_key(key))
+    except Exception:
+        # Fail open: build from the database
+        return None
+
+
+def _redis_set(key: Key, body: bytes) -> None:
+    try:
+        redis_bytes_client.set(_redis_key(key), body, ex=settings.MINDMAP_CACHE_TTL_SECONDS)
+    except Exception:
+        pass
+
+
+def _lock(lock_key: str, token: str) -> bool:
+    try:
+        return bool(redis_bytes_client.set(
+            lock_key, token, nx=True, px=int(settings.MINDMAP_CACHE_LOCK_TTL_SECONDS * 1000)
+        ))
+    except Exception:
+        # Redis unavailable: build without the lock
+        return True
+
+
+def _unlock(lock_key: str, token: str) -> None:
+    try:
+        release_lock(redis_bytes_client, lock_key, token)
+    except Exception:
+        pass
+
+
+async def _store(key: Key, body: bytes) -> None:
+    if len(body) > settings.MINDMAP_CACHE_MAX_ENTRY_BYTES:
+        return
+    _remember(key, body)
+    await asyncio.to_thread(_redis_set, key, body)
+
+
+async def _fetch_or_build(key: Key, build: Callable[[], bytes]) -> bytes:
+    body = await asyncio.to_thread(_redis_get, key)
+    if body is not None:
+        _remember(key, body)
+        return body
+
+    lock_key = _redis_key(key) + ":lock"
+    token = uuid.uuid4().hex
+    locked = await asyncio.to_thread(_lock, lock_key, token)
+
+    if not locked:
+        # Another process is building this version: wait for its result
+        deadline = time.monotonic() + settings.MINDMAP_CACHE_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(POLL_SECONDS)
+            body = await asyncio.to_thread(_redis_get, key)
+            if body is not None:
+                _remember(key, body)
+                return body
+        logger.info("Gave up waiting for mindmap payload %s, building it", _redis_key(key))
+
+    try:
+        body = await asyncio.to_thread(build)
+        await _store(key, body)
+        return body
+    finally:
+        if locked:
+            await asyncio.to_thread(_unlock, lock_key, token)
+
+
+async def cached_payload(mindmap_id: int, version: int, variant: Optional[str],
+                         build: Callable[[], bytes]) -> bytes:
+    """
+    Serialized payload of `mindmap_id` at `version` in representation `variant`
+    (None for JSON). On a miss, `build` (blocking, run in a worker thread) renders
+    it from the database; it should describe the map at `version` or later.
+    """
+    if not settings.MINDMAP_CACHE_ENABLED:
+        return await asyncio.to_thread(build)
+
+    key = (mindmap_id, version, variant or "json")
+    body = _local.get(key)
+    if body is not None:
+        return body
+
+    pending = _inflight.get(key)
+    if pending is not None:
+        body = await asyncio.shield(pending)
+        # The build we waited for failed: try on our own
+        return body if body is not None else await asyncio.to_thread(build)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        body = await _fetch_or_build(key, build)
+    except BaseException:
+        future.set_result(None)
+        raise
+    finally:
+        del _inflight[key]
+    future.set_result(body)
+    return body
+
+
+def clear_local() -> None:
+    _local.clear()
@@ -0,0 +1,412 @@
+# Incremental parsers for outline imports.
+# Each parser is fed raw body chunks as they arrive and yields flat OutlineItems
+# (ref, parent_ref, title, content) in document order, so parents always come
+# before their children and nothing but the current nesting path is kept in memory.
+
+# NdjsonOutlineParser: one JSON object per line, with client-side ids
+# JsonOutlineParser: a nested {"title", "content", "children"} document
+# MarkdownOutlineParser: headings and indented bullet lists
+# OpmlOutlineParser: <outline text="..."> elements
+# OutlineImporter: maps parsed items to node rows and bulk-loads them in batches
+# outline_rows_query / WRITERS: stream a mindmap back out in document order
+
+import json
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID
+from xml.etree.ElementTree import XMLPullParser
+from xml.sax.saxutils import escape, quoteattr
+from sqlalchemy import String, cast, literal, select
+from sqlalchemy.orm import Session, aliased
+from ..models import Node
+from ..utils.bulk import bulk_insert, reserve_ids
+from ..utils.ordering import sequence_key
+
+
+@dataclass
+class OutlineItem:
+    ref: str
+    parent_ref: Optional[str]  # None: attach to the node the outline is imported under
+    title: str
+    content: Optional[str] = None
+
+
+class OutlineParseError(ValueError):
+    pass
+
+
+class _LineParser:
+    """Splits the byte stream into decoded lines, keeping only the unfinished tail."""
+
+    def __init__(self) -> None:
+        self._buffer = b""
+        self._line_no = 0
+
+    def feed(self, data: bytes) -> List[OutlineItem]:
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b"\n")
+        return self._parse_lines(lines)
+
+    def close(self) -> List[OutlineItem]:
+        lines, self._buffer = [self._buffer], b""
+        return self._parse_lines(lines)
+
+    def _parse_lines(self, lines: List[bytes]) -> List[OutlineItem]:
+        items = []
+        for raw in lines:
+            self._line_no += 1
+            try:
+                line = raw.decode("utf-8").rstrip("\r")
+            except UnicodeDecodeError:
+                raise OutlineParseError(f"Line {self._line_no}: not valid UTF-8")
+            if line.strip():
+                item = self.parse_line(line)
+                if item:
+                    items.append(item)
+        return items
+
+    def parse_line(self, line: str) -> Optional[OutlineItem]:
+        raise NotImplementedError
+
+
+class NdjsonOutlineParser(_LineParser):
+    """
+    One node per line: {"id": ..., "parent_id": ..., "title": ..., "content": ...}.
+    Ids are the client's own and are remapped to database ids on import;
+    a missing or null parent_id attaches the node to the import target.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._seen = set()
+
+    def parse_line(self, line: str) -> Optional[OutlineItem]:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise OutlineParseError(f"Line {self._line_no}: invalid JSON ({e.msg})")
+
+        if not isinstance(record, dict) or record.get("id") is None or not record.get("title"):
+            raise OutlineParseError(f"Line {self._line_no}: each record needs an id and a title")
+
+        ref = str(record["id"])
+        parent_ref = str(record["parent_id"]) if record.get("parent_id") is not None else None
+
+        if ref in self._seen:
+            raise OutlineParseError(f"Line {self._line_no}: duplicate id {ref}")
+        if parent_ref is not None and parent_ref not in self._seen:
+            raise OutlineParseError(f"Line {self._line_no}: parent {parent_ref} must appear before its children")
+
+        self._seen.add(ref)
+        return OutlineItem(ref, parent_ref, str(record["title"]), record.get("content"))
+
+
+class MarkdownOutlineParser(_LineParser):
+    """
+    Headings nest by their number of '#'; bullet (or plain) lines nest by indentation
+    under the closest heading above them. Tabs count as four spaces.
+    """
+
+    _BULLET = re.compile(r"^(?:[-*+]|\d+[.)])\s+")
+    _HEADING = re.compile(r"^(#{1,6})\s+")
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._stack: List[Tuple[Tuple[int, int], str]] = []
+        self._count = 0
+
+    def parse_line(self, line: str) -> Optional[OutlineItem]:
+        expanded = line.expandtabs(4)
+        text = expanded.lstrip(" ")
+
+        heading = self._HEADING.match(text)
+        if heading:
+            # Headings sort before any bullet level, so a heading closes every open list
+            level = (0, len(heading.group(1)))
+            title = text[heading.end():]
+        else:
+            level = (1, len(expanded) - len(text))
+            title = self._BULLET.sub("", text, count=1)
+
+        title = title.strip()
+        if not title:
+            return None
+
+        while self._stack and self._stack[-1][0] >= level:
+            self._stack.pop()
+
+        self._count += 1
+        ref = str(self._count)
+        parent_ref = self._stack[-1][1] if self._stack else None
+        self._stack.append((level, ref))
+        return OutlineItem(ref, parent_ref, title)
+
+
+class OpmlOutlineParser:
+    """<outline text="Title" _note="Content"> elements, nested by XML structure."""
+
+    def __init__(self) -> None:
+        self._parser = XMLPullParser(events=("start", "end"))
+        self._stack: List[Tuple[object, Optional[str]]] = []
+        self._count = 0
+
+    def feed(self, data: bytes) -> List[OutlineItem]:
+        self._parser.feed(data)
+        return self._drain()
+
+    def close(self) -> List[OutlineItem]:
+        self._parser.close()
+        return self._drain()
+
+    def _drain(self) -> List[OutlineItem]:
+        items = []
+        try:
+            for event, elem in self._parser.read_events():
+                if event == "start":
+                    ref = None
+                    title = (elem.get("text") or elem.get("title") or "").strip()
+                    if elem.tag == "outline" and title:
+                        parent_ref = next((ref for _, ref in reversed(self._stack) if ref), None)
+                        self._count += 1
+                        ref = str(self._count)
+                        items.append(OutlineItem(ref, parent_ref, title, elem.get("_note")))
+                    self._stack.append((elem, ref))
+                else:
+                    self._stack.pop()
+                    # Drop finished elements so memory stays bounded by the nesting depth
+                    elem.clear()
+                    if self._stack:
+                        self._stack[-1][0].remove(elem)
+        except Exception as e:
+            raise OutlineParseError(f"Invalid OPML: {e}")
+        return items
+
+
+class JsonOutlineParser:
+    """
+    A nested document: {"title", "content", "children": [...]} or a list of those.
+    A single JSON document cannot be split safely, so it is buffered and parsed on
+    close; use ndjson for streaming very large outlines.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def feed(self, data: bytes) -> List[OutlineItem]:
+        self._chunks.append(data)
+        return []
+
+    def close(self) -> List[OutlineItem]:
+        try:
+            document = json.loads(b"".join(self._chunks))
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise OutlineParseError(f"Invalid JSON: {e}")
+        self._chunks = []
+
+        roots = document if isinstance(document, list) else [document]
+        items = []
+        # Iterative pre-order walk, children pushed in reverse to keep document order
+        stack: List[Tuple[object, Optional[str]]] = [(node, None) for node in reversed(roots)]
+        while stack:
+            node, parent_ref = stack.pop()
+            if not isinstance(node, dict) or not node.get("title"):
+                raise OutlineParseError("Every outline node needs a title")
+            ref = str(len(items) + 1)
+            items.append(OutlineItem(ref, parent_ref, str(node["title"]), node.get("content")))
+            stack.extend((child, ref) for child in reversed(node.get("children") or []))
+        return items
+
+
+PARSERS: Dict[str, type] = {
+    "ndjson": NdjsonOutlineParser,
+    "json": JsonOutlineParser,
+    "markdown": MarkdownOutlineParser,
+    "opml": OpmlOutlineParser,
+}
+
+
+class OutlineImporter:
+    """
+    Turns parsed OutlineItems into node rows under an existing parent node.
+    Ids are reserved up front so children can point at parents that are still
+    buffered; rows are written every `batch_size` items, within the caller's transaction.
+    The caller runs the layout once and commits after finish().
+    """
+
+    COLUMNS = (
+        "id", "mindmap_id", "parent_id", "order_key", "title", "content",
+        "x_position", "y_position", "is_ai_generated", "created_by",
+    )
+
+    def __init__(
+        self,
+        db: Session,
+        mindmap_id: int,
+        parent_id: int,
+        user_id: str,
+        top_prefix: str,
+        batch_size: int,
+        max_nodes: int,
+    ) -> None:
+        self.db = db
+        self.mindmap_id = mindmap_id
+        self.parent_id = parent_id
+        self.user_id = UUID(str(user_id))
+        self.top_prefix = top_prefix
+        self.batch_size = batch_size
+        self.max_nodes = max_nodes
+        self.count = 0
+        self._ids: Dict[str, int] = {}
+        # Next child position per parent (keyed by database id)
+        self._positions: Dict[int, int] = {}
+        self._reserved: deque = deque()
+        self._rows: List[tuple] = []
+
+    def add(self, items: List[OutlineItem]) -> None:
+        for item in items:
+            self.count += 1
+            if self.count > self.max_nodes:
+                raise OutlineParseError(f"An import can create at most {self.max_nodes} nodes")
+
+            if item.parent_ref is None:
+                parent_id = self.parent_id
+                prefix = self.top_prefix
+            else:
+                parent_id = self._ids.get(item.parent_ref)
+                if parent_id is None:
+                    raise OutlineParseError(f"Unknown parent {item.parent_ref}")
+                prefix = ""
+
+            position = self._positions.get(parent_id, 0)
+            self._positions[parent_id] = position + 1
+
+            node_id = self._next_id()
+            self._ids[item.ref] = node_id
+            self._rows.append((
+                node_id, self.mindmap_id, parent_id, sequence_key(prefix, position),
+                item.title, item.content, 0.0, 0.0, False, self.user_id,
+            ))
+
+            if len(self._rows) >= self.batch_size:
+                self._flush()
+
+    def finish(self) -> int:
+        self._flush()
+        return self.count
+
+    def _next_id(self) -> int:
+        if not self._reserved:
+            # Write what we have first, so max(id)-based reservation (SQLite) sees it
+            self._flush()
+            self._reserved.extend(reserve_ids(self.db, Node.__table__, self.batch_size))
+        return self._reserved.popleft()
+
+    def _flush(self) -> None:
+        if self._rows:
+            bulk_insert(self.db, Node.__table__, self.COLUMNS, self._rows)
+            self._rows = []
+
+
+# OUTLINE EXPORT
+
+def _path_segment(node) -> object:
+    # order_key, a space (sorts below every key digit) and a fixed-width id for ties,
+    # so comparing concatenated segments gives pre-order sibling order at every level
+    return node.order_key + " " + cast(node.id + 10000000000, String)
+
+
+def outline_rows_query(mindmap_id: int):
+    """
+    SELECT of (id, parent_id, title, content, depth) for every visible node,
+    in pre-order: each parent is followed by its whole subtree, siblings by order_key.
+    Writers can then stream nested formats keeping only the open ancestors in memory.
+    """
+    tree = (
+        select(
+            Node.id, Node.parent_id, Node.title, Node.content,
+            literal(0).label("depth"),
+            _path_segment(Node).label("path"),
+        )
+        .where(
+            Node.mindmap_id == mindmap_id,
+            Node.parent_id.is_(None),
+            Node.deleted_at.is_(None),
+        )
+        .cte("outline", recursive=True)
+    )
+
+    child = aliased(Node)
+    tree = tree.union_all(
+        select(
+            child.id, child.parent_id, child.title, child.content,
+            tree.c.depth + 1,
+            tree.c.path + "/" + _path_segment(child),
+        ).where(
+            child.parent_id == tree.c.id,
+            child.mindmap_id == mindmap_id,
+            child.deleted_at.is_(None),
+        )
+    )
+
+    return select(
+        tree.c.id, tree.c.parent_id, tree.c.title, tree.c.content, tree.c.depth
+    ).order_by(tree.c.path)
+
+
+def write_ndjson(rows: Iterable, title: str) -> Iterator[str]:
+    """Same records the ndjson importer reads, parents before children."""
+    for row in rows:
+        yield json.dumps({
+            "id": row.id,
+            "parent_id": row.parent_id,
+            "title": row.title,
+            "content": row.content,
+        }) + "\n"
+
+
+def write_json(rows: Iterable, title: str) -> Iterator[str]:
+    """A list of nested {"title", "content", "children"} nodes, as the json importer reads."""
+    yield "["
+    open_depth = -1
+    for row in rows:
+        # Close the previous node and its ancestors down to our parent;
+        # having closed anything means we follow a sibling
+        separator = ""
+        while open_depth >= row.depth:
+            yield "]}"
+            open_depth -= 1
+            separator = ","
+        yield separator + json.dumps({"title": row.title, "content": row.content})[:-1] + ', "children": ['
+        open_depth = row.depth
+    while open_depth >= 0:
+        yield "]}"
+        open_depth -= 1
+    yield "]"
+
+
+def write_opml(rows: Iterable, title: str) -> Iterator[str]:
+    """OPML 2.0 with one <outline text="..." _note="..."> per node."""
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<opml version="2.0">\n'
+    yield f"<head><title>{escape(title)}</title></head>\n<body>\n"
+    open_depth = -1
+    for row in rows:
+        while open_depth >= row.depth:
+            yield f"{'  ' * open_depth}</outline>\n"
+            open_depth -= 1
+        note = f" _note={quoteattr(row.content)}" if row.content else ""
+        yield f"{'  ' * row.depth}<outline text={quoteattr(row.title)}{note}>\n"
+        open_depth = row.depth
+    while open_depth >= 0:
+        yield f"{'  ' * open_depth}</outline>\n"
+        open_depth -= 1
+    yield "</body>\n</opml>\n"
+
+
+# format -> (writer, media type, file extension)
+WRITERS: Dict[str, Tuple[Callable[[Iterable, str], Iterator[str]], str, str]] = {
+    "ndjson": (write_ndjson, "application/x-ndjson", "ndjson"),
+    "json": (write_json, "application/json", "json"),
+    "opml": (write_opml, "text/x-opml", "opml"),
+}
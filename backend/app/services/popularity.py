@@ -0,0 +1,130 @@
+# Per-mindmap ranking of nodes by vote count, for GET /api/mindmaps/{id}/popular-nodes.
+# Each map's ranking is a Redis sorted set of its voted live nodes (member: node id,
+# score: vote count). Once their transaction has committed, vote writers set the exact
+# counts of the nodes they voted on. Tombstoning nodes drops the ranking, and the next read
+# rebuilds it from the database with one GROUP BY, as after a cold start.
+# Top-K is then O(log N + K) instead of a GROUP BY over the map.
+# Counts are read from the database between WATCH and EXEC of the write, so a write based
+# on counts that another write has since overtaken is retried rather than applied. Vote
+# writers that find no ranking set a "voted" marker instead, which a rebuild in progress
+# watches too: it then starts over, as its counts may predate the vote.
+# Updates only touch rankings that exist, so a half-built set is never mistaken for a
+# complete one. Rankings expire after POPULAR_RANKING_TTL_SECONDS, which also heals updates
+# lost while Redis was unreachable. Without Redis, the ranking is computed by the database.
+
+# top_voted: (node id, vote count) of the K most voted live nodes, rebuilding the ranking if needed
+# record_votes: set the committed counts of nodes just voted / unvoted on
+# invalidate_ranking: drop a map's ranking (nodes were deleted)
+
+import logging
+from typing import Iterable, List, Optional, Tuple
+import redis
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.redis import redis_client
+from ..models import Vote
+from ..utils.tombstones import live_node_ids
+
+logger = logging.getLogger(__name__)
+
+# Marks a built ranking, even one without votes; scored below any count so reads skip it
+_BUILT = "built"
+# Attempts at a write racing with others before the ranking is dropped (or not built) instead
+_UPDATE_ATTEMPTS = 3
+# Lifetime of the "voted" marker: longer than any rebuild's read of the votes
+_VOTED_MARKER_SECONDS = 60
+
+
+def _key(mindmap_id: int) -> str:
+    return f"popular_nodes:{mindmap_id}"
+
+
+def _voted_key(mindmap_id: int) -> str:
+    return f"popular_nodes_voted:{mindmap_id}"
+
+
+def _counts_from_db(db: Session, mindmap_id: int, limit: Optional[int] = None) -> List[Tuple[int, int]]:
+    query = db.query(Vote.node_id, func.count(Vote.user_id)).filter(
+        Vote.node_id.in_(live_node_ids(mindmap_id))
+    ).group_by(Vote.node_id).order_by(func.count(Vote.user_id).desc(), Vote.node_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return [(node_id, count) for node_id, count in query.all()]
+
+
+def _rebuild(db: Session, mindmap_id: int) -> bool:
+    """Build the ranking from the committed votes; False when votes kept coming in meanwhile."""
+    key = _key(mindmap_id)
+    for _ in range(_UPDATE_ATTEMPTS):
+        with redis_client.pipeline() as pipe:
+            try:
+                pipe.watch(key, _voted_key(mindmap_id))
+                counts = {str(node_id): count for node_id, count in _counts_from_db(db, mindmap_id)}
+                counts[_BUILT] = -1
+                pipe.multi()
+                pipe.delete(key)
+                pipe.zadd(key, counts)
+                pipe.expire(key, settings.POPULAR_RANKING_TTL_SECONDS)
+                pipe.execute()
+                return True
+            except redis.WatchError:
+                continue
+    return False
+
+
+def top_voted(db: Session, mindmap_id: int, k: int) -> List[Tuple[int, int]]:
+    """The k most voted live nodes of the map as (node id, vote count), most voted first."""
+    try:
+        if not redis_client.exists(_key(mindmap_id)) and not _rebuild(db, mindmap_id):
+            return _counts_from_db(db, mindmap_id, k)
+        ranked = redis_client.zrevrangebyscore(_key(mindmap_id), "+inf", 1, start=0, num=k, withscores=True)
+    except Exception:
+        # Redis unavailable: rank in the database
+        return _counts_from_db(db, mindmap_id, k)
+    return [(int(node_id), int(count)) for node_id, count in ranked]
+
+
+def record_votes(db: Session, mindmap_id: int, node_ids: Iterable[int]) -> None:
+    """Bring the ranking up to date with committed votes / unvotes on `node_ids`."""
+    node_ids = sorted(set(node_ids))
+    if not node_ids:
+        return
+    key = _key(mindmap_id)
+    try:
+        for _ in range(_UPDATE_ATTEMPTS):
+            with redis_client.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    if not pipe.exists(key):
+                        # Not built: the next read builds it from the committed votes, and
+                        # a rebuild already reading them starts over
+                        pipe.multi()
+                        pipe.set(_voted_key(mindmap_id), 1, ex=_VOTED_MARKER_SECONDS)
+                        pipe.execute()
+                        return
+                    counts = dict.fromkeys(node_ids, 0)
+                    counts.update(
+                        db.query(Vote.node_id, func.count(Vote.user_id)).filter(
+                            Vote.node_id.in_(node_ids)
+                        ).group_by(Vote.node_id).all()
+                    )
+                    pipe.multi()
+                    pipe.zadd(key, {str(node_id): count for node_id, count in counts.items()})
+                    # Nodes without votes leave the ranking
+                    pipe.zremrangebyscore(key, 0, 0)
+                    pipe.execute()
+                    return
+                except redis.WatchError:
+                    continue
+        redis_client.delete(key)
+    except Exception:
+        logger.warning("Could not update popular nodes of mindmap %s", mindmap_id, exc_info=True)
+        invalidate_ranking(mindmap_id)
+
+
+def invalidate_ranking(mindmap_id: int) -> None:
+    try:
+        redis_client.delete(_key(mindmap_id))
+    except Exception:
+        pass
@@ -0,0 +1,319 @@
+# Who is looking at which node: ephemeral presence of the realtime sockets, never stored in Postgres.
+# Each socket is a presence session (one user may have several tabs) with a selected
+# node and a cursor. Sockets update them with {"type": "presence", "node_id", "cursor"};
+# updates only overwrite the session's entry, and every PRESENCE_BROADCAST_INTERVAL_SECONDS
+# one delta per map (sessions that changed, only their changed fields, and sessions that
+# left) goes to the map's sockets, whatever the number of updates or viewers.
+# Across processes, deltas travel on the map's "mindmap-presence:" Redis channel, and
+# sessions are mirrored as TTL keys (presence:{mindmap_id}:{session}, indexed by the
+# presence:{mindmap_id} zset of expiry times) so a new socket can load everyone at once.
+# Every PRESENCE_TTL_SECONDS / 3 each process refreshes its sessions' keys and
+# sends them as a heartbeat; sessions of a process that stops heartbeating are
+# dropped after PRESENCE_TTL_SECONDS, by Redis and by the other processes.
+
+# parse_presence: validate a presence message
+# registry: presence sessions of the maps this process has sockets for
+# load_sessions: current sessions of a map from Redis (for a joining socket)
+# run_presence_flusher / run_presence_listener: background loops started from the app lifespan
+
+import asyncio
+import json
+import logging
+import math
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from ..core.config import settings
+from ..core.redis import redis_client
+from .realtime import INSTANCE_ID, hub, mindmap_id_of, subscribe
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "mindmap-presence:"
+# Fields of a session clients see besides "session" and "user_id"
+FIELDS = ("node_id", "cursor")
+
+
+def channel_for(mindmap_id: int) -> str:
+    return f"{CHANNEL_PREFIX}{mindmap_id}"
+
+
+def _session_key(mindmap_id: int, session: str) -> str:
+    return f"presence:{mindmap_id}:{session}"
+
+
+def _index_key(mindmap_id: int) -> str:
+    return f"presence:{mindmap_id}"
+
+
+def parse_presence(data: dict) -> Tuple[Optional[int], Optional[List[float]]]:
+    """(node_id, cursor) from a presence message; raises ValueError when malformed."""
+    node_id = data.get("node_id")
+    if node_id is not None and (not isinstance(node_id, int) or isinstance(node_id, bool)):
+        raise ValueError("node_id must be an integer or null")
+
+    cursor = data.get("cursor")
+    if cursor is not None:
+        if (
+            not isinstance(cursor, list) or len(cursor) != 2
+            or not all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in cursor)
+        ):
+            raise ValueError("cursor must be [x, y] or null")
+        cursor = [float(v) for v in cursor]
+    return node_id, cursor
+
+
+def _public(session: str, entry: dict) -> dict:
+    return {"session": session, "user_id": entry["user_id"], **{field: entry[field] for field in FIELDS}}
+
+
+class PresenceRegistry:
+    """
+    Sessions per map: this process's own (local) and, for maps it has sockets
+    for, the other processes' (learned from their deltas and heartbeats).
+    Only touched from the event loop.
+    """
+
+    def __init__(self) -> None:
+        self.maps: Dict[int, Dict[str, dict]] = {}
+        self._dirty: Dict[int, Set[str]] = {}
+        self._left: Dict[int, Set[str]] = {}
+
+    def join(self, mindmap_id: int, session: str, user_id: str, others: Iterable[dict] = ()) -> None:
+        entries = self.maps.setdefault(mindmap_id, {})
+        for other in others:
+            if other["session"] not in entries:
+                self._store_remote(entries, other)
+        entries[session] = {
+            "user_id": user_id, "node_id": None, "cursor": None,
+            "local": True, "sent": None, "seen": time.monotonic(),
+        }
+        self._dirty.setdefault(mindmap_id, set()).add(session)
+
+    def update(self, mindmap_id: int, session: str, node_id: Optional[int], cursor: Optional[List[float]]) -> None:
+        entry = self.maps.get(mindmap_id, {}).get(session)
+        if entry is None:
+            return
+        entry["node_id"], entry["cursor"] = node_id, cursor
+        self._dirty.setdefault(mindmap_id, set()).add(session)
+
+    def leave(self, mindmap_id: int, session: str) -> None:
+        entries = self.maps.get(mindmap_id, {})
+        if entries.pop(session, None) is None:
+            return
+        self._dirty.get(mindmap_id, set()).discard(session)
+        self._left.setdefault(mindmap_id, set()).add(session)
+        # Other processes' sessions are only tracked while this one has sockets on the map
+        if not any(entry["local"] for entry in entries.values()):
+            del self.maps[mindmap_id]
+
+    def sessions(self, mindmap_id: int) -> List[dict]:
+        return [_public(session, entry) for session, entry in self.maps.get(mindmap_id, {}).items()]
+
+    def take_deltas(self) -> Dict[int, Tuple[List[dict], List[str]]]:
+        """Per map: local sessions that changed since the last call (changed fields only) and sessions that left."""
+        dirty, self._dirty = self._dirty, {}
+        left, self._left = self._left, {}
+
+        deltas = {}
+        for mindmap_id in set(dirty) | set(left):
+            entries = self.maps.get(mindmap_id, {})
+            updated = []
+            for session in sorted(dirty.get(mindmap_id, ())):
+                entry = entries.get(session)
+                if entry is None:
+                    continue
+                sent = entry["sent"]
+                if sent is None:
+                    delta = _public(session, entry)
+                else:
+                    delta = {field: entry[field] for field in FIELDS if entry[field] != sent[field]}
+                    if not delta:
+                        continue
+                    delta["session"] = session
+                entry["sent"] = {field: entry[field] for field in FIELDS}
+                updated.append(delta)
+            gone = sorted(left.get(mindmap_id, ()))
+            if updated or gone:
+                deltas[mindmap_id] = (updated, gone)
+        return deltas
+
+    def local_sessions(self) -> Dict[int, List[dict]]:
+        return {
+            mindmap_id: [_public(session, entry) for session, entry in entries.items() if entry["local"]]
+            for mindmap_id, entries in self.maps.items()
+        }
+
+    def _store_remote(self, entries: Dict[str, dict], item: dict) -> None:
+        entries[item["session"]] = {
+            "user_id": item.get("user_id"), **{field: item.get(field) for field in FIELDS},
+            "local": False, "sent": None, "seen": time.monotonic(),
+        }
+
+    def apply_remote(self, mindmap_id: int, updated: List[dict], left: List[str]) -> List[dict]:
+        """
+        Merge another process's delta or heartbeat. Returns the sessions this
+        process did not know yet (e.g. it missed their first delta).
+        """
+        entries = self.maps.get(mindmap_id)
+        if entries is None:
+            return []
+        new = []
+        for item in updated:
+            entry = entries.get(item["session"])
+            if entry is None:
+                # Deltas of unknown sessions lack fields: wait for the next heartbeat
+                if "user_id" in item:
+                    self._store_remote(entries, item)
+                    new.append(item)
+                continue
+            if entry["local"]:
+                continue
+            for field in FIELDS:
+                if field in item:
+                    entry[field] = item[field]
+            entry["seen"] = time.monotonic()
+        for session in left:
+            entry = entries.get(session)
+            if entry is not None and not entry["local"]:
+                del entries[session]
+        return new
+
+    def sweep(self, max_age: float) -> Dict[int, List[str]]:
+        """Drop other processes' sessions not heard of for `max_age` seconds; returns them per map."""
+        deadline = time.monotonic() - max_age
+        expired = {}
+        for mindmap_id, entries in self.maps.items():
+            stale = [s for s, entry in entries.items() if not entry["local"] and entry["seen"] < deadline]
+            for session in stale:
+                del entries[session]
+            if stale:
+                expired[mindmap_id] = sorted(stale)
+        return expired
+
+
+registry = PresenceRegistry()
+
+
+def presence_message(mindmap_id: int, updated: List[dict], left: List[str], kind: str = "presence") -> str:
+    return json.dumps({
+        "type": kind,
+        "mindmap_id": mindmap_id,
+        "updated": updated,
+        "left": left,
+    }, separators=(",", ":"))
+
+
+def load_sessions(mindmap_id: int) -> List[dict]:
+    """Live sessions of a map on all processes, from Redis ([] when Redis is down). Blocking."""
+    try:
+        now = time.time()
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zremrangebyscore(_index_key(mindmap_id), "-inf", now)
+        pipe.zrange(_index_key(mindmap_id), 0, -1)
+        _, sessions = pipe.execute()
+        if not sessions:
+            return []
+        values = redis_client.mget([_session_key(mindmap_id, session) for session in sessions])
+        return [json.loads(value) for value in values if value]
+    except Exception:
+        return []
+
+
+def _mirror(
+    messages: List[Tuple[int, str]],
+    upserts: Dict[int, List[dict]],
+    removals: Dict[int, List[str]],
+) -> None:
+    """Publish deltas / heartbeats and mirror sessions to Redis in one round trip. Blocking."""
+    ttl = settings.PRESENCE_TTL_SECONDS
+    expires_at = time.time() + ttl
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for mindmap_id, message in messages:
+            pipe.publish(channel_for(mindmap_id), f"{INSTANCE_ID} {message}")
+        for mindmap_id, sessions in upserts.items():
+            for item in sessions:
+                pipe.set(_session_key(mindmap_id, item["session"]), json.dumps(item), ex=ttl)
+            pipe.zadd(_index_key(mindmap_id), {item["session"]: expires_at for item in sessions})
+            pipe.expire(_index_key(mindmap_id), ttl)
+        for mindmap_id, sessions in removals.items():
+            pipe.delete(*[_session_key(mindmap_id, session) for session in sessions])
+            pipe.zrem(_index_key(mindmap_id), *sessions)
+        pipe.execute()
+    except Exception:
+        # Presence is best effort: this process's sockets already got the deltas
+        pass
+
+
+async def flush_deltas() -> None:
+    """Send the pending deltas to this process's sockets, then to Redis."""
+    messages, upserts, removals = [], {}, {}
+    for mindmap_id, (updated, left) in registry.take_deltas().items():
+        message = presence_message(mindmap_id, updated, left)
+        await hub.broadcast(mindmap_id, message)
+        messages.append((mindmap_id, message))
+        entries = registry.maps.get(mindmap_id, {})
+        sessions = [_public(item["session"], entries[item["session"]]) for item in updated]
+        if sessions:
+            upserts[mindmap_id] = sessions
+        if left:
+            removals[mindmap_id] = left
+    if messages:
+        await asyncio.to_thread(_mirror, messages, upserts, removals)
+
+
+async def heartbeat() -> None:
+    """Refresh this process's sessions on Redis and drop other processes' stale ones."""
+    sessions = {mindmap_id: items for mindmap_id, items in registry.local_sessions().items() if items}
+    messages = [
+        (mindmap_id, presence_message(mindmap_id, items, [], kind="presence_heartbeat"))
+        for mindmap_id, items in sessions.items()
+    ]
+    await asyncio.to_thread(_mirror, messages, sessions, {})
+
+    for mindmap_id, left in registry.sweep(settings.PRESENCE_TTL_SECONDS).items():
+        await hub.broadcast(mindmap_id, presence_message(mindmap_id, [], left))
+
+
+async def run_presence_flusher() -> None:
+    """
+    Background loop started from the app lifespan.
+    Flushes deltas every PRESENCE_BROADCAST_INTERVAL_SECONDS and heartbeats
+    every PRESENCE_TTL_SECONDS / 3.
+    """
+    loop = asyncio.get_running_loop()
+    next_heartbeat = loop.time()
+    while True:
+        await asyncio.sleep(settings.PRESENCE_BROADCAST_INTERVAL_SECONDS)
+        try:
+            await flush_deltas()
+            if loop.time() >= next_heartbeat:
+                next_heartbeat = loop.time() + settings.PRESENCE_TTL_SECONDS / 3
+                await heartbeat()
+        except Exception:
+            logger.exception("Presence flush failed")
+
+
+async def _apply_remote(channel: str, message: str) -> None:
+    mindmap_id = mindmap_id_of(channel)
+    if mindmap_id not in registry.maps:
+        return
+    try:
+        data: Any = json.loads(message)
+    except ValueError:
+        return
+    new = registry.apply_remote(mindmap_id, data.get("updated", []), data.get("left", []))
+    if data.get("type") == "presence":
+        await hub.broadcast(mindmap_id, message)
+    elif new:
+        # Heartbeats are not forwarded, except for sessions our sockets have not seen yet
+        await hub.broadcast(mindmap_id, presence_message(mindmap_id, new, []))
+
+
+async def run_presence_listener() -> None:
+    """
+    Background loop started from the app lifespan.
+    Applies other processes' presence deltas and heartbeats for the maps this
+    process has sockets for, and forwards the deltas to those sockets.
+    """
+    await subscribe(CHANNEL_PREFIX + "*", _apply_remote)
@@ -1,16 +1,6 @@
 from datetime import datetime, timezone
-import redis
 from ..core.config import settings
-
-# Create Redis client (Upstash requires TLS)
-# Use lazy connection to avoid blocking on startup
-redis_client = redis.from_url(
-    settings.REDIS_URL,
-    decode_responses=True,
-    ssl_cert_reqs=None,  # Required for Upstash
-    socket_connect_timeout=5,
-    socket_timeout=5
-)
+from ..core.redis import redis_client
 
 def get_ai_usage_key(user_id: str) -> str:
     today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
@@ -0,0 +1,266 @@
+# Realtime push of mindmap changes to WebSocket clients (routers/realtime.py).
+# Writers queue a compact event on their session (see bump_version); once the
+# transaction commits, the events are handed to a background publisher (commits run
+# on the event loop, which must not wait on Redis) that puts them on the map's Redis
+# channel. Every process subscribes to all map channels on one connection and
+# forwards each event to its own sockets for that map, so clients connected to any
+# machine see each other's edits. Events only say what changed: clients fetch the data with
+# GET /api/mindmaps/{id}/changes?since=<version>.
+# Without Redis, events still reach the sockets of the process that made the write.
+# On Redis, each message is prefixed with its origin: "*" for messages every process
+# delivers, or the INSTANCE_ID of a process that already delivered it locally.
+# Events whose kinds can change who has access make every socket of the map re-check its
+# user's access (see MindmapHub.join).
+
+# notify: queue an event on a session, published after its commit
+# publish: send a message to every socket of a map, on all processes
+# hub: this process's sockets per mindmap
+# subscribe: consume other processes' messages on a channel pattern (reconnecting)
+# run_event_publisher: background loop publishing committed events, started from the app lifespan
+# run_realtime_listener: background loop started from the app lifespan
+
+import asyncio
+import json
+import logging
+import uuid
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Iterable, Optional, Set, Tuple
+import redis.asyncio as aioredis
+from fastapi import WebSocket
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "mindmap-events:"
+# Identifies this process among the subscribers
+INSTANCE_ID = uuid.uuid4().hex
+# Queued events live in Session.info until commit / rollback
+_PENDING_KEY = "realtime_events"
+# Larger node sets are not listed; clients just sync
+MAX_EVENT_NODE_IDS = 200
+# Event kinds after which sockets re-check their user's access (see versions.bump_version)
+ACCESS_KINDS = {"collaborators", "deleted"}
+
+# Committed events waiting for run_event_publisher, and how to wake it: (its loop, its event)
+_outbox: Deque[Tuple[int, str]] = deque()
+_publisher: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = None
+
+
+def channel_for(mindmap_id: int) -> str:
+    return f"{CHANNEL_PREFIX}{mindmap_id}"
+
+
+def notify(db: Session, mindmap_id: int, version: int, kinds: Iterable[str], node_ids: Iterable[int] = ()) -> None:
+    """Queue a change event for `mindmap_id`; it is published only if the transaction commits."""
+    pending = db.info.setdefault(_PENDING_KEY, {})
+    entry = pending.setdefault(mindmap_id, {"version": 0, "kinds": set(), "node_ids": set()})
+    entry["version"] = max(entry["version"], version)
+    entry["kinds"].update(kinds)
+    entry["node_ids"].update(node_ids)
+
+
+def _event_message(mindmap_id: int, entry: dict) -> str:
+    # One event per map and transaction, however many writes it made
+    node_ids = sorted(entry["node_ids"])
+    return json.dumps({
+        "type": "change",
+        "mindmap_id": mindmap_id,
+        "version": entry["version"],
+        "kinds": sorted(entry["kinds"]),
+        "node_ids": node_ids if len(node_ids) <= MAX_EVENT_NODE_IDS else None,
+    }, separators=(",", ":"))
+
+
+def publish(mindmap_id: int, message: str, delivered_locally: bool = False) -> None:
+    """
+    Fan `message` out to the map's sockets on every process. With
+    delivered_locally, this process's sockets already have it and are skipped.
+    Blocking (one Redis round trip): call it off the event loop.
+    """
+    origin = INSTANCE_ID if delivered_locally else "*"
+    try:
+        redis_client.publish(channel_for(mindmap_id), f"{origin} {message}")
+    except Exception:
+        # Redis unavailable: at least reach the clients connected to this process
+        if not delivered_locally:
+            hub.deliver_threadsafe(mindmap_id, message)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    messages = [(mindmap_id, _event_message(mindmap_id, entry)) for mindmap_id, entry in pending.items()]
+
+    if _publisher is not None:
+        loop, wakeup = _publisher
+        _outbox.extend(messages)
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+            return
+        except RuntimeError:
+            # Publisher's loop closed (shutting down): publish here instead
+            _outbox.clear()
+    # No publisher running (scripts, tests): publish inline
+    for mindmap_id, message in messages:
+        publish(mindmap_id, message)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _changes_access(message: str) -> bool:
+    # Only change events carry kinds; skip parsing drags and presence
+    if not message.startswith('{"type":"change"'):
+        return False
+    return bool(ACCESS_KINDS.intersection(json.loads(message)["kinds"]))
+
+
+class MindmapHub:
+    """WebSockets connected to this process, grouped by mindmap."""
+
+    def __init__(self) -> None:
+        self.sockets: Dict[int, Set[WebSocket]] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # Per socket: coroutine re-checking its user's access after an access event
+        self.access_checks: Dict[WebSocket, Callable[[], Awaitable[None]]] = {}
+        self._checks_running: Set[asyncio.Task] = set()
+
+    def join(
+            self,
+            mindmap_id: int,
+            websocket: WebSocket,
+            check_access: Optional[Callable[[], Awaitable[None]]] = None
+    ) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.sockets.setdefault(mindmap_id, set()).add(websocket)
+        if check_access is not None:
+            self.access_checks[websocket] = check_access
+
+    def leave(self, mindmap_id: int, websocket: WebSocket) -> None:
+        self.access_checks.pop(websocket, None)
+        sockets = self.sockets.get(mindmap_id)
+        if sockets is not None:
+            sockets.discard(websocket)
+            if not sockets:
+                del self.sockets[mindmap_id]
+
+    async def deliver(self, mindmap_id: int, message: str) -> None:
+        """Broadcast an event, then have the map's sockets re-check access if it may have changed."""
+        await self.broadcast(mindmap_id, message)
+        if not _changes_access(message):
+            return
+        for websocket in list(self.sockets.get(mindmap_id, ())):
+            check_access = self.access_checks.get(websocket)
+            if check_access is not None:
+                # In the background: the checks query the database
+                task = asyncio.ensure_future(check_access())
+                self._checks_running.add(task)
+                task.add_done_callback(self._checks_running.discard)
+
+    async def broadcast(self, mindmap_id: int, message: str, exclude: Optional[WebSocket] = None) -> None:
+        for websocket in list(self.sockets.get(mindmap_id, ())):
+            if websocket is exclude:
+                continue
+            try:
+                await websocket.send_text(message)
+            except Exception:
+                # Closed underneath us; its handler will also leave
+                self.leave(mindmap_id, websocket)
+
+    def deliver_threadsafe(self, mindmap_id: int, message: str) -> None:
+        """Broadcast from any thread (e.g. a commit hook outside the event loop)."""
+        if self.loop is None or mindmap_id not in self.sockets:
+            return
+        self.loop.call_soon_threadsafe(
+            lambda: asyncio.ensure_future(self.deliver(mindmap_id, message))
+        )
+
+
+hub = MindmapHub()
+
+
+def mindmap_id_of(channel: str) -> Optional[int]:
+    """The map id at the end of a "<prefix>:<mindmap_id>" channel name."""
+    try:
+        return int(channel.rpartition(":")[2])
+    except ValueError:
+        return None
+
+
+async def subscribe(pattern: str, handle: Callable[[str, str], Awaitable[None]]) -> None:
+    """
+    Await `handle(channel, message)` for every message published on channels matching
+    `pattern` by the other processes (see publish for the origin prefix); reconnects
+    after REALTIME_RETRY_SECONDS when Redis goes away.
+    """
+    while True:
+        client = aioredis.from_url(settings.REDIS_URL, decode_responses=True, ssl_cert_reqs=None)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.psubscribe(pattern)
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                origin, _, data = message["data"].partition(" ")
+                if origin == INSTANCE_ID:
+                    continue
+                await handle(message["channel"], data)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("Redis subscriber for %s lost Redis, retrying in %ss", pattern, settings.REALTIME_RETRY_SECONDS)
+        finally:
+            try:
+                await pubsub.aclose()
+                await client.aclose()
+            except Exception:
+                pass
+        await asyncio.sleep(settings.REALTIME_RETRY_SECONDS)
+
+
+async def _forward_event(channel: str, message: str) -> None:
+    mindmap_id = mindmap_id_of(channel)
+    if mindmap_id in hub.sockets:
+        await hub.deliver(mindmap_id, message)
+
+
+def _publish_outbox() -> None:
+    while _outbox:
+        mindmap_id, message = _outbox.popleft()
+        publish(mindmap_id, message)
+
+
+async def run_event_publisher() -> None:
+    """
+    Background loop started from the app lifespan.
+    Publishes the events of committed transactions, in commit order, off the event
+    loop: a slow or unreachable Redis delays events instead of blocking requests.
+    """
+    global _publisher
+    wakeup = asyncio.Event()
+    _publisher = (asyncio.get_running_loop(), wakeup)
+    try:
+        while True:
+            await wakeup.wait()
+            wakeup.clear()
+            try:
+                await asyncio.to_thread(_publish_outbox)
+            except Exception:
+                logger.exception("Publishing realtime events failed")
+    finally:
+        _publisher = None
+
+
+async def run_realtime_listener() -> None:
+    """
+    Background loop started from the app lifespan.
+    Forwards every map event published on Redis to this process's sockets.
+    """
+    await subscribe(CHANNEL_PREFIX + "*", _forward_event)
@@ -0,0 +1,523 @@
+# Per-mindmap snapshots: a compact binary encoding of every visible node with its votes,
+# plus a change log of the nodes touched since. A map is then loaded from one blob
+# read and a small delta instead of re-deriving everything from `nodes` and `votes`.
+# The log is folded into a new snapshot by a background compactor (or by a read that
+# finds no snapshot / too large a delta).
+
+# record_change: log touched nodes in the writer's transaction
+# load_mindmap_nodes: visible nodes of a map (snapshot + delta), in sibling order
+# parse_node_fields: validate a `?fields=` selection of NodeResponse fields
+# changes_since: delta sync, what changed in a map after a given map version
+# compact_snapshot: rebuild one map's snapshot from the tables and drop the folded changes
+# run_snapshot_compactor: background loop started from the app lifespan
+
+import asyncio
+import logging
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+from fastapi import HTTPException, status
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, load_only
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models import MindMap, MindMapChange, MindMapSnapshot, Node, Vote
+from .versions import bump_version
+from ..utils.tombstones import live_node_ids
+
+logger = logging.getLogger(__name__)
+
+# Blob layout (little endian, zlib-compressed):
+#   header: magic, node count
+#   per node: fixed fields, then title / content / order_key as length-prefixed UTF-8,
+#   then one 16-byte voter id per vote
+_MAGIC = b"BMS1"
+_HEADER = struct.Struct("<4sI")
+# id, parent_id (0 for the root), x, y, is_ai_generated, created_at (us since epoch), vote count
+_NODE = struct.Struct("<IIddBqI")
+_LENGTH = struct.Struct("<I")
+_NULL = 0xFFFFFFFF
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _pack_str(parts: List[bytes], value: Optional[str]) -> None:
+    if value is None:
+        parts.append(_LENGTH.pack(_NULL))
+    else:
+        encoded = value.encode("utf-8")
+        parts.append(_LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+
+
+def _unpack_str(data: bytes, offset: int):
+    (length,) = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+    if length == _NULL:
+        return None, offset
+    return data[offset:offset + length].decode("utf-8"), offset + length
+
+
+def _micros(value: Optional[datetime]) -> int:
+    if value is None:
+        return 0
+    if value.tzinfo is None:
+        # SQLite hands back naive UTC timestamps
+        value = value.replace(tzinfo=timezone.utc)
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def encode_snapshot(nodes: List[dict]) -> bytes:
+    parts = [_HEADER.pack(_MAGIC, len(nodes))]
+    for node in nodes:
+        parts.append(_NODE.pack(
+            node["id"],
+            node["parent_id"] or 0,
+            node["x_position"],
+            node["y_position"],
+            1 if node["is_ai_generated"] else 0,
+            _micros(node["created_at"]),
+            len(node["user_votes"]),
+        ))
+        _pack_str(parts, node["title"])
+        _pack_str(parts, node["content"])
+        _pack_str(parts, node["order_key"])
+        parts.extend(voter.bytes for voter in node["user_votes"])
+    return zlib.compress(b"".join(parts), 1)
+
+
+def decode_snapshot(blob: bytes, mindmap_id: int) -> List[dict]:
+    data = zlib.decompress(blob)
+    magic, count = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC:
+        raise ValueError("Unknown snapshot format")
+
+    nodes = []
+    offset = _HEADER.size
+    for _ in range(count):
+        node_id, parent_id, x, y, is_ai, created_us, vote_count = _NODE.unpack_from(data, offset)
+        offset += _NODE.size
+        title, offset = _unpack_str(data, offset)
+        content, offset = _unpack_str(data, offset)
+        order_key, offset = _unpack_str(data, offset)
+        voters = [UUID(bytes=data[offset + 16 * i:offset + 16 * (i + 1)]) for i in range(vote_count)]
+        offset += 16 * vote_count
+
+        nodes.append({
+            "id": node_id,
+            "title": title,
+            "content": content,
+            "x_position": x,
+            "y_position": y,
+            "parent_id": parent_id or None,
+            "mindmap_id": mindmap_id,
+            "order_key": order_key,
+            "is_ai_generated": bool(is_ai),
+            "vote_count": vote_count,
+            "user_votes": voters,
+            "created_at": _EPOCH + timedelta(microseconds=created_us),
+        })
+    return nodes
+
+
+def _node_dict(node: Node, voters: List[UUID]) -> dict:
+    return {
+        "id": node.id,
+        "title": node.title,
+        "content": node.content,
+        "x_position": node.x_position,
+        "y_position": node.y_position,
+        "parent_id": node.parent_id,
+        "mindmap_id": node.mindmap_id,
+        "order_key": node.order_key,
+        "is_ai_generated": node.is_ai_generated,
+        "vote_count": len(voters),
+        "user_votes": voters,
+        "created_at": node.created_at,
+    }
+
+
+# NodeResponse fields, in declaration order
+NODE_FIELDS = (
+    "id", "mindmap_id", "parent_id", "title", "content", "x_position", "y_position",
+    "order_key", "is_ai_generated", "vote_count", "user_votes", "created_at",
+)
+# Fields computed from `votes` rather than read from `nodes`
+_VOTE_FIELDS = ("vote_count", "user_votes")
+# Always read: needed to order nodes and to hide tombstoned subtrees
+_REQUIRED_FIELDS = ("id", "parent_id", "order_key")
+
+
+def parse_node_fields(raw: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    `?fields=title,x_position,...` as NodeResponse fields in declaration order
+    (`id` is always included), or None for every field. 400 on unknown names.
+    """
+    if raw is None or not raw.strip():
+        return None
+    requested = {name.strip() for name in raw.split(",") if name.strip()}
+    unknown = requested.difference(NODE_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown node fields: {', '.join(sorted(unknown))}"
+        )
+    requested.add("id")
+    return tuple(name for name in NODE_FIELDS if name in requested)
+
+
+def _project(nodes: List[dict], fields: Optional[Sequence[str]]) -> List[dict]:
+    if fields is None:
+        return nodes
+    return [{name: node[name] for name in fields} for node in nodes]
+
+
+def _load_rows(db: Session, node_filter, fields: Optional[Sequence[str]], extra: Sequence[str] = ()) -> List[Node]:
+    """
+    Nodes matching `node_filter`, reading only the columns `fields` needs plus the
+    `extra` ones (every column when `fields` is None).
+    """
+    query = db.query(Node).filter(node_filter)
+    if fields is not None:
+        columns = [
+            getattr(Node, name) for name in NODE_FIELDS
+            if name not in _VOTE_FIELDS and (name in fields or name in _REQUIRED_FIELDS)
+        ]
+        columns += [getattr(Node, name) for name in extra]
+        query = query.options(load_only(*columns))
+    return query.all()
+
+
+def _partial_node_dict(node: Node, fields: Sequence[str], voters: Dict[int, List[UUID]],
+                       counts: Dict[int, int]) -> dict:
+    data = {
+        name: getattr(node, name) for name in NODE_FIELDS
+        if name not in _VOTE_FIELDS and (name in fields or name in _REQUIRED_FIELDS)
+    }
+    if "user_votes" in fields:
+        data["user_votes"] = voters.get(node.id, [])
+    if "vote_count" in fields:
+        data["vote_count"] = len(voters[node.id]) if node.id in voters else counts.get(node.id, 0)
+    return data
+
+
+def _votes_for(db: Session, node_filter, fields: Optional[Sequence[str]]) -> Tuple[Dict[int, List[UUID]], Dict[int, int]]:
+    """(voters, vote counts) per node, reading from `votes` only what `fields` needs."""
+    if fields is None or "user_votes" in fields:
+        return _voters_by_node(db, node_filter), {}
+    if "vote_count" in fields:
+        counts = db.query(Vote.node_id, func.count()).filter(node_filter).group_by(Vote.node_id).all()
+        return {}, dict(counts)
+    return {}, {}
+
+
+def _voters_by_node(db: Session, node_filter) -> Dict[int, List[UUID]]:
+    voters: Dict[int, List[UUID]] = {}
+    for node_id, user_id in db.query(Vote.node_id, Vote.user_id).filter(node_filter).all():
+        voters.setdefault(node_id, []).append(user_id)
+    return voters
+
+
+def _sort(nodes: Iterable[dict]) -> List[dict]:
+    return sorted(nodes, key=lambda n: (n["order_key"], n["id"]))
+
+
+def load_nodes_from_tables(db: Session, mindmap_id: int, fields: Optional[Sequence[str]] = None) -> List[dict]:
+    """
+    Every visible node of the map with its votes, in two queries.
+    With `fields`, only the columns they need are read (see parse_node_fields)
+    and the dicts also carry the fields needed for ordering.
+    """
+    live = Node.id.in_(live_node_ids(mindmap_id))
+    nodes = _load_rows(db, (Node.mindmap_id == mindmap_id) & live, fields)
+    voters, counts = _votes_for(db, Vote.node_id.in_(live_node_ids(mindmap_id)), fields)
+    if fields is None:
+        return _sort(_node_dict(node, voters.get(node.id, [])) for node in nodes)
+    return _sort(_partial_node_dict(node, fields, voters, counts) for node in nodes)
+
+
+def record_change(
+    db: Session,
+    mindmap_id: int,
+    node_ids: Iterable[int] = (),
+    layout: bool = False,
+    reset: bool = False,
+    voted_node_ids: Iterable[int] = (),
+    moved_node_ids: Iterable[int] = (),
+) -> None:
+    """
+    Log a write to the map's nodes or votes; call it in the writer's transaction.
+    Also bumps the map's version, invalidating its ETags and notifying its
+    realtime subscribers; the entries are stamped with the new version.
+    - node_ids: nodes created, updated or tombstoned
+    - layout: positions of (potentially) every node changed
+    - reset: too much changed to replay (e.g. imports); the next read rebuilds
+    - voted_node_ids: nodes whose votes changed
+    - moved_node_ids: nodes whose position alone changed (live dragging)
+    """
+    node_ids, voted_node_ids, moved_node_ids = list(node_ids), list(voted_node_ids), list(moved_node_ids)
+
+    def entry(kind, node_id=None):
+        return MindMapChange(mindmap_id=mindmap_id, kind=kind, node_id=node_id)
+
+    changes = [entry("node", node_id) for node_id in node_ids]
+    changes += [entry("vote", node_id) for node_id in voted_node_ids]
+    changes += [entry("move", node_id) for node_id in moved_node_ids]
+    if layout:
+        changes.append(entry("layout"))
+    if reset:
+        changes.append(entry("reset"))
+
+    version = bump_version(
+        db, mindmap_id, {change.kind for change in changes}, node_ids + voted_node_ids + moved_node_ids
+    )
+    for change in changes:
+        change.version = version
+    db.add_all(changes)
+
+
+def _apply_changes(db: Session, mindmap_id: int, nodes: List[dict], changes: List[MindMapChange],
+                   fields: Optional[Sequence[str]] = None) -> List[dict]:
+    by_id = {node["id"]: node for node in nodes}
+
+    touched = {change.node_id for change in changes if change.kind in ("node", "vote", "move")}
+    if touched:
+        # Visibility needs mindmap_id and deleted_at whatever was selected
+        rows = {
+            node.id: node
+            for node in _load_rows(db, Node.id.in_(touched), fields, extra=("mindmap_id", "deleted_at"))
+        }
+        voters, counts = _votes_for(db, Vote.node_id.in_(touched), fields)
+        for node_id in touched:
+            node = rows.get(node_id)
+            if node is None or node.deleted_at is not None or node.mindmap_id != mindmap_id:
+                by_id.pop(node_id, None)
+            elif fields is None:
+                by_id[node_id] = _node_dict(node, voters.get(node_id, []))
+            else:
+                by_id[node_id] = _partial_node_dict(node, fields, voters, counts)
+
+    positions_wanted = fields is None or "x_position" in fields or "y_position" in fields
+    if positions_wanted and any(change.kind == "layout" for change in changes):
+        positions = db.query(Node.id, Node.x_position, Node.y_position).filter(
+            Node.mindmap_id == mindmap_id
+        ).all()
+        for node_id, x, y in positions:
+            if node_id in by_id:
+                by_id[node_id]["x_position"] = x
+                by_id[node_id]["y_position"] = y
+
+    # Tombstoning a node hides its subtree: keep only nodes still reachable from a root
+    visible: Dict[int, bool] = {}
+    for node_id in by_id:
+        path = []
+        current = node_id
+        while current is not None and current not in visible and current in by_id:
+            path.append(current)
+            current = by_id[current]["parent_id"]
+        if current is None:
+            reachable = True
+        else:
+            reachable = visible.get(current, False)
+        for seen in path:
+            visible[seen] = reachable
+
+    return _sort(node for node_id, node in by_id.items() if visible[node_id])
+
+
+def store_snapshot(db: Session, mindmap_id: int, nodes: List[dict], changes: List[MindMapChange]) -> None:
+    """
+    Save `nodes` as the map's snapshot and drop the changes it folds in.
+    Only the given change rows are deleted: any change committed meanwhile
+    stays in the log and is replayed on top (replaying is idempotent).
+    Map versions are assigned under the map's row lock, so those later changes
+    all carry a higher version than the ones dropped here (the new horizon).
+    """
+    version = max((change.id for change in changes), default=0)
+    horizon = max((change.version for change in changes), default=0)
+    snapshot = db.get(MindMapSnapshot, mindmap_id)
+    if snapshot is None:
+        db.add(MindMapSnapshot(mindmap_id=mindmap_id, version=version, horizon=horizon,
+                               data=encode_snapshot(nodes)))
+    else:
+        snapshot.version = max(version, snapshot.version)
+        snapshot.horizon = max(horizon, snapshot.horizon)
+        snapshot.data = encode_snapshot(nodes)
+        snapshot.created_at = func.now()
+
+    change_ids = [change.id for change in changes]
+    for start in range(0, len(change_ids), 1000):
+        db.query(MindMapChange).filter(
+            MindMapChange.id.in_(change_ids[start:start + 1000])
+        ).delete(synchronize_session=False)
+
+
+def load_mindmap_nodes(db: Session, mindmap_id: int, fields: Optional[Sequence[str]] = None) -> List[dict]:
+    """
+    Visible nodes of a map as NodeResponse-shaped dicts, ordered by (order_key, id).
+    Served from the snapshot plus the pending changes when possible; otherwise
+    rebuilt from the tables, and the result saved as the new snapshot.
+    With `fields` (see parse_node_fields) the dicts only hold those fields, and
+    only the columns they need are read from `nodes` / `votes`: a missing
+    snapshot is then not rebuilt, the next full read does it.
+    """
+    # Read the log before the snapshot: a compaction in between only means replaying more
+    changes = db.query(MindMapChange).filter(
+        MindMapChange.mindmap_id == mindmap_id
+    ).order_by(MindMapChange.id).all()
+    snapshot = db.get(MindMapSnapshot, mindmap_id)
+
+    replayable = (
+        snapshot is not None
+        and len(changes) <= settings.SNAPSHOT_MAX_DELTA
+        and not any(change.kind == "reset" for change in changes)
+    )
+    if replayable:
+        try:
+            nodes = decode_snapshot(snapshot.data, mindmap_id)
+            return _project(_apply_changes(db, mindmap_id, nodes, changes, fields), fields)
+        except ValueError:
+            logger.warning("Discarding unreadable snapshot of mindmap %s", mindmap_id)
+
+    if fields is not None:
+        return _project(load_nodes_from_tables(db, mindmap_id, fields), fields)
+
+    nodes = load_nodes_from_tables(db, mindmap_id)
+    try:
+        store_snapshot(db, mindmap_id, nodes, changes)
+        db.commit()
+    except IntegrityError:
+        # A concurrent read stored the snapshot first
+        db.rollback()
+    return nodes
+
+
+def changes_since(db: Session, mindmap_id: int, since: int) -> dict:
+    """
+    What changed in a map after version `since`, shaped like MindMapChangesResponse.
+    Touched nodes are re-read: visible ones are returned whole (or just their votes
+    or position when only those changed), the others as deleted ids. A relayout
+    returns every position. Asks for a full reload when the log no longer reaches back to `since`
+    (compacted away), when `since` is unknown, or after a reset.
+    """
+    title, version = db.query(MindMap.name, MindMap.version).filter(MindMap.id == mindmap_id).one()
+    result = {
+        "mindmap_id": mindmap_id,
+        "title": title,
+        "version": version,
+        "full_reload": False,
+        "nodes": [],
+        "deleted_node_ids": [],
+        "votes": [],
+        "positions": [],
+    }
+    if since == version:
+        return result
+
+    # Read the log before the horizon: a compaction in between raises the horizon
+    changes = db.query(MindMapChange.kind, MindMapChange.node_id).filter(
+        MindMapChange.mindmap_id == mindmap_id,
+        MindMapChange.version > since
+    ).all()
+    horizon = db.query(MindMapSnapshot.horizon).filter(
+        MindMapSnapshot.mindmap_id == mindmap_id
+    ).scalar() or 0
+
+    if since > version or since < horizon or any(kind == "reset" for kind, _ in changes):
+        result["full_reload"] = True
+        return result
+
+    edited = {node_id for kind, node_id in changes if kind == "node"}
+    voted = {node_id for kind, node_id in changes if kind == "vote"} - edited
+    moved = {node_id for kind, node_id in changes if kind == "move"} - edited
+    touched = edited | voted
+    if touched:
+        live = Node.id.in_(live_node_ids(mindmap_id))
+        rows = db.query(Node).filter(Node.id.in_(touched), live).all()
+        voters = _voters_by_node(db, Vote.node_id.in_([node.id for node in rows]))
+
+        visible = set()
+        for node in rows:
+            visible.add(node.id)
+            node_voters = voters.get(node.id, [])
+            if node.id in edited:
+                result["nodes"].append(_node_dict(node, node_voters))
+            else:
+                result["votes"].append({
+                    "node_id": node.id,
+                    "vote_count": len(node_voters),
+                    "user_votes": node_voters,
+                })
+        result["nodes"] = _sort(result["nodes"])
+        result["deleted_node_ids"] = sorted(touched - visible)
+
+    relayout = any(kind == "layout" for kind, _ in changes)
+    if relayout or moved:
+        positions = db.query(Node.id, Node.x_position, Node.y_position).filter(
+            Node.id.in_(live_node_ids(mindmap_id))
+        )
+        if not relayout:
+            positions = positions.filter(Node.id.in_(moved))
+        positions = positions.order_by(Node.id).all()
+        result["positions"] = [
+            {"id": node_id, "x_position": x, "y_position": y} for node_id, x, y in positions
+        ]
+
+    return result
+
+
+def compact_snapshot(db: Session, mindmap_id: int) -> None:
+    """Rebuild one map's snapshot from the tables and drop the changes folded into it."""
+    changes = db.query(MindMapChange).filter(MindMapChange.mindmap_id == mindmap_id).all()
+    store_snapshot(db, mindmap_id, load_nodes_from_tables(db, mindmap_id), changes)
+    db.commit()
+
+
+def compact_pending(db: Session, min_changes: int, limit: int, mindmap_id: Optional[int] = None) -> int:
+    """
+    Compact up to `limit` maps (or just `mindmap_id`) with at least `min_changes` logged
+    changes, those waiting longest first. Returns maps compacted.
+    """
+    query = db.query(MindMapChange.mindmap_id)
+    if mindmap_id is not None:
+        query = query.filter(MindMapChange.mindmap_id == mindmap_id)
+    # Oldest pending change first, so every map is reached however many others keep logging
+    pending_ids = [
+        row.mindmap_id
+        for row in query.group_by(MindMapChange.mindmap_id)
+        .having(func.count(MindMapChange.id) >= min_changes)
+        .order_by(func.min(MindMapChange.id))
+        .limit(limit)
+        .all()
+    ]
+    for pending_id in pending_ids:
+        compact_snapshot(db, pending_id)
+    return len(pending_ids)
+
+
+def _compact_once() -> int:
+    db = SessionLocal()
+    try:
+        return compact_pending(db, settings.SNAPSHOT_COMPACT_MIN_CHANGES, settings.SNAPSHOT_COMPACT_BATCH)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def run_snapshot_compactor() -> None:
+    """
+    Background loop started from the app lifespan.
+    Every SNAPSHOT_COMPACT_INTERVAL_SECONDS, folds the change log of busy maps
+    into fresh snapshots so reads keep replaying only a small delta.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(_compact_once)
+        except Exception:
+            logger.exception("Snapshot compaction pass failed")
+        await asyncio.sleep(settings.SNAPSHOT_COMPACT_INTERVAL_SECONDS)
@@ -0,0 +1,98 @@
+# Per-mindmap version counter and HTTP validators built on it.
+# Every write to a map's nodes, votes or collaborators bumps `mindmaps.version` in the
+# writer's transaction, so a GET can tell whether anything changed with one primary-key
+# lookup and answer 304 Not Modified without loading any nodes.
+
+# bump_version: increment a map's version and queue its realtime event (call in the writer's transaction)
+# current_version: a map's current version, 404 if the map is gone
+# make_etag / current_etag: strong ETag of a given / the current version (per representation, see etag_variant)
+# not_modified: whether the request's If-None-Match already names that ETag
+# not_modified_response: the 304 answer for such a request
+# with_etag: attach the ETag (and a revalidate-every-time policy) to a response
+
+from typing import Iterable, Optional
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from ..models import MindMap
+from .realtime import notify
+
+# Browsers may keep the body but must revalidate it on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+def bump_version(db: Session, mindmap_id: int, kinds: Iterable[str], node_ids: Iterable[int] = ()) -> int:
+    """
+    Increment the map's version and return it. `kinds` / `node_ids` describe the
+    write for the realtime event sent to the map's sockets once the transaction commits.
+    """
+    version = db.execute(
+        update(MindMap)
+        .where(MindMap.id == mindmap_id)
+        .values(version=MindMap.version + 1)
+        .returning(MindMap.version)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    notify(db, mindmap_id, version, kinds, node_ids)
+    return version
+
+
+def current_version(db: Session, mindmap_id: int) -> int:
+    version = db.query(MindMap.version).filter(
+        MindMap.id == mindmap_id,
+        MindMap.deleted_at.is_(None)
+    ).scalar()
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Mindmap not found"
+        )
+    return version
+
+
+def make_etag(mindmap_id: int, version: int, variant: Optional[str] = None) -> str:
+    # Each representation of a version (e.g. JSON / MessagePack) needs its own strong ETag
+    suffix = f"-{variant}" if variant else ""
+    return f'"{mindmap_id}.{version}{suffix}"'
+
+
+def etag_variant(*parts: Optional[str]) -> Optional[str]:
+    """Combine what distinguishes a representation (format, field selection...) into one variant."""
+    parts = [part for part in parts if part]
+    return "-".join(parts) or None
+
+
+def current_etag(db: Session, mindmap_id: int, variant: Optional[str] = None) -> str:
+    return make_etag(mindmap_id, current_version(db, mindmap_id), variant)
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison: a W/ prefix does not matter
+    candidates = (tag.strip() for tag in header.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def not_modified_response(etag: str, vary: Optional[str] = None) -> Response:
+    response = Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    )
+    if vary:
+        response.headers["Vary"] = vary
+    return response
+
+
+def with_etag(response: Response, etag: Optional[str], vary: Optional[str] = None) -> Response:
+    """`vary` names the request headers the representation was negotiated on.
+    With etag None (unversioned content) only the caching headers are set."""
+    if etag:
+        response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if vary:
+        response.headers["Vary"] = vary
+    return response
@@ -0,0 +1,226 @@
+# Write-behind voting (settings.VOTE_WRITE_BEHIND, off by default).
+# Votes and unvotes are recorded in Redis instead of being committed one by one: each map
+# has an "add" and a "remove" set of "node_id:user_id" members, and a vote moves its member
+# from one to the other in a single MULTI. Repeating a vote is a no-op (SADD), and the last
+# of a vote / unvote wins. Every VOTE_FLUSH_INTERVAL_SECONDS the flusher moves a map's sets
+# aside ("flushing"), writes them with batched INSERT ... ON CONFLICT DO NOTHING / DELETE
+# statements and logs one vote change for the map, so the whole batch bumps its version once.
+# Until a vote is flushed, reads merge the pending sets over `votes` (pending_voters), so
+# counts are current right away. Without Redis, votes go straight to the database.
+
+# buffer_vote: record a vote / unvote; False when Redis is unavailable
+# pending_voters: voters of the nodes with pending votes, pending state merged over `votes`
+# apply_pending_votes: override the vote fields of node dicts with pending_voters' result
+# flush_votes: write one map's pending votes
+# run_vote_flusher: background loop started from the app lifespan
+
+import asyncio
+import logging
+import uuid
+from typing import Dict, Iterable, List, Tuple
+from uuid import UUID
+import redis
+from sqlalchemy import delete, tuple_
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..core.redis import redis_client, release_lock
+from ..models import Node, User, Vote
+from ..utils.bulk import dialect_insert
+from .popularity import record_votes
+from .snapshots import record_change
+
+logger = logging.getLogger(__name__)
+
+# Maps that may have pending votes
+MAPS_KEY = "vote_buffer:maps"
+
+Pair = Tuple[int, UUID]
+
+
+def _key(mindmap_id: int, name: str) -> str:
+    return f"vote_buffer:{mindmap_id}:{name}"
+
+
+def _pair(member: str) -> Pair:
+    node_id, user_id = member.split(":", 1)
+    return int(node_id), UUID(user_id)
+
+
+def buffer_vote(mindmap_id: int, node_id: int, user_id, voted: bool) -> bool:
+    """Record that `user_id` voted (or unvoted) `node_id`; False if Redis is unavailable."""
+    if not settings.VOTE_WRITE_BEHIND:
+        return False
+    member = f"{node_id}:{user_id}"
+    source, target = ("remove", "add") if voted else ("add", "remove")
+    try:
+        pipe = redis_client.pipeline()
+        pipe.srem(_key(mindmap_id, source), member)
+        pipe.sadd(_key(mindmap_id, target), member)
+        pipe.sadd(MAPS_KEY, mindmap_id)
+        pipe.execute()
+    except Exception:
+        logger.warning("Vote buffer unavailable, writing vote directly", exc_info=True)
+        return False
+    return True
+
+
+def _pending_state(mindmap_id: int) -> Dict[Pair, bool]:
+    # Sets being flushed first: anything recorded since overrides them
+    pipe = redis_client.pipeline()
+    for name in ("flushing_add", "flushing_remove", "add", "remove"):
+        pipe.smembers(_key(mindmap_id, name))
+    flushing_add, flushing_remove, add, remove = pipe.execute()
+
+    state: Dict[Pair, bool] = {}
+    for members, voted in ((flushing_add, True), (flushing_remove, False), (add, True), (remove, False)):
+        for member in members:
+            state[_pair(member)] = voted
+    return state
+
+
+def pending_voters(db: Session, mindmap_id: int) -> Dict[int, List[UUID]]:
+    """
+    Voters of every node of the map that has votes not flushed yet, as they will be
+    once flushed. Empty when write-behind is off, nothing is pending or Redis is down.
+    """
+    if not settings.VOTE_WRITE_BEHIND:
+        return {}
+    try:
+        state = _pending_state(mindmap_id)
+    except Exception:
+        return {}
+    if not state:
+        return {}
+
+    voters: Dict[int, List[UUID]] = {node_id: [] for node_id, _ in state}
+    for node_id, user_id in db.query(Vote.node_id, Vote.user_id).filter(Vote.node_id.in_(list(voters))).all():
+        voters[node_id].append(user_id)
+    for (node_id, user_id), voted in state.items():
+        if voted and user_id not in voters[node_id]:
+            voters[node_id].append(user_id)
+        elif not voted and user_id in voters[node_id]:
+            voters[node_id].remove(user_id)
+    return voters
+
+
+def apply_pending_votes(nodes: Iterable[dict], voters: Dict[int, List[UUID]]) -> None:
+    """Override user_votes / vote_count (whichever the dicts carry) of nodes with pending votes."""
+    if not voters:
+        return
+    for node in nodes:
+        node_voters = voters.get(node["id"])
+        if node_voters is None:
+            continue
+        if "user_votes" in node:
+            node["user_votes"] = list(node_voters)
+        if "vote_count" in node:
+            node["vote_count"] = len(node_voters)
+
+
+def _chunks(items: List, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _write(db: Session, mindmap_id: int, adds: List[Pair], removes: List[Pair]) -> int:
+    # Votes on nodes / by users deleted meanwhile are dropped rather than failing the batch
+    node_ids = {node_id for node_id, _ in adds + removes}
+    nodes = {node_id for node_id, in db.query(Node.id).filter(
+        Node.id.in_(sorted(node_ids)), Node.mindmap_id == mindmap_id
+    )}
+    user_ids = {user_id for _, user_id in adds}
+    users = {user_id for user_id, in db.query(User.id).filter(User.id.in_(list(user_ids)))} if user_ids else set()
+
+    rows = [{"node_id": node_id, "user_id": user_id} for node_id, user_id in adds
+            if node_id in nodes and user_id in users]
+    for chunk in _chunks(rows, settings.VOTE_FLUSH_BATCH):
+        db.execute(
+            dialect_insert(db, Vote.__table__).values(chunk).on_conflict_do_nothing(
+                index_elements=["user_id", "node_id"]
+            )
+        )
+    for chunk in _chunks(removes, settings.VOTE_FLUSH_BATCH):
+        db.execute(delete(Vote).where(tuple_(Vote.node_id, Vote.user_id).in_(chunk)))
+
+    touched = sorted(node_id for node_id in node_ids if node_id in nodes)
+    if touched:
+        record_change(db, mindmap_id, voted_node_ids=touched)
+    db.commit()
+
+    record_votes(db, mindmap_id, touched)
+    return len(rows) + len(removes)
+
+
+def _forget_if_idle(mindmap_id: int) -> None:
+    # Drop the map from MAPS_KEY unless a vote came in meanwhile
+    with redis_client.pipeline() as pipe:
+        try:
+            pipe.watch(_key(mindmap_id, "add"), _key(mindmap_id, "remove"))
+            if not pipe.exists(_key(mindmap_id, "add"), _key(mindmap_id, "remove")):
+                pipe.multi()
+                pipe.srem(MAPS_KEY, mindmap_id)
+                pipe.execute()
+        except redis.WatchError:
+            pass
+
+
+def flush_votes(db: Session, mindmap_id: int) -> int:
+    """
+    Write one map's pending votes in batched statements; returns how many were written.
+    One process at a time flushes a map; sets left over by a failed flush are retried
+    before new votes are taken.
+    """
+    lock_key = _key(mindmap_id, "lock")
+    token = uuid.uuid4().hex
+    if not redis_client.set(lock_key, token, nx=True, px=int(settings.VOTE_FLUSH_LOCK_SECONDS * 1000)):
+        return 0
+    try:
+        flushing_add, flushing_remove = _key(mindmap_id, "flushing_add"), _key(mindmap_id, "flushing_remove")
+        if not redis_client.exists(flushing_add, flushing_remove):
+            pipe = redis_client.pipeline()
+            pipe.sunionstore(flushing_add, [_key(mindmap_id, "add")])
+            pipe.sunionstore(flushing_remove, [_key(mindmap_id, "remove")])
+            pipe.delete(_key(mindmap_id, "add"), _key(mindmap_id, "remove"))
+            pipe.execute()
+
+        pipe = redis_client.pipeline()
+        pipe.smembers(flushing_add)
+        pipe.smembers(flushing_remove)
+        adds, removes = pipe.execute()
+        written = 0
+        if adds or removes:
+            written = _write(db, mindmap_id, [_pair(m) for m in adds], [_pair(m) for m in removes])
+        redis_client.delete(flushing_add, flushing_remove)
+        _forget_if_idle(mindmap_id)
+        return written
+    finally:
+        release_lock(redis_client, lock_key, token)
+
+
+def _flush_all() -> None:
+    for mindmap_id in redis_client.smembers(MAPS_KEY):
+        db = SessionLocal()
+        try:
+            flush_votes(db, int(mindmap_id))
+        except Exception:
+            db.rollback()
+            logger.exception("Flushing buffered votes of mindmap %s failed", mindmap_id)
+        finally:
+            db.close()
+
+
+async def run_vote_flusher() -> None:
+    """
+    Background loop started from the app lifespan: flushes buffered votes every
+    VOTE_FLUSH_INTERVAL_SECONDS. Returns at once unless VOTE_WRITE_BEHIND is set.
+    Votes still buffered at shutdown stay in Redis for the next flush, by any process.
+    """
+    if not settings.VOTE_WRITE_BEHIND:
+        return
+    while True:
+        await asyncio.sleep(settings.VOTE_FLUSH_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(_flush_all)
+        except Exception:
+            logger.exception("Vote flush failed")
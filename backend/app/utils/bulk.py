@@ -0,0 +1,98 @@
+# Bulk loading helpers for large writes (imports, clones).
+# Rows get their primary keys up front so children can reference parents before
+# anything is written, then go to the database in one streamed COPY on Postgres
+# (executemany elsewhere, e.g. SQLite in tests and local development).
+
+# reserve_ids: allocate `count` primary keys for a table
+# next_id_column: SQL expression numbering the rows of an INSERT ... SELECT with fresh ids
+# bulk_insert: write rows with explicit primary keys in as few round trips as possible
+# dialect_insert: INSERT construct supporting .on_conflict_do_nothing() on the session's database
+
+import io
+from typing import Any, List, Sequence
+from uuid import UUID
+from sqlalchemy import Table, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def reserve_ids(db: Session, table: Table, count: int) -> List[int]:
+    """Allocate `count` ids for `table` (whose primary key is `id`)."""
+    if count <= 0:
+        return []
+
+    if _is_postgres(db):
+        rows = db.execute(
+            text(
+                f"SELECT nextval(pg_get_serial_sequence('{table.name}', 'id')) "
+                "FROM generate_series(1, :count)"
+            ),
+            {"count": count},
+        ).scalars().all()
+        return sorted(rows)
+
+    # SQLite serialises writers, so max(id) is stable inside our transaction
+    start = db.execute(text(f"SELECT coalesce(max(id), 0) FROM {table.name}")).scalar()
+    return list(range(start + 1, start + count + 1))
+
+
+def next_id_column(db: Session, table: Table, order_by):
+    """Fresh primary key per selected row, for id remapping done entirely in SQL.
+    Postgres draws from the table's sequence; elsewhere rows are numbered after max(id)."""
+    if _is_postgres(db):
+        return func.nextval(func.pg_get_serial_sequence(table.name, "id"))
+
+    start = select(func.coalesce(func.max(table.c.id), 0)).scalar_subquery()
+    return start + func.row_number().over(order_by=order_by)
+
+
+def _csv_value(value: Any) -> str:
+    # Unquoted empty field is NULL in COPY's CSV format; strings are always quoted
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, UUID):
+        value = str(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def bulk_insert(db: Session, table: Table, columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> None:
+    """Insert rows (tuples ordered like `columns`) inside the session's transaction.
+    Columns left out fall back to their server defaults."""
+    if not rows:
+        return
+
+    if _is_postgres(db):
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write(",".join(_csv_value(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+
+        # Raw DBAPI (psycopg2) connection of the session's current transaction
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        finally:
+            cursor.close()
+        return
+
+    db.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+
+def dialect_insert(db: Session, table: Table):
+    """INSERT for `table` in the session's dialect, e.g.
+    `dialect_insert(db, table).values(...).on_conflict_do_nothing(index_elements=["id"])`."""
+    if _is_postgres(db):
+        return postgresql.insert(table)
+    return sqlite.insert(table)
@@ -0,0 +1,59 @@
+# Small in-process caches shared by the hot request paths.
+
+# TTLCache: bounded LRU map whose entries also expire at an absolute (wall clock) time
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Least-recently-used cache holding at most `max_entries` items.
+    Each entry expires at the time given to set() (seconds since the epoch, like
+    JWT `exp`), capped at `ttl` seconds from now. Thread-safe.
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> None:
+        expires_at = min(time.time() + self.ttl, expires_at if expires_at is not None else float("inf"))
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_matching(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Drop every key for which predicate(key) is true (a full scan; for rare invalidations)."""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
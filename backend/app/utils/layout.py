@@ -6,9 +6,12 @@
 # compute_layout: compute the canonical (x, y) coordinates for every node in the mindmap
 # apply_layout: persist the computed layout positions into the database
 
+from collections import deque
 from typing import Dict, Tuple, Any, List
-from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.orm import Session, load_only
 from ..models import Node
+from .tombstones import live_node_ids
 import math
 
 BASE_RADIUS = 250
@@ -20,7 +23,13 @@ def load_tree(db: Session, mindmap_id: int) -> Any:
     The returned structure is what compute_layout() will use to produce (x, y) coordinates,
     since tree-based layout algorithms require knowing the full hierarchy of parents
     and children."""
-    nodes: List[Node] = db.query(Node).filter(Node.mindmap_id == mindmap_id).all()
+    # Only the tree structure is needed, so skip titles/content on large maps
+    nodes: List[Node] = db.query(Node).options(
+        load_only(Node.id, Node.parent_id, Node.order_key)
+    ).filter(
+        Node.mindmap_id == mindmap_id,
+        Node.id.in_(live_node_ids(mindmap_id))
+    ).all()
 
     if not nodes:
         return {
@@ -43,13 +52,13 @@ def load_tree(db: Session, mindmap_id: int) -> Any:
             children[node.parent_id].append(node)
 
     for parent_id in children:
-        children[parent_id].sort(key=lambda n: n.order_index)
+        children[parent_id].sort(key=lambda n: (n.order_key, n.id))
     
     depth: Dict[int, int] = {root.id: 0}
-    queue = [root]
+    queue = deque([root])
 
     while queue:
-        current = queue.pop(0)
+        current = queue.popleft()
         current_depth = depth[current.id]
 
         for child in children[current.id]:
@@ -69,14 +78,16 @@ def _compute_subtree_sizes(node_id: int, children: Dict[int, List[Any]]) -> Dict
     Larger subtrees need more angular space in the radial layout."""
     sizes: Dict[int, int] = {}
 
-    def dfs(node_id: int) -> int:
-        size = 1
-        for child in children[node_id]:
-            size += dfs(child.id)
-        sizes[node_id] = size
-        return size
+    # Iterative post-order walk: deep outlines would overflow the recursion limit
+    stack = [(node_id, False)]
+    while stack:
+        current, children_done = stack.pop()
+        if children_done:
+            sizes[current] = 1 + sum(sizes[child.id] for child in children[current])
+        else:
+            stack.append((current, True))
+            stack.extend((child.id, False) for child in children[current])
 
-    dfs(node_id)
     return sizes
 
 
@@ -109,10 +120,10 @@ def compute_layout(tree: Any) -> Dict[int, Tuple[float, float]]:
     positions[root.id] = (0.0, 0.0)
     wedges[root.id] = (0.0, 2 * math.pi)
 
-    queue = [root]
+    queue = deque([root])
 
     while queue:
-        parent = queue.pop(0)
+        parent = queue.popleft()
         parent_x, parent_y = positions[parent.id]
         parent_start, parent_end = wedges[parent.id]
         child_list = children[parent.id]
@@ -182,14 +193,14 @@ def apply_layout(db: Session, positions: Dict[int, Tuple[float, float]]) -> None
     if not positions:
         return
 
-    for node_id, (x, y) in positions.items():
-        db.query(Node).filter(Node.id == node_id).update(
-            {
-                Node.x_position: x,
-                Node.y_position: y,
-            },
-            synchronize_session=False,
-        )
-    
+    # One executemany UPDATE by primary key instead of a statement per node
+    db.execute(
+        update(Node),
+        [
+            {"id": node_id, "x_position": x, "y_position": y}
+            for node_id, (x, y) in positions.items()
+        ],
+    )
+
     # we commit the changes after calling this function, externally
 
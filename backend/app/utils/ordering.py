@@ -0,0 +1,148 @@
+# Fractional (LexoRank-style) ordering keys for siblings.
+# Siblings are ordered by `order_key` (ties broken by id), compared as plain strings.
+# A new key can always be generated between any two existing keys, so inserting
+# anywhere never renumbers other siblings.
+
+# key_between: key strictly between two keys (None means open-ended)
+# key_after: short key strictly after a key, used for appends
+# sequence_key: fixed-width keys for bulk loads of many siblings at once
+# sibling_order_key: key for a node placed among its siblings in the database
+
+import random
+from typing import Optional
+from sqlalchemy.orm import Session
+from ..models import Node
+
+# Lowercase base-36 only, so byte order and Postgres collations agree
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+# Keys never end with the smallest digit, which keeps room between any two keys
+_SMALLEST = DIGITS[0]
+
+
+def _midpoint(a: str, b: Optional[str]) -> str:
+    """Key strictly between a and b, where a may be "" and b None means +infinity."""
+    if b is not None:
+        # Copy the common prefix, padding a with the smallest digit
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else _SMALLEST) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else BASE
+
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+
+    # Adjacent digits: b[0] alone already sits between a and b if b is longer
+    if b is not None and len(b) > 1:
+        return b[0]
+
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _validate(key: str) -> None:
+    if not key or key[-1] == _SMALLEST or any(c not in DIGITS for c in key):
+        raise ValueError(f"Invalid order key: {key!r}")
+
+
+def _jitter(key: str, upper: Optional[str]) -> str:
+    """Append a random digit so concurrent inserts at the same spot get distinct keys.
+    Skipped when the key is a prefix of the upper bound (the suffix could overshoot it)."""
+    if upper is not None and upper.startswith(key):
+        return key
+    return key + random.choice(DIGITS[1:])
+
+
+def key_between(a: Optional[str], b: Optional[str], jitter: bool = False) -> str:
+    """Return a key strictly between a and b. None means no bound on that side."""
+    if a is not None:
+        _validate(a)
+    if b is not None:
+        _validate(b)
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"Order keys out of order: {a!r} >= {b!r}")
+
+    key = _midpoint(a or "", b)
+    return _jitter(key, b) if jitter else key
+
+
+def key_after(a: Optional[str], jitter: bool = False) -> str:
+    """Return a short key strictly after a, used for appends.
+    Increments the first digit that can still grow, so keys stay short on long runs."""
+    if a is None:
+        key = _midpoint("", None)
+    else:
+        _validate(a)
+        for i, char in enumerate(a):
+            if char != DIGITS[-1]:
+                key = a[:i] + DIGITS[DIGITS.index(char) + 1]
+                break
+        else:
+            # Every digit is maxed out: grow by the smallest digit a key may end with
+            key = a + DIGITS[1]
+
+    return _jitter(key, None) if jitter else key
+
+
+def sequence_key(prefix: str, position: int, width: int = 4) -> str:
+    """Key of the position-th (0-based) sibling in a bulk load after `prefix`.
+    Fixed-width positions keep keys short for huge sibling lists and sort correctly;
+    `prefix` is "" for a fresh parent or a key after the existing last sibling."""
+    digits = ""
+    n = position
+    for _ in range(width):
+        n, digit = divmod(n, BASE)
+        digits = DIGITS[digit] + digits
+    if n:
+        raise ValueError(f"Position {position} does not fit in {width} digits")
+    # Trailing midpoint digit: keys never end with the smallest digit
+    return prefix + digits + DIGITS[BASE // 2]
+
+
+def sibling_order_key(
+    db: Session,
+    mindmap_id: int,
+    parent_id: Optional[int],
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+) -> str:
+    """
+    Compute the order_key for a node placed among the children of parent_id.
+    - after_id / before_id: place right after / before that sibling. Passing both
+      costs only primary-key lookups; passing one looks up its neighbour on the
+      (mindmap_id, parent_id, order_key) index.
+    - neither: append after the last sibling (one index-ordered lookup, no aggregate).
+    Raises ValueError when a given neighbour is not a sibling under parent_id.
+    """
+    def sibling(node_id: int) -> Node:
+        node = db.query(Node).filter(Node.id == node_id, Node.deleted_at.is_(None)).first()
+        if not node or node.mindmap_id != mindmap_id or node.parent_id != parent_id:
+            raise ValueError(f"Node {node_id} is not a sibling under the target parent")
+        return node
+
+    # Tombstoned siblings can't be anchors, but they still bound the new key: skipping
+    # them buys nothing and could hand out a key equal to one still in the table
+    siblings = db.query(Node.order_key).filter(
+        Node.mindmap_id == mindmap_id,
+        Node.parent_id == parent_id,
+    )
+
+    after = sibling(after_id) if after_id is not None else None
+    before = sibling(before_id) if before_id is not None else None
+
+    if after is None and before is None:
+        last = siblings.order_by(Node.order_key.desc()).limit(1).scalar()
+        return key_after(last, jitter=True)
+
+    if after is not None and before is None:
+        nxt = siblings.filter(Node.order_key > after.order_key).order_by(Node.order_key).limit(1).scalar()
+        return key_between(after.order_key, nxt, jitter=True)
+
+    if before is not None and after is None:
+        prev = siblings.filter(Node.order_key < before.order_key).order_by(Node.order_key.desc()).limit(1).scalar()
+        return key_between(prev, before.order_key, jitter=True)
+
+    return key_between(after.order_key, before.order_key, jitter=True)
@@ -0,0 +1,19 @@
+# Collaborator roles, from least to most privileged: viewer < editor < owner.
+# A user's role on a mindmap comes from routers/collaborators.check_mindmap_access.
+
+# require_role: raise 403 unless a role is at least the required one
+
+from typing import Optional
+from fastapi import HTTPException, status
+
+ROLE_HIERARCHY = {"viewer": 0, "editor": 1, "owner": 2}
+
+
+def require_role(role: str, required_role: Optional[str] = None) -> None:
+    """Raise 403 when `role` ranks below `required_role` (no requirement: any role passes)."""
+    if required_role:
+        if ROLE_HIERARCHY.get(role, 0) < ROLE_HIERARCHY.get(required_role, 0):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"You need {required_role} role to perform this action"
+            )
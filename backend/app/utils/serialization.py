@@ -0,0 +1,123 @@
+# Fast JSON path for node-heavy responses (whole mindmaps, node lists).
+# The regular path builds a NodeResponse per node, then FastAPI validates it again
+# through `response_model` and serializes it: on 10k-node maps that dominates the
+# request. Routes that opt in instead hand plain dicts, already shaped like the
+# response model, straight to orjson. The output is the same JSON document.
+
+# Clients may instead ask for MessagePack (Accept: application/msgpack): nodes then
+# come as columns (one array per field) and voter ids as indexes into a `users`
+# dictionary, so no key name or UUID is repeated per node.
+
+# fast_json_enabled: whether routes should take the fast path
+# FastJSONResponse: Response rendering dicts/lists with orjson
+# wants_msgpack: whether the request negotiates MessagePack
+# columnar_nodes / columnar_mindmap: MessagePack documents for node lists / whole mindmaps
+# MsgpackResponse: Response rendering those documents
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from fastapi import Request
+from fastapi.responses import Response
+from ..core.config import settings
+
+try:
+    import orjson
+except ImportError:  # optional: without it every route keeps the Pydantic path
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional: without it clients always get JSON
+    msgpack = None
+
+# OPT_UTC_Z writes UTC offsets as "Z", like Pydantic does
+_ORJSON_OPTIONS = orjson.OPT_UTC_Z if orjson else 0
+
+
+def fast_json_enabled() -> bool:
+    return settings.FAST_JSON_RESPONSES and orjson is not None
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response serialized by orjson, skipping response_model validation.
+    Content must already match the route's response model field for field
+    (datetimes, UUIDs and floats are encoded the way Pydantic encodes them).
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=_ORJSON_OPTIONS)
+
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+# Version of the columnar layout, sent as "format"
+COLUMNAR_FORMAT = "columnar-1"
+# Per-node fields sent as one column each, in NodeResponse order
+_COLUMNS = (
+    "id", "title", "content", "x_position", "y_position", "parent_id",
+    "order_key", "is_ai_generated", "vote_count",
+)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def wants_msgpack(request: Request) -> bool:
+    if msgpack is None:
+        return False
+    accept = request.headers.get("accept", "")
+    return any(media_type.split(";")[0].strip() in MSGPACK_MEDIA_TYPES for media_type in accept.split(","))
+
+
+def _micros(value: Optional[datetime]) -> Optional[int]:
+    if value is None:
+        return None
+    # Naive datetimes (SQLite) are UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def columnar_nodes(nodes: List[dict]) -> Dict[str, Any]:
+    """
+    NodeResponse-shaped (or sparse) dicts as columns: node i is made of every column's item i.
+    `user_votes` holds, per node, indexes into `users` (voter ids as strings);
+    `created_at` is microseconds since the epoch (UTC).
+    """
+    # Sparse fieldsets (?fields=) only get their own columns
+    present = set(nodes[0]) if nodes else set(_COLUMNS) | {"mindmap_id", "user_votes", "created_at"}
+    users: Dict[Any, int] = {}
+    columns: Dict[str, Any] = {name: [node[name] for node in nodes] for name in _COLUMNS if name in present}
+    if "mindmap_id" in present:
+        columns["mindmap_id"] = nodes[0]["mindmap_id"] if nodes else None
+    if "user_votes" in present:
+        columns["user_votes"] = [
+            [users.setdefault(voter, len(users)) for voter in node["user_votes"]]
+            for node in nodes
+        ]
+    if "created_at" in present:
+        columns["created_at"] = [_micros(node["created_at"]) for node in nodes]
+    return {
+        "format": COLUMNAR_FORMAT,
+        "count": len(nodes),
+        "users": [str(voter) for voter in users],
+        **columns,
+    }
+
+
+def columnar_mindmap(mindmap: dict) -> Dict[str, Any]:
+    """A MindMapResponse-shaped dict with its nodes as columns (see columnar_nodes)."""
+    return {
+        **mindmap,
+        "owner_id": str(mindmap["owner_id"]),
+        "created_at": _micros(mindmap["created_at"]),
+        "nodes": columnar_nodes(mindmap["nodes"]),
+    }
+
+
+class MsgpackResponse(Response):
+    """MessagePack response for documents built by columnar_nodes / columnar_mindmap."""
+    media_type = MSGPACK_MEDIA_TYPES[0]
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
@@ -0,0 +1,63 @@
+# Helpers for reading around soft-deleted (tombstoned) rows.
+# Deleting a node only stamps `deleted_at` on the node itself, so its descendants
+# stay in the table until the garbage collector purges them. Every read path must
+# therefore treat a node as deleted when it OR any of its ancestors is tombstoned.
+
+# live_node_ids: SELECT of the ids of all visible nodes in a mindmap
+# tombstoned_ancestry: EXISTS clause, true when a node or one of its ancestors is tombstoned
+# get_live_node: load a single node only if it and all of its ancestors are visible
+
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased
+from ..models import Node
+
+
+def live_node_ids(mindmap_id: int):
+    """Return a SELECT of the ids of every visible node in a mindmap.
+    Walks down from the root(s) and stops at tombstoned nodes, so whole deleted
+    subtrees are skipped. Use it as `Node.id.in_(live_node_ids(mindmap_id))`."""
+    live = (
+        select(Node.id)
+        .where(
+            Node.mindmap_id == mindmap_id,
+            Node.parent_id.is_(None),
+            Node.deleted_at.is_(None),
+        )
+        .cte("live_nodes", recursive=True)
+    )
+
+    child = aliased(Node)
+    live = live.union_all(
+        select(child.id).where(
+            child.parent_id == live.c.id,
+            child.mindmap_id == mindmap_id,
+            child.deleted_at.is_(None),
+        )
+    )
+
+    return select(live.c.id)
+
+
+def tombstoned_ancestry(node_id: int):
+    """EXISTS clause that is true when the node or one of its ancestors is tombstoned.
+    Filter with `~tombstoned_ancestry(node_id)` to keep the node only while visible."""
+    ancestors = (
+        select(Node.id, Node.parent_id, Node.deleted_at)
+        .where(Node.id == node_id)
+        .cte("node_ancestors", recursive=True)
+    )
+
+    parent = aliased(Node)
+    ancestors = ancestors.union_all(
+        select(parent.id, parent.parent_id, parent.deleted_at).where(
+            parent.id == ancestors.c.parent_id
+        )
+    )
+
+    return select(ancestors.c.id).where(ancestors.c.deleted_at.isnot(None)).exists()
+
+
+def get_live_node(db: Session, node_id: int) -> Optional[Node]:
+    """Load a node unless it, or one of its ancestors, has been tombstoned."""
+    return db.query(Node).filter(Node.id == node_id, ~tombstoned_ancestry(node_id)).first()
@@ -0,0 +1,19 @@
+# Checks on the parent links of a mindmap's nodes, given as a {node_id: parent_id} map
+# (None for roots), before moves are written.
+
+# find_cycle: first moved node that would become its own ancestor
+
+from typing import Dict, Iterable, Optional
+
+
+def find_cycle(parent_of: Dict[int, Optional[int]], node_ids: Iterable[int]) -> Optional[int]:
+    """Return the first node that would become its own ancestor, or None."""
+    for node_id in node_ids:
+        seen = set()
+        current = parent_of.get(node_id)
+        while current is not None:
+            if current == node_id or current in seen:
+                return node_id
+            seen.add(current)
+            current = parent_of.get(current)
+    return None
@@ -0,0 +1,84 @@
+"""
+Outline import benchmark: parse, bulk-load and lay out a 100k-node outline.
+
+Runs against SQLite by default (executemany path); point BENCH_DATABASE_URL at a
+scratch Postgres database to measure the COPY path instead.
+
+    python -m benchmarks.bench_import [node_count]
+"""
+import os
+import sys
+import time
+import uuid
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.user import User
+from app.models.mindmap import MindMap
+from app.models.node import Node
+from app.services.outlines import PARSERS, OutlineImporter
+from app.utils import layout
+
+DATABASE_URL = os.getenv("BENCH_DATABASE_URL", "sqlite:///./bench_import.db")
+
+
+def build_ndjson(count: int, fanout: int = 8) -> bytes:
+    lines = ['{"id": 0, "title": "Imported root"}']
+    for i in range(1, count):
+        lines.append(f'{{"id": {i}, "parent_id": {(i - 1) // fanout}, "title": "Idea {i}", "content": "Notes for idea {i}"}}')
+    return "\n".join(lines).encode("utf-8")
+
+
+def main(count: int) -> None:
+    engine = create_engine(DATABASE_URL)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    user = User(id=uuid.uuid4(), username=f"bench-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                hashed_password="x")
+    session.add(user)
+    session.flush()
+    mindmap = MindMap(name="Import benchmark", owner_id=user.id)
+    session.add(mindmap)
+    session.flush()
+    root = Node(mindmap_id=mindmap.id, title="root", created_by=user.id)
+    session.add(root)
+    session.commit()
+
+    body = build_ndjson(count)
+    timings = {}
+
+    start = time.perf_counter()
+    parser = PARSERS["ndjson"]()
+    importer = OutlineImporter(session, mindmap.id, root.id, str(user.id),
+                               top_prefix="j", batch_size=5000, max_nodes=count)
+    # 64 KiB chunks, like a streamed request body
+    for i in range(0, len(body), 65536):
+        importer.add(parser.feed(body[i:i + 65536]))
+    importer.add(parser.close())
+    importer.finish()
+    timings["parse + insert"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tree = layout.load_tree(session, mindmap.id)
+    positions = layout.compute_layout(tree)
+    timings["load + compute layout"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    layout.apply_layout(session, positions)
+    session.commit()
+    timings["apply layout + commit"] = time.perf_counter() - start
+
+    print(f"{count} nodes ({len(body) / 1e6:.1f} MB ndjson) on {engine.dialect.name}")
+    for name, seconds in timings.items():
+        print(f"  {name:<24}{seconds:8.2f}s")
+    print(f"  {'total':<24}{sum(timings.values()):8.2f}s")
+
+    session.close()
+    if DATABASE_URL.startswith("sqlite:///./"):
+        engine.dispose()
+        os.remove(DATABASE_URL[len("sqlite:///"):])
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
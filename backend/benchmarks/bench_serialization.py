@@ -0,0 +1,92 @@
+"""
+Response serialization benchmark for node-heavy endpoints.
+
+Compares, for GET /api/mindmaps/{id} (MindMapResponse) and
+GET /api/mindmaps/{id}/nodes (List[NodeResponse]):
+  - pydantic: build the models in the route, then validate them again through
+    response_model, dump to JSON-able Python and json.dumps, as FastAPI does
+  - orjson: dump the NodeResponse-shaped dicts directly (FastJSONResponse)
+
+    python -m benchmarks.bench_serialization [node_count] [rounds]
+"""
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List
+from pydantic import TypeAdapter
+from app.schemas.mindmap import MindMapResponse, NodeResponse
+from app.utils.serialization import FastJSONResponse
+
+
+def build_nodes(count: int, voters_per_node: int = 3) -> List[dict]:
+    voters = [uuid.uuid4() for _ in range(voters_per_node)]
+    created_at = datetime.now(timezone.utc)
+    return [
+        {
+            "id": i + 1,
+            "title": f"Idea {i}",
+            "content": f"Notes for idea {i}",
+            "x_position": i * 12.5,
+            "y_position": i * 7.25,
+            "parent_id": (i - 1) // 8 + 1 if i else None,
+            "mindmap_id": 1,
+            "order_key": f"i{i:05d}",
+            "is_ai_generated": i % 5 == 0,
+            "vote_count": len(voters),
+            "user_votes": voters,
+            "created_at": created_at,
+        }
+        for i in range(count)
+    ]
+
+
+def fastapi_path(adapter: TypeAdapter, value) -> bytes:
+    # fastapi.routing.serialize_response followed by JSONResponse.render
+    validated = adapter.validate_python(value, from_attributes=True)
+    content = adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def timed(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(count: int, rounds: int) -> None:
+    nodes = build_nodes(count)
+    mindmap = {
+        "id": 1,
+        "title": "Serialization benchmark",
+        "nodes": nodes,
+        "owner_id": uuid.uuid4(),
+        "total_collaborators": 4,
+        "created_at": datetime.now(timezone.utc),
+        "version": 1,
+    }
+    node_list = TypeAdapter(List[NodeResponse])
+    mindmap_model = TypeAdapter(MindMapResponse)
+    fast = FastJSONResponse(None)
+
+    cases = {
+        "MindMapResponse pydantic": lambda: fastapi_path(mindmap_model, MindMapResponse(**mindmap)),
+        "MindMapResponse orjson": lambda: fast.render(mindmap),
+        "List[NodeResponse] pydantic": lambda: fastapi_path(node_list, [NodeResponse(**node) for node in nodes]),
+        "List[NodeResponse] orjson": lambda: fast.render(nodes),
+    }
+
+    print(f"{count} nodes, best of {rounds}")
+    for name, fn in cases.items():
+        print(f"  {name:<30} {timed(fn, rounds) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5,
+    )
@@ -0,0 +1,77 @@
+"""
+Wire format benchmark for GET /api/mindmaps/{id} (MindMapResponse).
+
+Compares the JSON body (FastJSONResponse) with the columnar MessagePack body
+(Accept: application/msgpack, MsgpackResponse) on:
+  - payload size, raw and gzip-compressed
+  - encode time on the server
+  - decode time on the client, both into the wire shape and back into one
+    dict per node (what a client that wants row objects pays)
+
+    python -m benchmarks.bench_wire_format [node_count] [rounds] [voters_per_node]
+"""
+import gzip
+import json
+import sys
+import uuid
+from datetime import datetime, timezone
+import msgpack
+from app.utils.serialization import FastJSONResponse, MsgpackResponse, columnar_mindmap
+from .bench_serialization import build_nodes, timed
+
+
+def rows(columns: dict) -> list:
+    # Column arrays back to one dict per node, voter indexes back to ids
+    users = columns["users"]
+    names = [name for name, value in columns.items() if isinstance(value, list) and name != "users"]
+    nodes = [dict(zip(names, values)) for values in zip(*(columns[name] for name in names))]
+    for node in nodes:
+        node["user_votes"] = [users[index] for index in node["user_votes"]]
+    return nodes
+
+
+def main(count: int, rounds: int, voters_per_node: int) -> None:
+    mindmap = {
+        "id": 1,
+        "title": "Wire format benchmark",
+        "nodes": build_nodes(count, voters_per_node),
+        "owner_id": uuid.uuid4(),
+        "total_collaborators": 4,
+        "created_at": datetime.now(timezone.utc),
+        "version": 1,
+    }
+    as_json = FastJSONResponse(None)
+    as_msgpack = MsgpackResponse(None)
+    json_body = as_json.render(mindmap)
+    msgpack_body = as_msgpack.render(columnar_mindmap(mindmap))
+
+    print(f"{count} nodes, {voters_per_node} voters per node, best of {rounds}")
+    print(f"  {'':<10} {'bytes':>10} {'gzip':>10} {'encode':>9} {'decode':>9} {'to rows':>9}")
+    cases = {
+        "json": (
+            json_body,
+            lambda: as_json.render(mindmap),
+            lambda: json.loads(json_body),
+            lambda: json.loads(json_body)["nodes"],
+        ),
+        "msgpack": (
+            msgpack_body,
+            lambda: as_msgpack.render(columnar_mindmap(mindmap)),
+            lambda: msgpack.unpackb(msgpack_body),
+            lambda: rows(msgpack.unpackb(msgpack_body)["nodes"]),
+        ),
+    }
+    for name, (body, encode, decode, to_rows) in cases.items():
+        print(
+            f"  {name:<10} {len(body):>10} {len(gzip.compress(body)):>10}"
+            f" {timed(encode, rounds) * 1000:>6.1f} ms {timed(decode, rounds) * 1000:>6.1f} ms"
+            f" {timed(to_rows, rounds) * 1000:>6.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 3,
+    )
@@ -0,0 +1,48 @@
+"""Add deleted_at tombstones to nodes and mindmaps
+
+Revision ID: 7e0f1abc2d34
+Revises: 6d8e9f0abc12
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7e0f1abc2d34"
+down_revision: Union[str, None] = "6d8e9f0abc12"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("nodes", sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("mindmaps", sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True))
+
+    # Partial indexes so the garbage collector finds tombstones without scanning live rows
+    op.create_index(
+        "idx_nodes_deleted_at",
+        "nodes",
+        ["deleted_at"],
+        postgresql_where=sa.text("deleted_at IS NOT NULL"),
+    )
+    op.create_index(
+        "idx_mindmaps_deleted_at",
+        "mindmaps",
+        ["deleted_at"],
+        postgresql_where=sa.text("deleted_at IS NOT NULL"),
+    )
+
+    # Subtree walks (visibility checks and batched purges) follow parent_id
+    op.create_index("idx_nodes_parent_id", "nodes", ["parent_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_nodes_parent_id", table_name="nodes")
+    op.drop_index("idx_mindmaps_deleted_at", table_name="mindmaps")
+    op.drop_index("idx_nodes_deleted_at", table_name="nodes")
+    op.drop_column("mindmaps", "deleted_at")
+    op.drop_column("nodes", "deleted_at")
@@ -0,0 +1,80 @@
+"""Replace nodes.order_index with a fractional order_key
+
+Revision ID: 8f1a2bcd3e45
+Revises: 7e0f1abc2d34
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8f1a2bcd3e45"
+down_revision: Union[str, None] = "7e0f1abc2d34"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add order_key, backfill it from order_index and drop order_index."""
+    # "C" collation: keys must compare byte by byte, whatever the database locale is
+    op.add_column(
+        "nodes",
+        sa.Column("order_key", sa.String(collation="C"), nullable=True),
+    )
+
+    # Fixed-width zero-padded positions followed by 'i' (keys never end in '0'),
+    # numbered per (mindmap_id, parent_id) so duplicate order_index values get distinct keys.
+    op.execute(
+        """
+        UPDATE nodes n
+        SET order_key = lpad(sub.rn::text, 8, '0') || 'i'
+        FROM (
+            SELECT id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY mindmap_id, parent_id
+                       ORDER BY order_index, id
+                   ) AS rn
+            FROM nodes
+        ) AS sub
+        WHERE n.id = sub.id;
+        """
+    )
+
+    op.alter_column("nodes", "order_key", nullable=False)
+    op.create_index(
+        "idx_nodes_sibling_order",
+        "nodes",
+        ["mindmap_id", "parent_id", "order_key"],
+    )
+    op.drop_column("nodes", "order_index")
+
+
+def downgrade() -> None:
+    """Restore order_index from the order_key ranking and drop order_key."""
+    op.add_column(
+        "nodes",
+        sa.Column("order_index", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+    op.execute(
+        """
+        UPDATE nodes n
+        SET order_index = sub.rn - 1
+        FROM (
+            SELECT id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY mindmap_id, parent_id
+                       ORDER BY order_key, id
+                   ) AS rn
+            FROM nodes
+        ) AS sub
+        WHERE n.id = sub.id;
+        """
+    )
+
+    op.drop_index("idx_nodes_sibling_order", table_name="nodes")
+    op.drop_column("nodes", "order_key")
@@ -0,0 +1,45 @@
+"""Add mindmap snapshots and their change log
+
+Revision ID: 9a2b3cde4f56
+Revises: 8f1a2bcd3e45
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9a2b3cde4f56"
+down_revision: Union[str, None] = "8f1a2bcd3e45"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "mindmap_snapshots",
+        sa.Column("mindmap_id", sa.Integer(), sa.ForeignKey("mindmaps.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+    op.create_table(
+        "mindmap_changes",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("mindmap_id", sa.Integer(), sa.ForeignKey("mindmaps.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("kind", sa.String(10), nullable=False),
+        sa.Column("node_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    # Reads fetch one map's pending changes; the compactor groups by map
+    op.create_index("idx_mindmap_changes_mindmap_id", "mindmap_changes", ["mindmap_id", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_mindmap_changes_mindmap_id", table_name="mindmap_changes")
+    op.drop_table("mindmap_changes")
+    op.drop_table("mindmap_snapshots")
@@ -0,0 +1,34 @@
+"""Stamp mindmap changes with the map version for delta sync
+
+Revision ID: c2d3e4f5a6b7
+Revises: b1c2d3e4f5a6
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c2d3e4f5a6b7"
+down_revision: Union[str, None] = "b1c2d3e4f5a6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "mindmap_changes",
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "mindmap_snapshots",
+        sa.Column("horizon", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("mindmap_snapshots", "horizon")
+    op.drop_column("mindmap_changes", "version")
@@ -0,0 +1,211 @@
+# Shared test fixtures: the SQLite test database behind the API, and an in-memory Redis.
+import pytest
+import redis
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base, get_db
+from app.core.redis import RELEASE_LOCK_SCRIPT
+
+# Create a test database URL (using SQLite for tests)
+TEST_DATABASE_URL = "sqlite:///./test.db"
+
+# Create engine and session for testing
+engine = create_engine(TEST_DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine)
+
+# Create tables
+Base.metadata.create_all(bind=engine)
+
+
+def _override_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def override_db():
+    """Serve the API from the test database; dependency overrides are cleared afterwards."""
+    from app.main import app
+
+    app.dependency_overrides[get_db] = _override_db
+    yield
+    app.dependency_overrides.clear()
+
+
+class FakePipeline:
+    """
+    Queues commands until execute(); runs them at once between watch() and multi().
+    execute() raises WatchError when a watched key was written since watch().
+    """
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+        self.immediate = False
+        self.watched = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def watch(self, *keys):
+        self.immediate = True
+        self.watched = {key: self.redis.writes.get(key, 0) for key in keys}
+
+    def multi(self):
+        self.immediate = False
+
+    def execute(self):
+        calls, watched = self.calls, self.watched
+        self.calls, self.watched = [], {}
+        if any(self.redis.writes.get(key, 0) != writes for key, writes in watched.items()):
+            raise redis.WatchError("Watched variable changed.")
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+    def __getattr__(self, name):
+        method = getattr(self.redis, name)
+
+        def call(*args, **kwargs):
+            if self.immediate:
+                return method(*args, **kwargs)
+            self.calls.append((name, args, kwargs))
+            return self
+        return call
+
+
+class FakeRedis:
+    """
+    The string, set, hash and sorted set commands the app uses, on one dict of values.
+    Without decode_responses (like redis_bytes_client), strings are stored as bytes.
+    """
+
+    def __init__(self, decode_responses=True):
+        self.decode_responses = decode_responses
+        self.values = {}
+        # Writes per key, for WATCH
+        self.writes = {}
+
+    def _written(self, *keys):
+        for key in keys:
+            self.writes[key] = self.writes.get(key, 0) + 1
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    # Keys and strings
+
+    def exists(self, *keys):
+        return sum(key in self.values for key in keys)
+
+    def delete(self, *keys):
+        for key in keys:
+            if self.values.pop(key, None) is not None:
+                self._written(key)
+
+    def expire(self, key, seconds):
+        self._written(key)
+        return key in self.values
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, nx=False, px=None, ex=None):
+        if nx and key in self.values:
+            return None
+        if not self.decode_responses and isinstance(value, str):
+            value = value.encode()
+        self.values[key] = value
+        self._written(key)
+        return True
+
+    def eval(self, script, numkeys, *keys_and_args):
+        # Only the compare-and-delete of core.redis.release_lock
+        assert script == RELEASE_LOCK_SCRIPT
+        key, token = keys_and_args
+        if not self.decode_responses:
+            token = token.encode()
+        if self.values.get(key) != token:
+            return 0
+        self.delete(key)
+        return 1
+
+    # Sets
+
+    def sadd(self, key, *members):
+        members = {str(member) for member in members}
+        target = self.values.setdefault(key, set())
+        added = len(members - target)
+        target.update(members)
+        self._written(key)
+        return added
+
+    def srem(self, key, *members):
+        target = self.values.get(key, set())
+        removed = len(target & {str(member) for member in members})
+        target.difference_update(str(member) for member in members)
+        if not target:
+            self.values.pop(key, None)
+        self._written(key)
+        return removed
+
+    def sismember(self, key, member):
+        return str(member) in self.values.get(key, set())
+
+    def smembers(self, key):
+        return set(self.values.get(key, set()))
+
+    def sunionstore(self, destination, keys):
+        union = set().union(*(self.values.get(key, set()) for key in keys))
+        if union:
+            self.values[destination] = union
+        else:
+            self.values.pop(destination, None)
+        self._written(destination)
+        return len(union)
+
+    # Hashes
+
+    def hget(self, key, field):
+        return self.values.get(key, {}).get(field)
+
+    def hset(self, key, field, value):
+        self.values.setdefault(key, {})[field] = value
+        self._written(key)
+
+    def hdel(self, key, field):
+        self.values.get(key, {}).pop(field, None)
+        self._written(key)
+
+    # Sorted sets
+
+    def zadd(self, key, mapping):
+        self.values.setdefault(key, {}).update(mapping)
+        self._written(key)
+
+    def zremrangebyscore(self, key, low, high):
+        zset = self.values.get(key, {})
+        for member in [member for member, score in zset.items() if low <= score <= high]:
+            del zset[member]
+        self._written(key)
+
+    def zrevrangebyscore(self, key, high, low, start, num, withscores):
+        entries = [(member, score) for member, score in self.values.get(key, {}).items() if score >= low]
+        entries.sort(key=lambda entry: (-entry[1], entry[0]))
+        return entries[start:start + num]
+
+
+@pytest.fixture
+def fake_redis():
+    """An empty in-memory Redis with decoded responses, like core.redis.redis_client."""
+    return FakeRedis()
+
+
+@pytest.fixture
+def fake_bytes_redis():
+    """An empty in-memory Redis answering bytes, like core.redis.redis_bytes_client."""
+    return FakeRedis(decode_responses=False)
@@ -0,0 +1,162 @@
+import uuid
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import sessionmaker
+from app.models import User, MindMap, Collaborator, Node
+from app.routers.collaborators import check_mindmap_access, get_node_with_access
+from app.services import access_cache
+
+# Create a test database URL (using SQLite for tests)
+TEST_DATABASE_URL = "sqlite:///./test.db"
+
+# Create engine and session for testing
+engine = create_engine(TEST_DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine)
+
+# Create tables
+from app.core.database import Base
+Base.metadata.create_all(bind=engine)
+
+
+def test_access_decisions_are_cached_until_invalidated(monkeypatch, fake_redis):
+    monkeypatch.setattr(access_cache, "redis_client", fake_redis)
+    access_cache._local.clear()
+    access_cache._revoked.clear()
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    session = SessionLocal()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        owner = User(id=uuid.uuid4(), username=f"acl-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                     hashed_password="x")
+        editor = User(id=uuid.uuid4(), username=f"acl-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                      hashed_password="x")
+        session.add_all([owner, editor])
+        session.flush()
+        mindmap = MindMap(name="ACL Mindmap", owner_id=owner.id)
+        session.add(mindmap)
+        session.flush()
+        collaboration = Collaborator(mindmap_id=mindmap.id, user_id=editor.id, role="editor", status="accepted")
+        session.add(collaboration)
+        session.commit()
+
+        statements.clear()
+        assert check_mindmap_access(mindmap.id, str(editor.id), session, required_role="editor") == "editor"
+        assert statements
+
+        # Cached: no database round trip, even from another worker (Redis only)
+        statements.clear()
+        assert check_mindmap_access(mindmap.id, str(editor.id), session) == "editor"
+        access_cache._local.clear()
+        assert check_mindmap_access(mindmap.id, editor.id, session) == "editor"
+        assert statements == []
+
+        # A role change takes effect once invalidated
+        collaboration.role = "viewer"
+        session.commit()
+        access_cache.invalidate_access(mindmap.id, editor.id)
+        with pytest.raises(HTTPException) as exc:
+            check_mindmap_access(mindmap.id, str(editor.id), session, required_role="editor")
+        assert exc.value.status_code == 403
+
+        assert check_mindmap_access(mindmap.id, str(owner.id), session) == "owner"
+        access_cache.invalidate_access(mindmap.id)
+        assert access_cache.get_cached_role(mindmap.id, owner.id) is None
+        assert access_cache.get_cached_role(mindmap.id, editor.id) is None
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        session.close()
+
+
+def test_node_loader_fuses_node_and_role_lookup(monkeypatch, fake_redis):
+    monkeypatch.setattr(access_cache, "redis_client", fake_redis)
+    access_cache._local.clear()
+    access_cache._revoked.clear()
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    session = SessionLocal()
+    try:
+        owner, viewer, stranger = (
+            User(id=uuid.uuid4(), username=f"fused-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                 hashed_password="x")
+            for _ in range(3)
+        )
+        session.add_all([owner, viewer, stranger])
+        session.flush()
+        mindmap = MindMap(name="Fused Mindmap", owner_id=owner.id)
+        session.add(mindmap)
+        session.flush()
+        session.add(Collaborator(mindmap_id=mindmap.id, user_id=viewer.id, role="viewer", status="accepted"))
+        root = Node(mindmap_id=mindmap.id, title="root", created_by=owner.id)
+        session.add(root)
+        session.flush()
+        child = Node(mindmap_id=mindmap.id, title="child", parent_id=root.id, created_by=owner.id)
+        session.add(child)
+        session.commit()
+        child_id, owner_id = child.id, owner.id
+
+        event.listen(engine, "before_cursor_execute", record)
+        node, role = get_node_with_access(child_id, str(owner_id), session, required_role="editor")
+        assert (node.id, role) == (child_id, "owner")
+        assert len(statements) == 1
+        event.remove(engine, "before_cursor_execute", record)
+
+        assert get_node_with_access(child.id, str(viewer.id), session)[1] == "viewer"
+        with pytest.raises(HTTPException) as exc:
+            get_node_with_access(child.id, str(viewer.id), session, required_role="editor")
+        assert exc.value.status_code == 403
+        with pytest.raises(HTTPException) as exc:
+            get_node_with_access(child.id, str(stranger.id), session)
+        assert exc.value.status_code == 403
+
+        # A tombstoned ancestor hides the node
+        root.deleted_at = func.now()
+        session.commit()
+        with pytest.raises(HTTPException) as exc:
+            get_node_with_access(child.id, str(owner.id), session)
+        assert exc.value.status_code == 404
+    finally:
+        if event.contains(engine, "before_cursor_execute", record):
+            event.remove(engine, "before_cursor_execute", record)
+        session.close()
+
+
+def test_roles_read_before_an_invalidation_are_not_cached(monkeypatch, fake_redis):
+    monkeypatch.setattr(access_cache, "redis_client", fake_redis)
+    access_cache._local.clear()
+    access_cache._revoked.clear()
+    user_id, other_id = uuid.uuid4(), uuid.uuid4()
+
+    # A request read "editor", then the collaborator was removed and invalidated
+    access_cache.invalidate_access(1, user_id)
+    access_cache.cache_role(1, user_id, "editor")
+    assert access_cache.get_cached_role(1, user_id) is None
+    # Only that user is affected; other users of the map are still cached
+    access_cache.cache_role(1, other_id, "viewer")
+    assert access_cache.get_cached_role(1, other_id) == "viewer"
+
+    # Another process invalidated: only the Redis marker tells
+    access_cache._local.clear()
+    access_cache._revoked.clear()
+    access_cache.cache_role(1, user_id, "editor")
+    assert access_cache.get_cached_role(1, user_id) is None
+
+    # Once the guard has passed, roles are cached again
+    fake_redis.values.clear()
+    access_cache._revoked.clear()
+    access_cache.cache_role(1, user_id, "viewer")
+    assert access_cache.get_cached_role(1, user_id) == "viewer"
+
+    # Map-wide invalidations guard every user
+    access_cache.invalidate_access(1)
+    access_cache.cache_role(1, other_id, "viewer")
+    assert access_cache.get_cached_role(1, other_id) is None
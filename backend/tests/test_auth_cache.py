@@ -0,0 +1,49 @@
+import time
+import pytest
+from jose import jwt
+from jose.exceptions import ExpiredSignatureError
+from app.middleware.auth import AuthMiddleware
+from app.utils.cache import TTLCache
+
+
+def _token(secret, exp):
+    return jwt.encode({"sub": "user-1", "aud": "authenticated", "exp": exp}, secret, algorithm="HS256")
+
+
+def test_ttl_cache_evicts_least_recently_used_and_expired():
+    cache = TTLCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1
+
+    cache.set("old", 4, expires_at=time.time() - 1)
+    assert cache.get("old") is None
+
+
+def test_verified_tokens_are_cached_until_exp(monkeypatch):
+    auth = AuthMiddleware()
+    auth.token_cache = TTLCache(max_entries=10, ttl=300)
+
+    token = _token(auth.supabase_jwt_secret, int(time.time()) + 2)
+    assert auth.verify_token(token)["sub"] == "user-1"
+
+    # A cache hit does not verify again
+    calls = []
+    monkeypatch.setattr(jwt, "decode", lambda *args, **kwargs: calls.append(args))
+    assert auth.verify_token(token)["sub"] == "user-1"
+    assert calls == []
+    monkeypatch.undo()
+
+    # Past exp the entry is gone and verification rejects the token
+    time.sleep(3.1)
+    with pytest.raises(ExpiredSignatureError):
+        auth.verify_token(token)
+
+
+def test_cache_can_be_disabled():
+    auth = AuthMiddleware()
+    auth.token_cache = None
+    token = _token(auth.supabase_jwt_secret, int(time.time()) + 60)
+    assert auth.verify_token(token)["sub"] == "user-1"
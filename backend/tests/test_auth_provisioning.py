@@ -0,0 +1,67 @@
+import uuid
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.middleware import auth as auth_module
+from app.middleware.auth import AuthMiddleware
+from app.models.user import User
+
+# Create a test database URL (using SQLite for tests)
+TEST_DATABASE_URL = "sqlite:///./test.db"
+
+# Create engine and session for testing
+engine = create_engine(TEST_DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine)
+
+# Create tables
+from app.core.database import Base
+Base.metadata.create_all(bind=engine)
+
+
+class FakeRedisSet:
+    def __init__(self):
+        self.members = set()
+
+    def sismember(self, key, value):
+        return value in self.members
+
+    def sadd(self, key, value):
+        self.members.add(value)
+
+
+def test_users_are_provisioned_once_then_skip_the_database(monkeypatch):
+    shared = FakeRedisSet()
+    monkeypatch.setattr(auth_module, "redis_client", shared)
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+
+    session = SessionLocal()
+    try:
+        user_id = str(uuid.uuid4())
+        payload = {"sub": user_id, "email": f"{user_id}@example.com"}
+
+        auth = AuthMiddleware()
+        auth.provision_user(session, user_id, payload)
+        assert session.get(User, uuid.UUID(user_id)).email == payload["email"]
+
+        # Known in this process: no query at all
+        statements.clear()
+        auth.provision_user(session, user_id, payload)
+        assert statements == []
+
+        # Another worker learns it from Redis
+        other = AuthMiddleware()
+        other.provision_user(session, user_id, payload)
+        assert statements == []
+
+        # Without Redis, a second insert is a no-op thanks to ON CONFLICT DO NOTHING
+        monkeypatch.setattr(auth_module, "redis_client", FakeRedisSet())
+        AuthMiddleware().provision_user(session, user_id, payload)
+        assert session.query(User).filter(User.id == uuid.UUID(user_id)).count() == 1
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        session.close()
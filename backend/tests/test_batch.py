@@ -0,0 +1,140 @@
+import uuid
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.middleware.auth import get_current_user_id
+from app.models import User, MindMap, Node, Vote
+from app.routers import batch
+
+# Create a test database URL (using SQLite for tests)
+TEST_DATABASE_URL = "sqlite:///./test.db"
+
+# Create engine and session for testing
+engine = create_engine(TEST_DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine)
+
+# Create tables
+from app.core.database import Base
+Base.metadata.create_all(bind=engine)
+
+
+def _mindmap(session):
+    user = User(id=uuid.uuid4(), username=f"batch-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                hashed_password="x")
+    session.add(user)
+    session.flush()
+    mindmap = MindMap(name="Batch Mindmap", owner_id=user.id)
+    session.add(mindmap)
+    session.flush()
+    root = Node(mindmap_id=mindmap.id, title="root", order_key="a0", created_by=user.id)
+    session.add(root)
+    session.commit()
+    return user, mindmap.id, root.id
+
+
+def _client(user):
+    app.dependency_overrides[get_current_user_id] = lambda: str(user.id)
+    return TestClient(app)
+
+
+def test_batch_applies_operations_in_order_as_one_change(override_db):
+    session = SessionLocal()
+    user, mindmap_id, root_id = _mindmap(session)
+    try:
+        response = _client(user).post("/api/batch", json={"operations": [
+            {"op": "create_node", "mindmap_id": mindmap_id, "parent_id": root_id, "title": "a", "ref": "a"},
+            {"op": "create_node", "mindmap_id": mindmap_id, "parent_ref": "a", "title": "b", "ref": "b"},
+            {"op": "update_node", "node_ref": "b", "title": "b2"},
+            {"op": "vote", "node_ref": "a"},
+            {"op": "vote", "node_ref": "a"},
+            {"op": "delete_node", "node_ref": "b"},
+        ]})
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [result["status"] for result in results] == [201, 201, 200, 201, 409, 200]
+        a_id, b_id = results[0]["node_id"], results[1]["node_id"]
+        assert results[1]["node"]["parent_id"] == a_id
+        assert results[2]["node"]["title"] == "b2"
+        assert results[3]["vote_count"] == 1
+        assert results[4]["error"] == "You have already voted on this node"
+
+        session.expire_all()
+        assert session.query(Vote).filter(Vote.node_id == a_id).count() == 1
+        assert session.get(Node, b_id).deleted_at is not None
+        # The whole batch is logged as one change
+        assert session.get(MindMap, mindmap_id).version == 1
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+
+
+def test_atomic_batch_is_cancelled_by_a_failed_operation(override_db):
+    session = SessionLocal()
+    user, mindmap_id, root_id = _mindmap(session)
+    try:
+        response = _client(user).post("/api/batch", json={"atomic": True, "operations": [
+            {"op": "create_node", "mindmap_id": mindmap_id, "parent_id": root_id, "title": "kept?"},
+            {"op": "unvote", "node_id": root_id},
+        ]})
+        assert response.status_code == 404
+        assert response.json()["detail"].startswith("Operation 1 (unvote) failed")
+
+        session.expire_all()
+        assert session.query(Node).filter(Node.mindmap_id == mindmap_id).count() == 1
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+
+
+def test_batch_checks_access_per_mindmap(override_db):
+    session = SessionLocal()
+    owner, mindmap_id, root_id = _mindmap(session)
+    stranger, _, _ = _mindmap(session)
+    try:
+        response = _client(stranger).post("/api/batch", json={"operations": [
+            {"op": "vote", "node_id": root_id},
+            {"op": "create_node", "mindmap_id": mindmap_id, "parent_id": root_id, "title": "x"},
+        ]})
+        assert response.status_code == 200
+        assert all(result["status"] in (403, 404) for result in response.json()["results"])
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+
+
+def test_batch_moves_check_cycles_against_earlier_operations(monkeypatch, override_db):
+    session = SessionLocal()
+    user, mindmap_id, root_id = _mindmap(session)
+    loads = []
+    live_node_ids = batch.live_node_ids
+    monkeypatch.setattr(batch, "live_node_ids", lambda mid: loads.append(mid) or live_node_ids(mid))
+    try:
+        response = _client(user).post("/api/batch", json={"operations": [
+            {"op": "create_node", "mindmap_id": mindmap_id, "parent_id": root_id, "title": "a", "ref": "a"},
+            {"op": "create_node", "mindmap_id": mindmap_id, "parent_id": root_id, "title": "b", "ref": "b"},
+            {"op": "create_node", "mindmap_id": mindmap_id, "parent_id": root_id, "title": "c", "ref": "c"},
+        ]})
+        assert response.status_code == 200
+        a_id, b_id, c_id = (result["node_id"] for result in response.json()["results"])
+
+        response = _client(user).post("/api/batch", json={"operations": [
+            {"op": "update_node", "node_id": b_id, "parent_id": a_id},
+            {"op": "update_node", "node_id": a_id, "parent_id": b_id},
+            {"op": "delete_node", "node_id": b_id},
+            {"op": "update_node", "node_id": c_id, "parent_id": a_id},
+        ]})
+        assert response.status_code == 200
+        results = response.json()["results"]
+        # Moves see the earlier ones; a rejected move changes nothing
+        assert [result["status"] for result in results] == [200, 400, 200, 200]
+        assert "cycle" in results[1]["error"]
+        assert results[3]["node"]["parent_id"] == a_id
+        # The parent links were loaded once for the whole batch
+        assert loads == [mindmap_id]
+
+        session.expire_all()
+        assert (session.get(Node, a_id).parent_id, session.get(Node, b_id).parent_id) == (root_id, a_id)
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
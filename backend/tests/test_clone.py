@@ -0,0 +1,106 @@
+import uuid
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.middleware.auth import get_current_user_id
+from app.models.collaborator import Collaborator
+from app.models.user import User
+from app.models.mindmap import MindMap
+from app.models.node import Node
+from app.models.vote import Vote
+from app.services.clone import clone_nodes
+
+# Create a test database URL (using SQLite for tests)
+TEST_DATABASE_URL = "sqlite:///./test.db"
+
+# Create engine and session for testing
+engine = create_engine(TEST_DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine)
+
+# Create tables
+from app.core.database import Base
+Base.metadata.create_all(bind=engine)
+
+
+def test_clone_remaps_parents_and_keeps_positions():
+    session = SessionLocal()
+    try:
+        owner = User(id=uuid.uuid4(), username=f"clone-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                     hashed_password="x")
+        cloner = User(id=uuid.uuid4(), username=f"clone-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                      hashed_password="x")
+        session.add_all([owner, cloner])
+        session.flush()
+
+        source = MindMap(name="Template", owner_id=owner.id)
+        target = MindMap(name="Template (copy)", owner_id=cloner.id)
+        session.add_all([source, target])
+        session.flush()
+
+        def add(title, parent=None, x=0.0, deleted=False):
+            node = Node(mindmap_id=source.id, title=title, created_by=owner.id, x_position=x,
+                        parent_id=parent.id if parent else None)
+            if deleted:
+                node.deleted_at = func.now()
+            session.add(node)
+            session.flush()
+            return node
+
+        root = add("root")
+        a = add("a", root, x=250.0)
+        add("a1", a, x=430.0)
+        gone = add("gone", root, deleted=True)
+        add("under gone", gone)
+        a1 = session.query(Node).filter(Node.mindmap_id == source.id, Node.title == "a1").one()
+        session.add_all([Vote(user_id=owner.id, node_id=a.id), Vote(user_id=cloner.id, node_id=a1.id)])
+        session.flush()
+
+        assert clone_nodes(session, source.id, target.id, str(cloner.id), include_votes=True) == 3
+        session.commit()
+
+        copies = {n.title: n for n in session.query(Node).filter(Node.mindmap_id == target.id).all()}
+        assert set(copies) == {"root", "a", "a1"}
+        assert copies["root"].parent_id is None
+        assert copies["a"].parent_id == copies["root"].id
+        assert copies["a1"].parent_id == copies["a"].id
+        assert copies["a1"].x_position == 430.0
+        assert copies["a"].id != a.id and copies["a"].created_by == cloner.id
+        # Only the cloning user's votes come along: nobody else can see the copy
+        assert session.query(Vote).filter(Vote.node_id == copies["a"].id).count() == 0
+        assert [vote.user_id for vote in session.query(Vote).filter(Vote.node_id == copies["a1"].id)] == [cloner.id]
+
+        # The temporary id map is dropped, so the same connection can clone again
+        other = MindMap(name="Second copy", owner_id=cloner.id)
+        session.add(other)
+        session.flush()
+        assert clone_nodes(session, source.id, other.id, str(cloner.id), include_votes=False) == 3
+        session.commit()
+        assert session.query(Vote).filter(Vote.node_id.in_(
+            session.query(Node.id).filter(Node.mindmap_id == other.id)
+        )).count() == 0
+    finally:
+        session.close()
+
+
+def test_viewers_cannot_clone_with_votes(override_db):
+    session = SessionLocal()
+    owner = User(id=uuid.uuid4(), username=f"clone-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                 hashed_password="x")
+    viewer = User(id=uuid.uuid4(), username=f"clone-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                  hashed_password="x")
+    session.add_all([owner, viewer])
+    session.flush()
+    source = MindMap(name="Template", owner_id=owner.id)
+    session.add(source)
+    session.flush()
+    session.add(Collaborator(mindmap_id=source.id, user_id=viewer.id, role="viewer", status="accepted"))
+    session.commit()
+
+    app.dependency_overrides[get_current_user_id] = lambda: str(viewer.id)
+    try:
+        response = TestClient(app).post(f"/api/mindmaps/{source.id}/clone", json={"include_votes": True})
+        assert response.status_code == 403
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
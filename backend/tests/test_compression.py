@@ -0,0 +1,87 @@
+import gzip
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+from app.middleware import compression
+from app.middleware.compression import CompressionMiddleware, choose_encoding
+
+BIG = {"nodes": [{"id": i, "title": f"Idea {i}"} for i in range(500)]}
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+
+@app.get("/small")
+def small():
+    return {"ok": True}
+
+
+@app.get("/big")
+def big():
+    return BIG
+
+
+@app.get("/versioned")
+def versioned():
+    return JSONResponse(BIG, headers={"ETag": '"1.7"'})
+
+
+@app.get("/binary")
+def binary():
+    return Response(b"\0" * 4096, media_type="application/gzip")
+
+
+@app.get("/stream")
+def stream():
+    return StreamingResponse((f"line {i}\n" * 50 for i in range(20)), media_type="text/markdown")
+
+
+def test_encoding_negotiation():
+    assert choose_encoding("") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, br;q=0") is None
+    assert choose_encoding("*") == next(iter(compression.ENCODERS))
+
+
+def test_only_large_compressible_responses_are_compressed():
+    client = TestClient(app)
+    headers = {"Accept-Encoding": "gzip"}
+
+    assert "content-encoding" not in client.get("/small", headers=headers).headers
+    assert "content-encoding" not in client.get("/binary", headers=headers).headers
+
+    response = client.get("/big", headers=headers)
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json() == BIG
+
+    streamed = client.get("/stream", headers=headers)
+    assert streamed.headers["content-encoding"] == "gzip"
+    assert streamed.text == "".join(f"line {i}\n" * 50 for i in range(20))
+
+
+def test_versioned_bodies_are_compressed_once(monkeypatch):
+    calls = []
+    compress, stream = compression.ENCODERS["gzip"]
+
+    def counting(data):
+        calls.append(len(data))
+        return gzip.compress(data)
+
+    monkeypatch.setitem(compression.ENCODERS, "gzip", (counting, stream))
+    compression.compressed_cache.clear()
+    client = TestClient(app)
+
+    for _ in range(3):
+        response = client.get("/versioned", headers={"Accept-Encoding": "gzip"})
+        assert response.json() == BIG
+    assert len(calls) == 1
+    # Other bytes than the identity body: the strong ETag is weakened
+    assert response.headers["etag"] == 'W/"1.7"'
+    assert client.get("/versioned", headers={"Accept-Encoding": "identity"}).headers["etag"] == '"1.7"'
+
+    # No ETag, no cache
+    client.get("/big", headers={"Accept-Encoding": "gzip"})
+    client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert len(calls) == 3
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import uuid
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.middleware.auth import get_current_user_id
+from app.models import User, MindMap, Node, Vote
+from app.routers import mindmaps
+from app.services import mindmap_cache
+from app.services.snapshots import record_change
+
+# Create a test database URL (using SQLite for tests)
+TEST_DATABASE_URL = "sqlite:///./test.db"
+
+# Create engine and session for testing
+engine = create_engine(TEST_DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine)
+
+# Create tables
+from app.core.database import Base
+Base.metadata.create_all(bind=engine)
+
+
+def test_full_payloads_are_built_once_per_version(monkeypatch, override_db, fake_bytes_redis):
+    monkeypatch.setattr(mindmap_cache, "redis_bytes_client", fake_bytes_redis)
+    mindmap_cache.clear_local()
+    builds = []
+    render = mindmaps._render_mindmap
+    monkeypatch.setattr(mindmaps, "_render_mindmap", lambda *args: builds.append(1) or render(*args))
+
+    session = SessionLocal()
+    user = User(id=uuid.uuid4(), username=f"cache-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                hashed_password="x")
+    session.add(user)
+    session.flush()
+    mindmap = MindMap(name="Cached Mindmap", owner_id=user.id)
+    session.add(mindmap)
+    session.flush()
+    root = Node(mindmap_id=mindmap.id, title="root", created_by=user.id)
+    session.add(root)
+    session.commit()
+    mindmap_id, root_id = mindmap.id, root.id
+
+    app.dependency_overrides[get_current_user_id] = lambda: str(user.id)
+    try:
+        client = TestClient(app)
+        first = client.get(f"/api/mindmaps/{mindmap_id}")
+        second = client.get(f"/api/mindmaps/{mindmap_id}")
+        assert first.status_code == second.status_code == 200
+        assert first.content == second.content
+        assert len(builds) == 1
+
+        # Another process finds it in Redis
+        mindmap_cache.clear_local()
+        assert client.get(f"/api/mindmaps/{mindmap_id}").content == first.content
+        assert len(builds) == 1
+
+        # Writes bump the version, so the next read sees them
+        session.add(Vote(user_id=user.id, node_id=root_id))
+        record_change(session, mindmap_id, voted_node_ids=[root_id])
+        session.commit()
+        third = client.get(f"/api/mindmaps/{mindmap_id}")
+        assert third.json()["nodes"][0]["vote_count"] == 1
+        assert len(builds) == 2
+
+        # Sparse reads bypass the cache
+        client.get(f"/api/mindmaps/{mindmap_id}?fields=title")
+        assert len(builds) == 2
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+
+
+def test_concurrent_misses_share_one_build(monkeypatch, fake_bytes_redis):
+    redis = fake_bytes_redis
+    monkeypatch.setattr(mindmap_cache, "redis_bytes_client", redis)
+    monkeypatch.setattr(mindmap_cache, "POLL_SECONDS", 0.01)
+    mindmap_cache.clear_local()
+    builds = []
+
+    def build():
+        builds.append(threading.get_ident())
+        return b"payload"
+
+    async def scenario():
+        # Another process holds the build lock and publishes its result a bit later
+        key = mindmap_cache._redis_key((7, 3, "json"))
+        redis.set(key + ":lock", "other", nx=True)
+
+        async def other_process():
+            await asyncio.sleep(0.05)
+            redis.set(key, b"from elsewhere")
+
+        results = await asyncio.gather(
+            other_process(), *(mindmap_cache.cached_payload(7, 3, None, build) for _ in range(5))
+        )
+        return results[1:]
+
+    assert asyncio.run(scenario()) == [b"from elsewhere"] * 5
+    assert builds == []
+
+    # Without anyone else building, one request builds and the rest wait for it
+    async def misses():
+        return await asyncio.gather(*(mindmap_cache.cached_payload(7, 4, None, build) for _ in range(5)))
+
+    assert asyncio.run(misses()) == [b"payload"] * 5
+    assert len(builds) == 1
+    # Off the event loop
+    assert builds[0] != threading.get_ident()
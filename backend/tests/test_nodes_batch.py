@@ -0,0 +1,178 @@
+import uuid
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.middleware.auth import get_current_user_id
+from app.models import User, MindMap, Node
+from app.models.snapshot import MindMapChange
+from app.routers import nodes
+
+# Create a test database URL (using SQLite for tests)
+TEST_DATABASE_URL = "sqlite:///./test.db"
+
+# Create engine and session for testing
+engine = create_engine(TEST_DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine)
+
+# Create tables
+from app.core.database import Base
+Base.metadata.create_all(bind=engine)
+
+
+def _mindmap(session):
+    user = User(id=uuid.uuid4(), username=f"nodes-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                hashed_password="x")
+    session.add(user)
+    session.flush()
+    mindmap = MindMap(name="Nodes Mindmap", owner_id=user.id)
+    session.add(mindmap)
+    session.flush()
+    root = Node(mindmap_id=mindmap.id, title="root", order_key="a0", created_by=user.id)
+    session.add(root)
+    session.commit()
+    return user, mindmap.id, root.id
+
+
+def _client(user):
+    app.dependency_overrides[get_current_user_id] = lambda: str(user.id)
+    return TestClient(app)
+
+
+def _changes(session, mindmap_id):
+    return session.query(MindMapChange).filter(MindMapChange.mindmap_id == mindmap_id).all()
+
+
+def test_batch_creates_nested_nodes_as_one_change(override_db):
+    session = SessionLocal()
+    user, mindmap_id, root_id = _mindmap(session)
+    try:
+        response = _client(user).post(f"/api/mindmaps/{mindmap_id}/nodes:batch", json={
+            "parent_id": root_id,
+            "nodes": [
+                {"title": "a", "children": [{"title": "a1"}, {"title": "a2", "children": [{"title": "a2x"}]}]},
+                {"title": "b", "is_ai_generated": True},
+            ],
+        })
+        assert response.status_code == 201
+        created = response.json()
+        # Level by level, parents before their children
+        assert [node["title"] for node in created] == ["a", "b", "a1", "a2", "a2x"]
+        by_title = {node["title"]: node for node in created}
+        assert by_title["a"]["parent_id"] == by_title["b"]["parent_id"] == root_id
+        assert by_title["a1"]["parent_id"] == by_title["a2"]["parent_id"] == by_title["a"]["id"]
+        assert by_title["a2x"]["parent_id"] == by_title["a2"]["id"]
+        assert by_title["b"]["is_ai_generated"]
+
+        # Siblings are ordered as sent
+        assert by_title["a"]["order_key"] < by_title["b"]["order_key"]
+        assert by_title["a1"]["order_key"] < by_title["a2"]["order_key"]
+
+        # One version bump and one change-log write (every node, one layout) for the batch
+        session.expire_all()
+        assert session.get(MindMap, mindmap_id).version == 1
+        changes = _changes(session, mindmap_id)
+        assert {change.version for change in changes} == {1}
+        assert sorted(change.node_id for change in changes if change.kind == "node") == sorted(
+            node["id"] for node in created
+        )
+        assert [change.kind for change in changes].count("layout") == 1
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+
+
+def test_batch_create_validates_the_parent(monkeypatch, override_db):
+    session = SessionLocal()
+    user, mindmap_id, root_id = _mindmap(session)
+    _, other_mindmap_id, other_root_id = _mindmap(session)
+    deleted = Node(mindmap_id=mindmap_id, parent_id=root_id, title="deleted", created_by=user.id,
+                   deleted_at=func.now())
+    session.add(deleted)
+    session.commit()
+    try:
+        client = _client(user)
+
+        def create(parent_id):
+            return client.post(f"/api/mindmaps/{mindmap_id}/nodes:batch", json={
+                "parent_id": parent_id, "nodes": [{"title": "x", "children": [{"title": "y"}]}],
+            })
+
+        # Parents of another map or tombstoned are not found; nothing is written
+        assert create(other_root_id).status_code == 404
+        assert create(deleted.id).status_code == 404
+        assert create(10 ** 9).status_code == 404
+        # Nested children count towards the batch limit
+        monkeypatch.setattr(nodes, "MAX_BATCH_NODES", 1)
+        assert create(root_id).status_code == 400
+        session.expire_all()
+        assert session.get(MindMap, mindmap_id).version == 0
+        assert session.query(Node).filter(Node.mindmap_id == mindmap_id, Node.title.in_(["x", "y"])).count() == 0
+        assert session.get(MindMap, other_mindmap_id).version == 0
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+
+
+def test_batch_update_rejects_cycles_and_deleted_parents(override_db):
+    session = SessionLocal()
+    user, mindmap_id, root_id = _mindmap(session)
+    a = Node(mindmap_id=mindmap_id, parent_id=root_id, title="a", order_key="a1", created_by=user.id)
+    b = Node(mindmap_id=mindmap_id, parent_id=root_id, title="b", order_key="a2", created_by=user.id)
+    deleted = Node(mindmap_id=mindmap_id, parent_id=root_id, title="deleted", order_key="a3", created_by=user.id,
+                   deleted_at=func.now())
+    session.add_all([a, b, deleted])
+    session.commit()
+    try:
+        client = _client(user)
+
+        def update(*updates):
+            return client.put(f"/api/mindmaps/{mindmap_id}/nodes:batch", json={"updates": list(updates)})
+
+        # Each move alone is fine; together they form a cycle
+        response = update({"id": a.id, "parent_id": b.id}, {"id": b.id, "parent_id": a.id, "title": "b2"})
+        assert response.status_code == 400
+        assert "cycle" in response.json()["detail"]
+        assert update({"id": a.id, "parent_id": a.id}).status_code == 400
+        # Tombstoned parents are not found
+        assert update({"id": a.id, "parent_id": deleted.id}).status_code == 404
+        assert update({"id": deleted.id, "title": "revived"}).status_code == 404
+        assert update({"id": b.id, "after_id": deleted.id}).status_code == 400
+
+        session.expire_all()
+        assert session.get(MindMap, mindmap_id).version == 0
+        assert (session.get(Node, a.id).parent_id, session.get(Node, b.id).title) == (root_id, "b")
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+
+
+def test_batch_update_mixes_moves_edits_and_positions(override_db):
+    session = SessionLocal()
+    user, mindmap_id, root_id = _mindmap(session)
+    a, b, c = (Node(mindmap_id=mindmap_id, parent_id=root_id, title=title, order_key=key, created_by=user.id)
+               for title, key in (("a", "a1"), ("b", "a2"), ("c", "a3")))
+    session.add_all([a, b, c])
+    session.commit()
+    try:
+        response = _client(user).put(f"/api/mindmaps/{mindmap_id}/nodes:batch", json={"updates": [
+            {"id": b.id, "parent_id": a.id},
+            {"id": c.id, "parent_id": a.id, "after_id": b.id, "x_position": 123.0},
+            {"id": a.id, "title": "a2", "content": "notes"},
+        ]})
+        assert response.status_code == 200
+        updated = {node["title"]: node for node in response.json()}
+        assert updated["b"]["parent_id"] == updated["c"]["parent_id"] == a.id
+        assert updated["b"]["order_key"] < updated["c"]["order_key"]
+        assert updated["a2"]["content"] == "notes"
+        # The relayout places moved nodes, but an explicit coordinate is kept
+        assert updated["c"]["x_position"] == 123.0
+        assert updated["c"]["y_position"] != 0.0
+
+        # One change for the whole batch
+        session.expire_all()
+        assert session.get(MindMap, mindmap_id).version == 1
+        assert [change.kind for change in _changes(session, mindmap_id)].count("layout") == 1
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
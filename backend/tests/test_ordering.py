@@ -0,0 +1,44 @@
+import random
+import pytest
+from app.utils.ordering import key_between, key_after
+
+
+def test_key_between_is_strictly_between():
+    assert key_between(None, None) == "i"
+    assert "a" < key_between("a", "b") < "b"
+    assert "a" < key_between("a", "a1") < "a1"
+    assert "" < key_between(None, "1") < "1"
+    assert "zz" < key_between("zz", None)
+
+
+def test_repeated_inserts_never_need_renumbering():
+    keys = [key_between(None, None)]
+    rng = random.Random(7)
+
+    for _ in range(500):
+        i = rng.randrange(len(keys) + 1)
+        lower = keys[i - 1] if i > 0 else None
+        upper = keys[i] if i < len(keys) else None
+        key = key_between(lower, upper, jitter=rng.random() < 0.5)
+        keys.insert(i, key)
+        assert keys == sorted(keys)
+
+    assert len(set(keys)) == len(keys)
+
+
+def test_key_after_stays_short_on_long_appends():
+    keys = [key_after(None)]
+    for _ in range(1000):
+        keys.append(key_after(keys[-1]))
+
+    assert keys == sorted(keys)
+    assert max(len(k) for k in keys) <= 30
+
+
+def test_invalid_keys_are_rejected():
+    with pytest.raises(ValueError):
+        key_between("b", "a")
+    with pytest.raises(ValueError):
+        key_between("a0", None)
+    with pytest.raises(ValueError):
+        key_after("A")
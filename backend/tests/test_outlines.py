@@ -0,0 +1,159 @@
+import uuid
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from app.models.user import User
+from app.models.mindmap import MindMap
+from app.models.node import Node
+from app.services.outlines import PARSERS, WRITERS, OutlineImporter, OutlineParseError, outline_rows_query
+from app.utils import layout
+
+# Create a test database URL (using SQLite for tests)
+TEST_DATABASE_URL = "sqlite:///./test.db"
+
+# Create engine and session for testing
+engine = create_engine(TEST_DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine)
+
+# Create tables
+from app.core.database import Base
+Base.metadata.create_all(bind=engine)
+
+
+def _parse(fmt, document, chunk_size=7):
+    """Feed the document in small chunks, as a streamed request body would arrive."""
+    parser = PARSERS[fmt]()
+    data = document.encode("utf-8")
+    items = []
+    for i in range(0, len(data), chunk_size):
+        items.extend(parser.feed(data[i:i + chunk_size]))
+    items.extend(parser.close())
+    return [(item.title, item.parent_ref and _title(items, item.parent_ref)) for item in items]
+
+
+def _title(items, ref):
+    return next(item.title for item in items if item.ref == ref)
+
+
+EXPECTED = [("A", None), ("A1", "A"), ("A2", "A"), ("B", None)]
+
+
+def test_parsers_agree_on_nesting():
+    ndjson = (
+        '{"id": 1, "title": "A"}\n'
+        '{"id": 2, "parent_id": 1, "title": "A1"}\n'
+        '{"id": 3, "parent_id": 1, "title": "A2"}\n'
+        '{"id": "b", "title": "B"}\n'
+    )
+    json_doc = '[{"title": "A", "children": [{"title": "A1"}, {"title": "A2"}]}, {"title": "B"}]'
+    markdown = "# A\n- A1\n- A2\n\n# B\n"
+    opml = (
+        '<?xml version="1.0"?><opml version="2.0"><head><title>t</title></head><body>'
+        '<outline text="A"><outline text="A1"/><outline text="A2"/></outline>'
+        '<outline text="B"/></body></opml>'
+    )
+
+    assert _parse("ndjson", ndjson) == EXPECTED
+    assert _parse("json", json_doc) == EXPECTED
+    assert _parse("markdown", markdown) == EXPECTED
+    assert _parse("opml", opml) == EXPECTED
+
+
+def test_markdown_bullets_nest_by_indentation():
+    markdown = "- A\n  - A1\n    - A1a\n  - A2\n- B\n"
+    assert _parse("markdown", markdown) == [
+        ("A", None), ("A1", "A"), ("A1a", "A1"), ("A2", "A"), ("B", None)
+    ]
+
+
+def test_ndjson_rejects_children_before_parents():
+    with pytest.raises(OutlineParseError):
+        _parse("ndjson", '{"id": 2, "parent_id": 1, "title": "A1"}\n{"id": 1, "title": "A"}\n')
+
+
+def test_importer_bulk_loads_in_batches():
+    session = SessionLocal()
+    try:
+        user = User(id=uuid.uuid4(), username=f"import-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                    hashed_password="x")
+        session.add(user)
+        session.flush()
+
+        mindmap = MindMap(name="Import Mindmap", owner_id=user.id)
+        session.add(mindmap)
+        session.flush()
+
+        root = Node(mindmap_id=mindmap.id, title="root", created_by=user.id)
+        session.add(root)
+        session.flush()
+
+        parser = PARSERS["ndjson"]()
+        lines = ['{"id": 0, "title": "top"}']
+        lines += [f'{{"id": {i}, "parent_id": {(i - 1) // 3}, "title": "n{i}"}}' for i in range(1, 40)]
+        items = parser.feed("\n".join(lines).encode("utf-8")) + parser.close()
+
+        # Tiny batches exercise id reservation across several flushes
+        importer = OutlineImporter(session, mindmap.id, root.id, str(user.id),
+                                   top_prefix="j", batch_size=8, max_nodes=100)
+        importer.add(items)
+        assert importer.finish() == 40
+
+        layout.apply_layout(session, layout.compute_layout(layout.load_tree(session, mindmap.id)))
+        session.commit()
+
+        nodes = session.query(Node).filter(Node.mindmap_id == mindmap.id).all()
+        by_title = {node.title: node for node in nodes}
+        assert len(nodes) == 41
+        assert by_title["top"].parent_id == root.id
+        assert by_title["n4"].parent_id == by_title["n1"].id
+
+        siblings = sorted((n for n in nodes if n.parent_id == by_title["top"].id), key=lambda n: n.order_key)
+        assert [n.title for n in siblings] == ["n1", "n2", "n3"]
+
+        with pytest.raises(OutlineParseError):
+            OutlineImporter(session, mindmap.id, root.id, str(user.id),
+                            top_prefix="k", batch_size=8, max_nodes=2).add(items)
+    finally:
+        session.rollback()
+        session.close()
+
+
+def test_export_round_trips_through_every_format():
+    session = SessionLocal()
+    try:
+        user = User(id=uuid.uuid4(), username=f"export-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                    hashed_password="x")
+        session.add(user)
+        session.flush()
+
+        mindmap = MindMap(name="Export <Mindmap>", owner_id=user.id)
+        session.add(mindmap)
+        session.flush()
+
+        def add(title, parent=None, order_key="i", deleted=False):
+            node = Node(mindmap_id=mindmap.id, title=title, created_by=user.id, order_key=order_key,
+                        parent_id=parent.id if parent else None, content=f"about {title} & more")
+            if deleted:
+                node.deleted_at = func.now()
+            session.add(node)
+            session.flush()
+            return node
+
+        root = add("root")
+        b = add("B", root, order_key="k")
+        a = add("A", root, order_key="j")
+        add("A2", a, order_key="j")
+        add("A1", a, order_key="i")
+        gone = add("gone", b, deleted=True)
+        add("under gone", gone)
+        add("B1", b, order_key="i")
+
+        expected = [("root", None), ("A", "root"), ("A1", "A"), ("A2", "A"), ("B", "root"), ("B1", "B")]
+
+        for fmt, (writer, _, _) in WRITERS.items():
+            rows = session.execute(outline_rows_query(mindmap.id))
+            document = "".join(writer(rows, mindmap.name))
+            assert _parse(fmt, document) == expected, fmt
+    finally:
+        session.rollback()
+        session.close()
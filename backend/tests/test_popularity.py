@@ -0,0 +1,183 @@
+import uuid
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.middleware.auth import get_current_user_id
+from app.models import User, MindMap, Node, Vote
+from app.services import popularity
+
+# Create a test database URL (using SQLite for tests)
+TEST_DATABASE_URL = "sqlite:///./test.db"
+
+# Create engine and session for testing
+engine = create_engine(TEST_DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine)
+
+# Create tables
+from app.core.database import Base
+Base.metadata.create_all(bind=engine)
+
+
+def test_popular_nodes_come_from_the_ranking(monkeypatch, override_db, fake_redis):
+    monkeypatch.setattr(popularity, "redis_client", fake_redis)
+    rebuilds = []
+    rebuild = popularity._rebuild
+    monkeypatch.setattr(popularity, "_rebuild", lambda db, mindmap_id: rebuilds.append(mindmap_id) or rebuild(db, mindmap_id))
+
+    session = SessionLocal()
+    users = [
+        User(id=uuid.uuid4(), username=f"popular-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+             hashed_password="x")
+        for _ in range(3)
+    ]
+    session.add_all(users)
+    session.flush()
+    mindmap = MindMap(name="Popular Mindmap", owner_id=users[0].id)
+    session.add(mindmap)
+    session.flush()
+    root = Node(mindmap_id=mindmap.id, title="root", order_key="a0", created_by=users[0].id)
+    session.add(root)
+    session.flush()
+    a, b, c = (Node(mindmap_id=mindmap.id, parent_id=root.id, title=title, order_key=key, created_by=users[0].id)
+               for title, key in (("a", "a1"), ("b", "a2"), ("c", "a3")))
+    session.add_all([a, b, c])
+    session.flush()
+    session.add_all([Vote(user_id=users[0].id, node_id=a.id), Vote(user_id=users[1].id, node_id=a.id),
+                     Vote(user_id=users[0].id, node_id=b.id)])
+    session.commit()
+    mindmap_id = mindmap.id
+
+    app.dependency_overrides[get_current_user_id] = lambda: str(users[0].id)
+    try:
+        client = TestClient(app)
+
+        def popular(limit):
+            response = client.get(f"/api/mindmaps/{mindmap_id}/popular-nodes?limit={limit}")
+            assert response.status_code == 200
+            return [(node["title"], node["vote_count"]) for node in response.json()["popular_nodes"]]
+
+        assert popular(2) == [("a", 2), ("b", 1)]
+        assert len(rebuilds) == 1
+
+        # Committed votes update the ranking in place
+        session.add_all([Vote(user_id=users[1].id, node_id=b.id), Vote(user_id=users[2].id, node_id=b.id)])
+        session.commit()
+        popularity.record_votes(session, mindmap_id, [b.id])
+        assert popular(2) == [("b", 3), ("a", 2)]
+        assert len(rebuilds) == 1
+
+        # A rebuild that already read a vote is not counted twice by its update
+        session.add(Vote(user_id=users[2].id, node_id=a.id))
+        session.commit()
+        popularity.invalidate_ranking(mindmap_id)
+        assert popular(2) == [("a", 3), ("b", 3)]
+        popularity.record_votes(session, mindmap_id, [a.id])
+        assert popular(2) == [("a", 3), ("b", 3)]
+        assert len(rebuilds) == 2
+
+        # Unvoted nodes fill in when too few have votes
+        assert [title for title, _ in popular(5)] == ["a", "b", "root", "c"]
+
+        # Deleting a node drops the ranking; it is rebuilt without the node
+        assert client.delete(f"/api/nodes/{b.id}").status_code == 200
+        assert popular(2) == [("a", 3), ("root", 0)]
+        assert len(rebuilds) == 3
+
+        summary = client.get(f"/api/mindmaps/{mindmap_id}/votes/summary")
+        assert summary.status_code == 200
+        assert {node["node_title"]: node["vote_count"] for node in summary.json()["nodes"]} == {
+            "root": 0, "a": 3, "c": 0
+        }
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+
+
+def test_votes_racing_with_the_ranking_are_not_lost(monkeypatch, fake_redis):
+    monkeypatch.setattr(popularity, "redis_client", fake_redis)
+    session, other = SessionLocal(), SessionLocal()
+    users = [
+        User(id=uuid.uuid4(), username=f"racing-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+             hashed_password="x")
+        for _ in range(3)
+    ]
+    session.add_all(users)
+    session.flush()
+    mindmap = MindMap(name="Racing Mindmap", owner_id=users[0].id)
+    session.add(mindmap)
+    session.flush()
+    root = Node(mindmap_id=mindmap.id, title="root", created_by=users[0].id)
+    session.add(root)
+    session.flush()
+    session.add(Vote(user_id=users[0].id, node_id=root.id))
+    session.commit()
+    mindmap_id, root_id = mindmap.id, root.id
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if "count(votes.user_id)" in statement and not statements:
+            statements.append(statement)
+            # Another process lands its write while this one's counts are in flight
+            fake_redis.zadd(popularity._key(mindmap_id), {str(root_id): 1})
+
+    try:
+        # A vote commits while a rebuild is reading the counts, before there is a ranking to update
+        reads = []
+        counts_from_db = popularity._counts_from_db
+
+        def racing_read(db, read_mindmap_id, limit=None):
+            counts = counts_from_db(db, read_mindmap_id, limit)
+            if not reads:
+                other.add(Vote(user_id=users[1].id, node_id=root_id))
+                other.commit()
+                popularity.record_votes(other, mindmap_id, [root_id])
+            reads.append(counts)
+            return counts
+
+        monkeypatch.setattr(popularity, "_counts_from_db", racing_read)
+        # The rebuild starts over instead of writing counts without the vote
+        assert popularity.top_voted(session, mindmap_id, 5) == [(root_id, 2)]
+        assert len(reads) == 2
+
+        # A vote whose counts are overtaken by another write reads them again
+        other.add(Vote(user_id=users[2].id, node_id=root_id))
+        other.commit()
+        event.listen(engine, "before_cursor_execute", record)
+        popularity.record_votes(session, mindmap_id, [root_id])
+        assert len(statements) == 1
+        assert popularity.top_voted(session, mindmap_id, 5) == [(root_id, 3)]
+    finally:
+        if event.contains(engine, "before_cursor_execute", record):
+            event.remove(engine, "before_cursor_execute", record)
+        other.close()
+        session.close()
+
+
+def test_ranking_falls_back_to_the_database(monkeypatch):
+    class Unreachable:
+        def __getattr__(self, name):
+            raise ConnectionError("redis down")
+
+    monkeypatch.setattr(popularity, "redis_client", Unreachable())
+    session = SessionLocal()
+    user = User(id=uuid.uuid4(), username=f"popular-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                hashed_password="x")
+    session.add(user)
+    session.flush()
+    mindmap = MindMap(name="Unranked Mindmap", owner_id=user.id)
+    session.add(mindmap)
+    session.flush()
+    root = Node(mindmap_id=mindmap.id, title="root", created_by=user.id)
+    session.add(root)
+    session.flush()
+    session.add(Vote(user_id=user.id, node_id=root.id))
+    session.commit()
+    try:
+        assert popularity.top_voted(session, mindmap.id, 5) == [(root.id, 1)]
+        # Updates are best effort
+        popularity.record_votes(session, mindmap.id, [root.id])
+        popularity.invalidate_ranking(mindmap.id)
+    finally:
+        session.close()
@@ -0,0 +1,401 @@
+import asyncio
+import json
+import time
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.websockets import WebSocketDisconnect
+from app.main import app
+from app.core.config import settings
+from app.models import User, MindMap, Node, Collaborator
+from app.routers import realtime as realtime_router
+from app.services import access_cache, drag, presence, realtime
+from app.services.snapshots import changes_since, record_change
+from app.services.versions import bump_version
+
+# Create a test database URL (using SQLite for tests)
+TEST_DATABASE_URL = "sqlite:///./test.db"
+
+# Create engine and session for testing
+engine = create_engine(TEST_DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine)
+
+# Create tables
+from app.core.database import Base
+Base.metadata.create_all(bind=engine)
+
+
+class FakeRedisPublisher:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, message):
+        origin, _, data = message.partition(" ")
+        self.published.append((channel, json.loads(data)))
+
+
+class DownRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("redis is down")
+        return fail
+
+
+def _token(user_id, ttl=60):
+    return jwt.encode(
+        {"sub": str(user_id), "aud": "authenticated", "exp": int(time.time()) + ttl},
+        settings.SUPABASE_JWT_SECRET,
+        algorithm="HS256",
+    )
+
+
+def _mindmap(session):
+    user = User(id=uuid.uuid4(), username=f"ws-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                hashed_password="x")
+    session.add(user)
+    session.flush()
+    mindmap = MindMap(name="Realtime Mindmap", owner_id=user.id)
+    session.add(mindmap)
+    session.flush()
+    root = Node(mindmap_id=mindmap.id, title="root", created_by=user.id)
+    session.add(root)
+    session.commit()
+    return user, mindmap, root
+
+
+def test_events_are_published_once_per_commit(monkeypatch):
+    fake = FakeRedisPublisher()
+    monkeypatch.setattr(realtime, "redis_client", fake)
+
+    session = SessionLocal()
+    try:
+        user, mindmap, root = _mindmap(session)
+        mindmap_id, root_id = mindmap.id, root.id
+
+        record_change(session, mindmap_id, [root_id])
+        record_change(session, mindmap_id, voted_node_ids=[root_id], layout=True)
+        session.commit()
+
+        assert len(fake.published) == 1
+        channel, message = fake.published[0]
+        assert channel == realtime.channel_for(mindmap_id)
+        assert message["kinds"] == ["layout", "node", "vote"]
+        assert message["node_ids"] == [root_id]
+        assert message["version"] == session.get(MindMap, mindmap_id).version
+
+        # Nothing leaks out of a rolled back transaction
+        record_change(session, mindmap_id, [root_id])
+        session.rollback()
+        session.commit()
+        assert len(fake.published) == 1
+    finally:
+        session.close()
+
+
+def test_commits_leave_publishing_to_the_background(monkeypatch):
+    fake = FakeRedisPublisher()
+    monkeypatch.setattr(realtime, "redis_client", fake)
+
+    session = SessionLocal()
+    try:
+        user, mindmap, root = _mindmap(session)
+        mindmap_id, root_id = mindmap.id, root.id
+
+        async def scenario():
+            publisher = asyncio.create_task(realtime.run_event_publisher())
+            await asyncio.sleep(0)
+            try:
+                # The commit only queues the event, even on the event loop
+                record_change(session, mindmap_id, [root_id])
+                session.commit()
+                assert fake.published == []
+                for _ in range(100):
+                    if fake.published:
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                publisher.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await publisher
+
+        asyncio.run(scenario())
+        assert [message["node_ids"] for _, message in fake.published] == [[root_id]]
+        assert realtime._publisher is None
+    finally:
+        session.close()
+
+
+def test_socket_receives_changes_without_redis(monkeypatch):
+    # With Redis down, events still reach this process's sockets
+    monkeypatch.setattr(realtime, "redis_client", DownRedis())
+    monkeypatch.setattr(access_cache, "redis_client", DownRedis())
+    monkeypatch.setattr(presence, "redis_client", DownRedis())
+    monkeypatch.setattr(realtime_router, "SessionLocal", SessionLocal)
+
+    session = SessionLocal()
+    try:
+        user, mindmap, root = _mindmap(session)
+        mindmap_id, root_id = mindmap.id, root.id
+        client = TestClient(app)
+
+        with pytest.raises(WebSocketDisconnect) as exc:
+            with client.websocket_connect(f"/ws/mindmaps/{mindmap_id}?token=not-a-jwt") as websocket:
+                websocket.receive_json()
+        assert exc.value.code == 4401
+
+        with pytest.raises(WebSocketDisconnect) as exc:
+            with client.websocket_connect(f"/ws/mindmaps/{mindmap_id}?token={_token(uuid.uuid4())}") as websocket:
+                websocket.receive_json()
+        assert exc.value.code == 4403
+
+        with client.websocket_connect(f"/ws/mindmaps/{mindmap_id}?token={_token(user.id)}") as websocket:
+            hello = websocket.receive_json()
+            assert hello["type"] == "hello"
+            assert websocket.receive_json()["type"] == "presence"
+
+            record_change(session, mindmap_id, [root_id])
+            session.commit()
+
+            change = websocket.receive_json()
+            assert change["type"] == "change"
+            assert change["version"] == hello["version"] + 1
+            assert change["node_ids"] == [root_id]
+
+            websocket.send_text("ping")
+            assert websocket.receive_json() == {"type": "pong"}
+    finally:
+        session.close()
+
+
+def test_drag_positions_are_coalesced_and_persisted(monkeypatch):
+    fake = FakeRedisPublisher()
+    monkeypatch.setattr(realtime, "redis_client", fake)
+    monkeypatch.setattr(drag, "SessionLocal", SessionLocal)
+    buffer = drag.DragBuffer()
+    monkeypatch.setattr(drag, "buffer", buffer)
+
+    session = SessionLocal()
+    try:
+        user, mindmap, root = _mindmap(session)
+        mindmap_id, root_id = mindmap.id, root.id
+        child = Node(mindmap_id=mindmap_id, title="child", parent_id=root_id, created_by=user.id)
+        session.add(child)
+        session.commit()
+        child_id = child.id
+        since = session.get(MindMap, mindmap_id).version
+
+        buffer.add(mindmap_id, drag.parse_positions([[root_id, 1, 2], [child_id, 3, 4]]))
+        buffer.add(mindmap_id, drag.parse_positions([[root_id, 5, 6]]))
+        # Unknown ids (or another map's) are neither relayed nor written
+        buffer.add(mindmap_id, drag.parse_positions([[child_id + 1000, 0, 0]]))
+
+        asyncio.run(drag.broadcast_pending())
+        channel, moved = fake.published[-1]
+        assert moved["type"] == "move"
+        assert sorted(moved["positions"]) == sorted([[root_id, 5.0, 6.0], [child_id, 3.0, 4.0]])
+        assert buffer.take_broadcast() == {}
+
+        # Written while the drag goes on, but not logged: no version bump, no change event
+        asyncio.run(drag._persist_pending(idle_seconds=60))
+        assert buffer.take_persist() == {}
+        session.expire_all()
+        assert (session.get(Node, root_id).x_position, session.get(Node, root_id).y_position) == (5.0, 6.0)
+        assert (session.get(Node, child_id).x_position, session.get(Node, child_id).y_position) == (3.0, 4.0)
+        assert session.get(MindMap, mindmap_id).version == since
+        assert all(message["type"] == "move" for _, message in fake.published)
+
+        # Once the drag has settled: one version bump and one event for all of it
+        asyncio.run(drag._persist_pending(idle_seconds=0))
+        asyncio.run(drag._persist_pending(idle_seconds=0))
+        session.expire_all()
+        assert session.get(MindMap, mindmap_id).version == since + 1
+        assert [message["kinds"] for _, message in fake.published if message["type"] == "change"] == [["move"]]
+
+        delta = changes_since(session, mindmap_id, since)
+        assert delta["nodes"] == []
+        assert sorted(p["id"] for p in delta["positions"]) == [root_id, child_id]
+    finally:
+        session.close()
+
+
+def test_parse_positions_rejects_malformed_payloads():
+    for raw in (None, {"1": [0, 0]}, [[1, 2]], [["1", 2, 3]], [[1, float("nan"), 3]], [[True, 1, 2]]):
+        with pytest.raises(ValueError):
+            drag.parse_positions(raw)
+    with pytest.raises(ValueError):
+        drag.parse_positions([[1, 0, 0]] * (settings.DRAG_MAX_POSITIONS + 1))
+
+
+def test_socket_move_messages_fill_the_drag_buffer(monkeypatch):
+    monkeypatch.setattr(access_cache, "redis_client", DownRedis())
+    monkeypatch.setattr(presence, "redis_client", DownRedis())
+    monkeypatch.setattr(realtime_router, "SessionLocal", SessionLocal)
+    buffer = drag.DragBuffer()
+    monkeypatch.setattr(realtime_router, "buffer", buffer)
+
+    session = SessionLocal()
+    try:
+        user, mindmap, root = _mindmap(session)
+        mindmap_id, root_id = mindmap.id, root.id
+        client = TestClient(app)
+
+        with client.websocket_connect(f"/ws/mindmaps/{mindmap_id}?token={_token(user.id)}") as websocket:
+            websocket.receive_json()
+            websocket.receive_json()
+
+            websocket.send_text(json.dumps({"type": "move", "positions": [[root_id, "x", 0]]}))
+            assert websocket.receive_json()["type"] == "error"
+
+            websocket.send_text(json.dumps({"type": "move", "positions": [[root_id, 10, 20]]}))
+            websocket.send_text("ping")
+            assert websocket.receive_json() == {"type": "pong"}
+
+        assert buffer.take_persist() == {mindmap_id: {root_id: (10.0, 20.0)}}
+    finally:
+        session.close()
+
+
+def test_presence_deltas_carry_only_what_changed():
+    registry = presence.PresenceRegistry()
+    registry.join(1, "a", "user-a")
+    registry.join(1, "b", "user-b")
+    assert registry.take_deltas() == {1: ([
+        {"session": "a", "user_id": "user-a", "node_id": None, "cursor": None},
+        {"session": "b", "user_id": "user-b", "node_id": None, "cursor": None},
+    ], [])}
+
+    # Many updates between two flushes make one delta, with the changed fields only
+    for x in range(100):
+        registry.update(1, "a", 7, [float(x), 0.0])
+    registry.update(1, "b", None, None)
+    assert registry.take_deltas() == {1: ([{"session": "a", "node_id": 7, "cursor": [99.0, 0.0]}], [])}
+
+    registry.update(1, "a", 7, [1.0, 2.0])
+    registry.leave(1, "b")
+    assert registry.take_deltas() == {1: ([{"session": "a", "cursor": [1.0, 2.0]}], ["b"])}
+    assert registry.take_deltas() == {}
+
+    # The last local session leaving forgets the map
+    registry.leave(1, "a")
+    assert 1 not in registry.maps
+    assert registry.take_deltas() == {1: ([], ["a"])}
+
+
+def test_presence_of_other_processes_expires():
+    registry = presence.PresenceRegistry()
+    remote = {"session": "r", "user_id": "user-r", "node_id": 3, "cursor": None}
+    registry.join(1, "a", "user-a", [remote])
+    registry.take_deltas()
+
+    assert registry.apply_remote(1, [{"session": "r", "node_id": 4}], []) == []
+    assert {"session": "r", "user_id": "user-r", "node_id": 4, "cursor": None} in registry.sessions(1)
+    # Other processes cannot overwrite this process's sessions
+    registry.apply_remote(1, [{"session": "a", "node_id": 9}], [])
+    assert {"session": "a", "user_id": "user-a", "node_id": None, "cursor": None} in registry.sessions(1)
+
+    # A heartbeat brings back sessions whose first delta was missed
+    missed = {"session": "m", "user_id": "user-m", "node_id": None, "cursor": [1.0, 1.0]}
+    assert registry.apply_remote(1, [missed], []) == [missed]
+
+    assert registry.sweep(max_age=60) == {}
+    assert registry.sweep(max_age=-1) == {1: ["m", "r"]}
+    assert [item["session"] for item in registry.sessions(1)] == ["a"]
+
+
+def test_socket_presence(monkeypatch):
+    monkeypatch.setattr(access_cache, "redis_client", DownRedis())
+    monkeypatch.setattr(presence, "redis_client", DownRedis())
+    monkeypatch.setattr(realtime_router, "SessionLocal", SessionLocal)
+
+    session = SessionLocal()
+    try:
+        user, mindmap, root = _mindmap(session)
+        mindmap_id, root_id = mindmap.id, root.id
+        client = TestClient(app)
+
+        with client.websocket_connect(f"/ws/mindmaps/{mindmap_id}?token={_token(user.id)}") as first:
+            first_session = first.receive_json()["session"]
+            first.receive_json()
+
+            with client.websocket_connect(f"/ws/mindmaps/{mindmap_id}?token={_token(user.id)}") as second:
+                hello = second.receive_json()
+                assert hello["session"] != first_session
+                snapshot = second.receive_json()
+                assert snapshot["type"] == "presence"
+                assert [item["session"] for item in snapshot["updated"]] == [first_session]
+
+                second.send_text(json.dumps({"type": "presence", "node_id": root_id, "cursor": [1, 2]}))
+                second.send_text(json.dumps({"type": "presence", "cursor": "here"}))
+                assert second.receive_json() == {"type": "error", "detail": "cursor must be [x, y] or null"}
+
+                entry = presence.registry.maps[mindmap_id][hello["session"]]
+                assert (entry["node_id"], entry["cursor"]) == (root_id, [1.0, 2.0])
+
+            assert hello["session"] not in presence.registry.maps[mindmap_id]
+        assert mindmap_id not in presence.registry.maps
+    finally:
+        presence.registry.take_deltas()
+        session.close()
+
+
+def test_socket_is_closed_when_access_is_lost(monkeypatch):
+    monkeypatch.setattr(realtime, "redis_client", DownRedis())
+    monkeypatch.setattr(access_cache, "redis_client", DownRedis())
+    monkeypatch.setattr(presence, "redis_client", DownRedis())
+    monkeypatch.setattr(realtime_router, "SessionLocal", SessionLocal)
+
+    session = SessionLocal()
+    try:
+        owner, mindmap, root = _mindmap(session)
+        mindmap_id = mindmap.id
+        member = User(id=uuid.uuid4(), username=f"ws-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                      hashed_password="x")
+        session.add(member)
+        session.flush()
+        collaboration = Collaborator(mindmap_id=mindmap_id, user_id=member.id, role="editor", status="accepted")
+        session.add(collaboration)
+        session.commit()
+        client = TestClient(app)
+
+        with client.websocket_connect(f"/ws/mindmaps/{mindmap_id}?token={_token(member.id)}") as websocket:
+            websocket.receive_json()
+            websocket.receive_json()
+
+            # A role change is picked up: moves are refused once demoted
+            collaboration.role = "viewer"
+            bump_version(session, mindmap_id, ["collaborators"])
+            session.commit()
+            assert websocket.receive_json()["kinds"] == ["collaborators"]
+            for _ in range(100):
+                websocket.send_text(json.dumps({"type": "move", "positions": [[root.id, 1, 2]]}))
+                websocket.send_text("ping")
+                replies = [websocket.receive_json()]
+                while replies[-1] != {"type": "pong"}:
+                    replies.append(websocket.receive_json())
+                if {"type": "error", "detail": "Editor access required"} in replies:
+                    break
+                time.sleep(0.01)
+            else:
+                pytest.fail("role change not applied")
+
+            # Removal closes the socket
+            session.delete(collaboration)
+            bump_version(session, mindmap_id, ["collaborators"])
+            session.commit()
+            assert websocket.receive_json()["kinds"] == ["collaborators"]
+            with pytest.raises(WebSocketDisconnect) as exc:
+                websocket.receive_json()
+            assert exc.value.code == 4403
+
+        # Expired tokens close the socket too
+        with client.websocket_connect(f"/ws/mindmaps/{mindmap_id}?token={_token(owner.id, ttl=1)}") as websocket:
+            websocket.receive_json()
+            websocket.receive_json()
+            with pytest.raises(WebSocketDisconnect) as exc:
+                websocket.receive_json()
+            assert exc.value.code == 4401
+    finally:
+        session.close()
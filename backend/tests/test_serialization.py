@@ -0,0 +1,83 @@
+import json
+import uuid
+import pytest
+from datetime import datetime, timezone
+from typing import List
+from pydantic import TypeAdapter
+from app.schemas.mindmap import MindMapResponse, NodeResponse
+from app.utils.serialization import FastJSONResponse, MsgpackResponse, columnar_mindmap
+
+
+def _node(node_id, created_at, parent_id=None, voters=()):
+    return {
+        "id": node_id,
+        "title": f"Node {node_id} – \"quoted\"",
+        "content": None if node_id % 2 else "notes",
+        "x_position": 100.0,
+        "y_position": -12.75,
+        "parent_id": parent_id,
+        "mindmap_id": 1,
+        "order_key": "i0",
+        "is_ai_generated": bool(node_id % 2),
+        "vote_count": len(voters),
+        "user_votes": list(voters),
+        "created_at": created_at,
+    }
+
+
+def test_fast_path_matches_pydantic_output():
+    # Snapshots hand back aware UTC datetimes, SQLite rows naive ones
+    nodes = [
+        _node(1, datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)),
+        _node(2, datetime(2024, 5, 1, 12, 30, 0, 123456), parent_id=1, voters=[uuid.uuid4(), uuid.uuid4()]),
+    ]
+    mindmap = {
+        "id": 1,
+        "title": "Serialization",
+        "nodes": nodes,
+        "owner_id": uuid.uuid4(),
+        "total_collaborators": 2,
+        "created_at": datetime(2024, 4, 30, tzinfo=timezone.utc),
+        "version": 3,
+    }
+
+    fast = FastJSONResponse(None)
+    expected_mindmap = MindMapResponse(**mindmap).model_dump_json()
+    expected_nodes = TypeAdapter(List[NodeResponse]).dump_json([NodeResponse(**node) for node in nodes])
+
+    # Same document (key order aside): datetimes and UUIDs compare as their exact strings
+    assert json.loads(fast.render(mindmap)) == json.loads(expected_mindmap)
+    assert json.loads(fast.render(nodes)) == json.loads(expected_nodes)
+
+
+def test_columnar_msgpack_holds_the_same_nodes():
+    msgpack = pytest.importorskip("msgpack")
+    voters = [uuid.uuid4(), uuid.uuid4()]
+    nodes = [
+        _node(1, datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc), voters=voters[:1]),
+        _node(2, datetime(2024, 5, 1, 12, 30, 0, 123456), parent_id=1, voters=voters[::-1]),
+    ]
+    mindmap = {
+        "id": 1,
+        "title": "Columns",
+        "nodes": nodes,
+        "owner_id": uuid.uuid4(),
+        "total_collaborators": 2,
+        "created_at": datetime(2024, 4, 30, tzinfo=timezone.utc),
+        "version": 3,
+    }
+
+    document = msgpack.unpackb(MsgpackResponse(None).render(columnar_mindmap(mindmap)))
+    columns = document["nodes"]
+    assert document["owner_id"] == str(mindmap["owner_id"])
+    assert columns["count"] == 2
+    # Each voter id is sent once
+    assert columns["users"] == [str(voters[0]), str(voters[1])]
+    assert columns["user_votes"] == [[0], [1, 0]]
+    assert columns["parent_id"] == [None, 1]
+    assert columns["created_at"][1] - columns["created_at"][0] == 123456
+
+    expected = json.loads(FastJSONResponse(None).render(nodes))
+    for i, node in enumerate(expected):
+        for name in ("id", "title", "content", "x_position", "y_position", "order_key", "is_ai_generated", "vote_count"):
+            assert columns[name][i] == node[name]
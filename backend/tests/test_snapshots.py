@@ -0,0 +1,216 @@
+import uuid
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import sessionmaker
+from app.models import User, MindMap, Node, Vote, MindMapChange, MindMapSnapshot
+from app.services.snapshots import (
+    encode_snapshot, decode_snapshot, load_mindmap_nodes, load_nodes_from_tables,
+    record_change, compact_pending, compact_snapshot, changes_since, parse_node_fields
+)
+
+# Create a test database URL (using SQLite for tests)
+TEST_DATABASE_URL = "sqlite:///./test.db"
+
+# Create engine and session for testing
+engine = create_engine(TEST_DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine)
+
+# Create tables
+from app.core.database import Base
+Base.metadata.create_all(bind=engine)
+
+
+def _strip_times(nodes):
+    return [{k: v for k, v in node.items() if k != "created_at"} for node in nodes]
+
+
+def test_snapshot_plus_delta_matches_the_tables():
+    session = SessionLocal()
+    try:
+        user = User(id=uuid.uuid4(), username=f"snap-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                    hashed_password="x")
+        session.add(user)
+        session.flush()
+
+        mindmap = MindMap(name="Snapshot Mindmap", owner_id=user.id)
+        session.add(mindmap)
+        session.flush()
+
+        def add(title, parent=None, content=None):
+            node = Node(mindmap_id=mindmap.id, title=title, content=content, created_by=user.id,
+                        parent_id=parent.id if parent else None)
+            session.add(node)
+            session.flush()
+            return node
+
+        root = add("root")
+        a = add("a", root, content="ünïcode")
+        add("a1", a)
+        b = add("b", root)
+        session.add(Vote(user_id=user.id, node_id=a.id))
+        session.commit()
+
+        # First read builds the snapshot from the tables
+        first = load_mindmap_nodes(session, mindmap.id)
+        assert session.get(MindMapSnapshot, mindmap.id) is not None
+        assert [n["title"] for n in first] == ["root", "a", "a1", "b"]
+        assert first[1]["user_votes"] == [user.id]
+
+        decoded = decode_snapshot(encode_snapshot(first), mindmap.id)
+        assert _strip_times(decoded) == _strip_times(first)
+        assert decoded[0]["created_at"] is not None
+
+        # Changes after the snapshot are replayed on top of it
+        b1 = add("b1", b)
+        a.title = "a (renamed)"
+        session.add(Vote(user_id=user.id, node_id=b.id))
+        record_change(session, mindmap.id, [b1.id, a.id, b.id])
+        session.commit()
+
+        # Tombstoning a hides a1 too, although a1 itself is not in the log
+        a.deleted_at = func.now()
+        record_change(session, mindmap.id, [a.id])
+        session.query(Node).filter(Node.id == b1.id).update({Node.x_position: 42.0})
+        record_change(session, mindmap.id, layout=True)
+        session.commit()
+
+        replayed = load_mindmap_nodes(session, mindmap.id)
+        assert _strip_times(replayed) == _strip_times(load_nodes_from_tables(session, mindmap.id))
+        titles = {n["title"] for n in replayed}
+        assert "a1" not in titles and "b1" in titles
+        assert next(n for n in replayed if n["id"] == b.id)["vote_count"] == 1
+        assert next(n for n in replayed if n["id"] == b1.id)["x_position"] == 42.0
+
+        # Compaction folds the log into a new snapshot
+        assert compact_pending(session, min_changes=1, limit=10, mindmap_id=mindmap.id) == 1
+        assert session.query(MindMapChange).filter(MindMapChange.mindmap_id == mindmap.id).count() == 0
+        assert _strip_times(load_mindmap_nodes(session, mindmap.id)) == _strip_times(replayed)
+    finally:
+        session.rollback()
+        session.close()
+
+
+def test_changes_since_returns_the_delta_or_asks_for_a_reload():
+    session = SessionLocal()
+    try:
+        user = User(id=uuid.uuid4(), username=f"delta-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                    hashed_password="x")
+        session.add(user)
+        session.flush()
+
+        mindmap = MindMap(name="Delta Mindmap", owner_id=user.id)
+        session.add(mindmap)
+        session.flush()
+
+        def add(title, parent=None):
+            node = Node(mindmap_id=mindmap.id, title=title, created_by=user.id,
+                        parent_id=parent.id if parent else None)
+            session.add(node)
+            session.flush()
+            return node
+
+        root = add("root")
+        a = add("a", root)
+        a1 = add("a1", a)
+        b = add("b", root)
+        record_change(session, mindmap.id, [root.id, a.id, a1.id, b.id])
+        session.commit()
+        synced = session.get(MindMap, mindmap.id).version
+        assert changes_since(session, mindmap.id, synced)["nodes"] == []
+
+        c = add("c", b)
+        record_change(session, mindmap.id, [c.id])
+        session.add(Vote(user_id=user.id, node_id=b.id))
+        record_change(session, mindmap.id, voted_node_ids=[b.id])
+        a.deleted_at = func.now()
+        record_change(session, mindmap.id, [a.id], layout=True)
+        session.commit()
+
+        delta = changes_since(session, mindmap.id, synced)
+        assert delta["version"] == synced + 3 and not delta["full_reload"]
+        assert [n["title"] for n in delta["nodes"]] == ["c"]
+        assert delta["deleted_node_ids"] == [a.id]
+        assert delta["votes"] == [{"node_id": b.id, "vote_count": 1, "user_votes": [user.id]}]
+        assert {p["id"] for p in delta["positions"]} == {root.id, b.id, c.id}
+
+        # Collaborator-style bumps carry no changes
+        assert changes_since(session, mindmap.id, delta["version"])["nodes"] == []
+
+        # Once compacted, older versions can only reload; newer ones still get deltas
+        compact_snapshot(session, mindmap.id)
+        assert changes_since(session, mindmap.id, synced)["full_reload"]
+        b.title = "b (renamed)"
+        record_change(session, mindmap.id, [b.id])
+        session.commit()
+        delta = changes_since(session, mindmap.id, delta["version"])
+        assert not delta["full_reload"]
+        assert [n["title"] for n in delta["nodes"]] == ["b (renamed)"]
+        assert changes_since(session, mindmap.id, delta["version"] + 1)["full_reload"]
+    finally:
+        session.rollback()
+        session.close()
+
+
+def test_sparse_fieldsets_skip_unselected_columns():
+    with pytest.raises(HTTPException) as exc:
+        parse_node_fields("title,secret")
+    assert exc.value.status_code == 400
+    fields = parse_node_fields("vote_count, title ,x_position")
+    assert fields == ("id", "title", "x_position", "vote_count")
+
+    session = SessionLocal()
+    try:
+        user = User(id=uuid.uuid4(), username=f"sparse-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                    hashed_password="x")
+        session.add(user)
+        session.flush()
+        mindmap = MindMap(name="Sparse Mindmap", owner_id=user.id)
+        session.add(mindmap)
+        session.flush()
+        root = Node(mindmap_id=mindmap.id, title="root", content="long notes", created_by=user.id)
+        session.add(root)
+        session.flush()
+        child = Node(mindmap_id=mindmap.id, title="child", content="more notes", parent_id=root.id,
+                     created_by=user.id)
+        session.add(child)
+        session.flush()
+        session.add(Vote(node_id=child.id, user_id=user.id))
+        session.commit()
+        mindmap_id, root_id, child_id = mindmap.id, root.id, child.id
+
+        statements = []
+
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        expected = [
+            {"id": root_id, "title": "root", "x_position": 0.0, "vote_count": 0},
+            {"id": child_id, "title": "child", "x_position": 0.0, "vote_count": 1},
+        ]
+
+        # From the tables (no snapshot yet), then from the snapshot plus a touched node
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            assert load_mindmap_nodes(session, mindmap_id, fields) == expected
+            assert session.get(MindMapSnapshot, mindmap_id) is None
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+        node_selects = [sql for sql in statements if "FROM nodes" in sql and "nodes.title" in sql]
+        assert node_selects and not any("nodes.content" in sql for sql in node_selects)
+        assert not any("votes.user_id" in sql for sql in statements)
+
+        load_mindmap_nodes(session, mindmap_id)
+        assert session.get(MindMapSnapshot, mindmap_id) is not None
+        record_change(session, mindmap_id, [child_id])
+        session.commit()
+
+        statements.clear()
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            assert load_mindmap_nodes(session, mindmap_id, fields) == expected
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+        assert not any("nodes.content" in sql for sql in statements)
+    finally:
+        session.close()
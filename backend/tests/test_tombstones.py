@@ -0,0 +1,94 @@
+import uuid
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from app.models.user import User
+from app.models.mindmap import MindMap
+from app.models.node import Node
+from app.utils.tombstones import live_node_ids, get_live_node
+from app.services import garbage_collector
+from app.services.garbage_collector import collect_garbage
+
+# Create a test database URL (using SQLite for tests)
+TEST_DATABASE_URL = "sqlite:///./test.db"
+
+# Create engine and session for testing
+engine = create_engine(TEST_DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine)
+
+# Create tables
+from app.core.database import Base
+Base.metadata.create_all(bind=engine)
+
+
+def _build_mindmap(session):
+    """root -> a -> a1, a2 ; root -> b"""
+    user = User(id=uuid.uuid4(), username=f"gc-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                hashed_password="x")
+    session.add(user)
+    session.flush()
+
+    mindmap = MindMap(name="GC Mindmap", owner_id=user.id)
+    session.add(mindmap)
+    session.flush()
+
+    def add(title, parent=None):
+        node = Node(mindmap_id=mindmap.id, title=title, created_by=user.id,
+                    parent_id=parent.id if parent else None)
+        session.add(node)
+        session.flush()
+        return node
+
+    root = add("root")
+    a = add("a", root)
+    a1 = add("a1", a)
+    a2 = add("a2", a)
+    b = add("b", root)
+    session.commit()
+    return user, mindmap, {"root": root, "a": a, "a1": a1, "a2": a2, "b": b}
+
+
+def _live_titles(session, mindmap_id):
+    nodes = session.query(Node).filter(Node.id.in_(live_node_ids(mindmap_id))).all()
+    return sorted(node.title for node in nodes)
+
+
+def test_tombstoned_subtree_is_hidden_and_purged(monkeypatch):
+    session = SessionLocal()
+    delete_nodes = garbage_collector._delete_nodes
+
+    try:
+        user, mindmap, nodes = _build_mindmap(session)
+        mindmap_id = mindmap.id
+        ids = {title: node.id for title, node in nodes.items()}
+        assert _live_titles(session, mindmap_id) == ["a", "a1", "a2", "b", "root"]
+
+        nodes["a"].deleted_at = func.now()
+        session.commit()
+
+        # The tombstone hides the node and its descendants immediately
+        assert _live_titles(session, mindmap_id) == ["b", "root"]
+        assert get_live_node(session, nodes["a1"].id) is None
+        assert get_live_node(session, nodes["b"].id) is not None
+
+        # Purging goes deepest first, one bounded batch per transaction, and only
+        # touches this map (test.db is shared with other tests)
+        batches = []
+        monkeypatch.setattr(garbage_collector, "_delete_nodes",
+                            lambda db, node_ids: (batches.append(sorted(node_ids)), delete_nodes(db, node_ids)))
+        assert collect_garbage(session, batch_size=2, mindmap_id=mindmap_id) == 3
+        assert batches == [sorted([ids["a1"], ids["a2"]]), [ids["a"]]]
+        remaining = {n.title for n in session.query(Node).filter(Node.mindmap_id == mindmap_id)}
+        assert remaining == {"root", "b"}
+        assert collect_garbage(session, batch_size=2, mindmap_id=mindmap_id) == 0
+
+        # Tombstoned mindmaps are emptied batch by batch, then removed
+        mindmap.deleted_at = func.now()
+        session.commit()
+        assert collect_garbage(session, batch_size=1, mindmap_id=mindmap_id) == 3
+        assert session.query(MindMap).filter(MindMap.id == mindmap_id).count() == 0
+        assert session.query(Node).filter(Node.mindmap_id == mindmap_id).count() == 0
+
+        session.delete(user)
+        session.commit()
+    finally:
+        session.close()
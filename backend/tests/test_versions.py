@@ -0,0 +1,169 @@
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.middleware.auth import get_current_user_id
+from app.models import User, MindMap, Node
+from app.models.snapshot import MindMapChange
+from app.services.snapshots import record_change
+
+# Create a test database URL (using SQLite for tests)
+TEST_DATABASE_URL = "sqlite:///./test.db"
+
+# Create engine and session for testing
+engine = create_engine(TEST_DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine)
+
+# Create tables
+from app.core.database import Base
+Base.metadata.create_all(bind=engine)
+
+
+def test_gets_answer_304_until_the_map_changes(override_db):
+    session = SessionLocal()
+    user = User(id=uuid.uuid4(), username=f"etag-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                hashed_password="x")
+    session.add(user)
+    session.flush()
+    mindmap = MindMap(name="ETag Mindmap", owner_id=user.id)
+    session.add(mindmap)
+    session.flush()
+    root = Node(mindmap_id=mindmap.id, title="root", created_by=user.id)
+    session.add(root)
+    session.commit()
+    mindmap_id, root_id = mindmap.id, root.id
+
+    app.dependency_overrides[get_current_user_id] = lambda: str(user.id)
+    try:
+        client = TestClient(app)
+        for path in (f"/api/mindmaps/{mindmap_id}", f"/api/mindmaps/{mindmap_id}/nodes"):
+            first = client.get(path)
+            assert first.status_code == 200
+            etag = first.headers["etag"]
+
+            cached = client.get(path, headers={"If-None-Match": etag})
+            assert cached.status_code == 304
+            assert cached.headers["etag"] == etag
+            assert cached.content == b""
+
+            # Any logged node/vote write bumps the version
+            record_change(session, mindmap_id, [root_id])
+            session.commit()
+
+            fresh = client.get(path, headers={"If-None-Match": etag})
+            assert fresh.status_code == 200
+            assert fresh.headers["etag"] != etag
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+
+
+def test_creating_a_node_is_one_version(override_db):
+    session = SessionLocal()
+    user = User(id=uuid.uuid4(), username=f"etag-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                hashed_password="x")
+    session.add(user)
+    session.flush()
+    mindmap = MindMap(name="Create Mindmap", owner_id=user.id)
+    session.add(mindmap)
+    session.flush()
+    root = Node(mindmap_id=mindmap.id, title="root", created_by=user.id)
+    session.add(root)
+    session.commit()
+    mindmap_id, root_id = mindmap.id, root.id
+
+    app.dependency_overrides[get_current_user_id] = lambda: str(user.id)
+    try:
+        response = TestClient(app).post(f"/api/mindmaps/{mindmap_id}/nodes", json={
+            "title": "child", "parent_id": root_id,
+        })
+        assert response.status_code == 201
+        # Already laid out when the version becomes visible
+        assert (response.json()["x_position"], response.json()["y_position"]) != (0.0, 0.0)
+
+        session.expire_all()
+        assert session.get(MindMap, mindmap_id).version == 1
+        changes = session.query(MindMapChange).filter(MindMapChange.mindmap_id == mindmap_id).all()
+        assert {change.version for change in changes} == {1}
+        assert [change.kind for change in changes].count("layout") == 1
+        assert [change.node_id for change in changes if change.kind == "node"] == [response.json()["id"]]
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+
+
+def test_msgpack_is_negotiated_with_its_own_etag(override_db):
+    msgpack = pytest.importorskip("msgpack")
+    session = SessionLocal()
+    user = User(id=uuid.uuid4(), username=f"etag-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                hashed_password="x")
+    session.add(user)
+    session.flush()
+    mindmap = MindMap(name="Msgpack Mindmap", owner_id=user.id)
+    session.add(mindmap)
+    session.flush()
+    root = Node(mindmap_id=mindmap.id, title="root", created_by=user.id)
+    session.add(root)
+    session.commit()
+    mindmap_id, root_id = mindmap.id, root.id
+
+    app.dependency_overrides[get_current_user_id] = lambda: str(user.id)
+    try:
+        client = TestClient(app)
+        for path in (f"/api/mindmaps/{mindmap_id}", f"/api/mindmaps/{mindmap_id}/nodes"):
+            as_json = client.get(path)
+            packed = client.get(path, headers={"Accept": "application/msgpack"})
+            assert packed.status_code == 200
+            assert packed.headers["content-type"] == "application/msgpack"
+            assert packed.headers["vary"] == "Accept"
+            assert packed.headers["etag"] != as_json.headers["etag"]
+
+            document = msgpack.unpackb(packed.content)
+            columns = document["nodes"] if "nodes" in document else document
+            assert columns["id"] == [root_id]
+
+            # A JSON ETag does not validate the MessagePack representation
+            stale = client.get(path, headers={"Accept": "application/msgpack", "If-None-Match": as_json.headers["etag"]})
+            assert stale.status_code == 200
+            cached = client.get(path, headers={"Accept": "application/msgpack", "If-None-Match": packed.headers["etag"]})
+            assert cached.status_code == 304
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+
+
+def test_sparse_reads_and_bulk_content(override_db):
+    session = SessionLocal()
+    user = User(id=uuid.uuid4(), username=f"sparse-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                hashed_password="x")
+    session.add(user)
+    session.flush()
+    mindmap = MindMap(name="Sparse Mindmap", owner_id=user.id)
+    other = MindMap(name="Other Mindmap", owner_id=user.id)
+    session.add_all([mindmap, other])
+    session.flush()
+    root = Node(mindmap_id=mindmap.id, title="root", content="notes", created_by=user.id)
+    foreign = Node(mindmap_id=other.id, title="root", content="elsewhere", created_by=user.id)
+    session.add_all([root, foreign])
+    session.commit()
+    mindmap_id, root_id, foreign_id = mindmap.id, root.id, foreign.id
+
+    app.dependency_overrides[get_current_user_id] = lambda: str(user.id)
+    try:
+        client = TestClient(app)
+        full = client.get(f"/api/mindmaps/{mindmap_id}/nodes")
+        sparse = client.get(f"/api/mindmaps/{mindmap_id}/nodes?fields=title,parent_id")
+        assert sparse.json() == [{"id": root_id, "parent_id": None, "title": "root"}]
+        assert sparse.headers["etag"] != full.headers["etag"]
+        assert client.get(f"/api/mindmaps/{mindmap_id}?fields=title").json()["nodes"] == [
+            {"id": root_id, "title": "root"}
+        ]
+        assert client.get(f"/api/mindmaps/{mindmap_id}/nodes?fields=nope").status_code == 400
+
+        content = client.get(f"/api/mindmaps/{mindmap_id}/nodes/content?ids={root_id}&ids={foreign_id}")
+        assert content.json() == [{"id": root_id, "content": "notes"}]
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
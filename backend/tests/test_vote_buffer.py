@@ -0,0 +1,89 @@
+import uuid
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.core.config import settings
+from app.middleware.auth import get_current_user_id
+from app.models import User, MindMap, Node, Vote
+from app.services import mindmap_cache, vote_buffer
+
+# Create a test database URL (using SQLite for tests)
+TEST_DATABASE_URL = "sqlite:///./test.db"
+
+# Create engine and session for testing
+engine = create_engine(TEST_DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine)
+
+# Create tables
+from app.core.database import Base
+Base.metadata.create_all(bind=engine)
+
+
+def test_buffered_votes_are_read_before_and_written_after_the_flush(monkeypatch, override_db, fake_redis):
+    monkeypatch.setattr(vote_buffer, "redis_client", fake_redis)
+    monkeypatch.setattr(settings, "VOTE_WRITE_BEHIND", True)
+    mindmap_cache.clear_local()
+
+    session = SessionLocal()
+    user = User(id=uuid.uuid4(), username=f"buffer-{uuid.uuid4()}", email=f"{uuid.uuid4()}@example.com",
+                hashed_password="x")
+    session.add(user)
+    session.flush()
+    mindmap = MindMap(name="Buffered Mindmap", owner_id=user.id)
+    session.add(mindmap)
+    session.flush()
+    root = Node(mindmap_id=mindmap.id, title="root", created_by=user.id)
+    session.add(root)
+    session.commit()
+    mindmap_id, root_id = mindmap.id, root.id
+
+    app.dependency_overrides[get_current_user_id] = lambda: str(user.id)
+    try:
+        client = TestClient(app)
+        # Voting twice is a no-op, not a conflict
+        assert client.post(f"/api/nodes/{root_id}/vote").status_code == 201
+        assert client.post(f"/api/nodes/{root_id}/vote").status_code == 201
+        assert session.query(Vote).filter(Vote.node_id == root_id).count() == 0
+
+        # Reads merge the pending vote, without a version to validate against
+        listed = client.get(f"/api/mindmaps/{mindmap_id}/nodes")
+        assert listed.json()[0]["vote_count"] == 1
+        assert "etag" not in listed.headers
+        assert client.get(f"/api/mindmaps/{mindmap_id}").json()["nodes"][0]["user_votes"] == [str(user.id)]
+        assert [vote["user_id"] for vote in client.get(f"/api/nodes/{root_id}/votes").json()] == [str(user.id)]
+        analytics = client.get(f"/api/mindmaps/{mindmap_id}/vote-analytics").json()
+        assert (analytics["total_votes"], analytics["unique_voters"], analytics["nodes_with_votes"]) == (1, 1, 1)
+
+        version = session.get(MindMap, mindmap_id).version
+        assert vote_buffer.flush_votes(session, mindmap_id) == 1
+        session.expire_all()
+        assert session.query(Vote).filter(Vote.node_id == root_id).count() == 1
+        assert session.get(MindMap, mindmap_id).version == version + 1
+        assert vote_buffer.pending_voters(session, mindmap_id) == {}
+        assert str(mindmap_id) not in fake_redis.smembers(vote_buffer.MAPS_KEY)
+        assert "etag" in client.get(f"/api/mindmaps/{mindmap_id}/nodes").headers
+
+        # Unvotes are buffered the same way
+        assert client.delete(f"/api/nodes/{root_id}/vote").status_code == 200
+        assert client.get(f"/api/nodes/{root_id}").json()["vote_count"] == 0
+        analytics = client.get(f"/api/mindmaps/{mindmap_id}/vote-analytics").json()
+        assert (analytics["total_votes"], analytics["unique_voters"], analytics["nodes_with_votes"]) == (0, 0, 0)
+        assert vote_buffer.flush_votes(session, mindmap_id) == 1
+        session.expire_all()
+        assert session.query(Vote).filter(Vote.node_id == root_id).count() == 0
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+
+
+def test_last_of_vote_and_unvote_wins(monkeypatch, fake_redis):
+    monkeypatch.setattr(vote_buffer, "redis_client", fake_redis)
+    monkeypatch.setattr(settings, "VOTE_WRITE_BEHIND", True)
+    user_id = uuid.uuid4()
+
+    assert vote_buffer.buffer_vote(1, 10, user_id, voted=True)
+    assert vote_buffer.buffer_vote(1, 10, user_id, voted=False)
+    assert vote_buffer._pending_state(1) == {(10, user_id): False}
+    assert vote_buffer.buffer_vote(1, 10, user_id, voted=True)
+    assert vote_buffer._pending_state(1) == {(10, user_id): True}
@@ -19,7 +19,7 @@ export function AISuggestionsPanel({
 }: AISuggestionsPanelProps) {
   const nodesByMindmapId = useMindmapStore((state) => state.nodesByMindmapId);
   const selectedNodeId = useMindmapStore((state) => state.selectedNodeId);
-  const createNode = useMindmapStore((state) => state.createNode);
+  const createNodesBatch = useMindmapStore((state) => state.createNodesBatch);
 
   const nodes = nodesByMindmapId[mindmapId] ?? [];
   const selectedNode = nodes.find((n) => n.id === selectedNodeId) ?? null;
@@ -74,14 +74,15 @@ export function AISuggestionsPanel({
         setSubmitting(true);
 
         try {
-            for (const s of chosen) {
-                await createNode({
-                    mindmapId,
+            await createNodesBatch({
+                mindmapId,
+                parent_id: selectedNode.id,
+                nodes: chosen.map((s) => ({
                     title: s.title,
                     content: s.content ?? "",
-                    parent_id: selectedNode.id,
-                });
-            }
+                    is_ai_generated: true,
+                })),
+            });
             onClose();
         } catch (err) {
         // error is handled in store
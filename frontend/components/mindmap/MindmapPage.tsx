@@ -1,13 +1,13 @@
 "use client";
 
-import { useEffect, useState, useCallback } from "react";
+import { useEffect, useState, useCallback, useRef } from "react";
 import { useMindmapStore } from "@/lib/store";
 import { MindmapCanvas } from "./MindmapCanvas";
 import { NodeSidePanel } from "./NodeSidePanel";
 import { MindmapHeader } from "./MindmapHeader";
 import { CollaboratorsPanel } from "./CollaboratorsPanel";
 import { AISuggestionsPanel } from "./AISuggestionsPanel";
-import { supabase } from "@/lib/supabase";
+import { connectMindmapSocket, MindmapSocket } from "@/lib/realtime";
 import { cn } from "@/lib/utils";
 
 type MindmapPageProps = {
@@ -20,6 +20,11 @@ export function MindmapPage({ mindmapId }: MindmapPageProps) {
     const createNode = useMindmapStore((state) => state.createNode);
     const setSelectedNodeId = useMindmapStore((state) => state.setSelectedNodeId);
     const error = useMindmapStore((state) => state.error);
+    const selectedNodeId = useMindmapStore((state) => state.selectedNodeId);
+    const presence = useMindmapStore((state) => state.presenceByMindmapId[mindmapId]);
+    const socketRef = useRef<MindmapSocket | null>(null);
+    // This tab's own presence session, left out of the viewers shown
+    const sessionRef = useRef<string | null>(null);
 
     const [activePanel, setActivePanel] = useState<SidePanel>("node");
     const [nodesLoading, setNodesLoading] = useState(true);
@@ -48,27 +53,48 @@ export function MindmapPage({ mindmapId }: MindmapPageProps) {
         setNodesLoading(true);
         fetchNodes().catch(() => {});
 
-        const nodesChannel = supabase
-        .channel(`mindmap-${mindmapId}-nodes`)
-        .on(
-            "postgres_changes",
-            {
-            event: "*",
-            schema: "public",
-            table: "nodes",
-            filter: `mindmap_id=eq.${mindmapId}`,
-            },
-            () => {
-            fetchNodes().catch(() => {});
+        // The initial load and every (re)connect's hello are followed by a delta sync,
+        // so edits made while disconnected are picked up too
+        const socket = connectMindmapSocket(mindmapId, (message) => {
+            const state = useMindmapStore.getState();
+            if (message.type === "move") {
+                state.applyNodePositions(mindmapId, message.positions);
+                return;
             }
-        )
-        .subscribe();
+            if (message.type === "presence") {
+                const updated = message.updated.filter((item) => item.session !== sessionRef.current);
+                state.applyPresence(mindmapId, updated, message.left);
+                return;
+            }
+            if (message.type === "hello") {
+                // New connection: the server follows up with everyone's current presence
+                sessionRef.current = message.session;
+                state.applyPresence(mindmapId, [], [], true);
+                socket.sendPresence(state.selectedNodeId);
+            }
+            if (message.type !== "hello" && message.type !== "change") return;
+            const synced = state.versionByMindmapId[mindmapId];
+            // Still loading, or already up to date
+            if (synced === undefined || message.version <= synced) return;
+            state.syncMindmapNodes(mindmapId).catch(() => {});
+        });
+
+        socketRef.current = socket;
 
         return () => {
-        supabase.removeChannel(nodesChannel);
+        socketRef.current = null;
+        socket.close();
+        useMindmapStore.getState().applyPresence(mindmapId, [], [], true);
         };
     }, [mindmapId]);
 
+    useEffect(() => {
+        socketRef.current?.sendPresence(selectedNodeId);
+    }, [selectedNodeId]);
+
+    const viewers = Object.values(presence ?? {});
+    const viewersOfSelected = viewers.filter((viewer) => viewer.node_id !== null && viewer.node_id === selectedNodeId);
+
     const handleAddChild = async (parentId: number) => {
         try {
         const newId = await createNode({
@@ -138,6 +164,12 @@ export function MindmapPage({ mindmapId }: MindmapPageProps) {
                 </div>
             )}
             <MindmapCanvas mindmapId={mindmapId} onAddChild={handleAddChild} onNodeSelect={handleNodeSelect} />
+            {viewers.length > 0 && (
+                <div className="pointer-events-none absolute bottom-3 left-3 z-10 rounded-full bg-white/90 border border-neutral-200 px-3 py-1 text-xs text-neutral-500 shadow-sm">
+                {viewers.length} other{viewers.length === 1 ? "" : "s"} viewing
+                {viewersOfSelected.length > 0 && ` · ${viewersOfSelected.length} on this node`}
+                </div>
+            )}
             </div>
             <div className="w-80 flex-shrink-0">
             {activePanel === "node" && (
@@ -1,7 +1,7 @@
-import { MindMapListItem, MindMapDetail, NodeResponse, VoteResponse, CollaboratorResponse, InvitationResponse, CollaboratorListResponse, AISuggestionResponse } from "./types";
+import { MindMapListItem, MindMapDetail, MindMapChanges, NodeResponse, NodeContent, NodeBatchItem, BatchOperation, BatchOperationResult, VoteResponse, CollaboratorResponse, InvitationResponse, CollaboratorListResponse, AISuggestionResponse } from "./types";
 import { getAuthToken } from "./supabase";
 
-const API_BASE =
+export const API_BASE =
   process.env.NEXT_PUBLIC_BACKEND_URL?.replace(/\/+$/, "") ||
   "http://localhost:3000";
 
@@ -66,16 +66,47 @@ export const api = {
     });
   },
 
+  cloneMindmap(
+    id: number,
+    payload: { title?: string; include_votes?: boolean } = {}
+  ): Promise<MindMapListItem> {
+    return request<MindMapListItem>(`/api/mindmaps/${id}/clone`, {
+      method: "POST",
+      body: JSON.stringify(payload),
+    });
+  },
+
+  getMindmapChanges(id: number, since: number): Promise<MindMapChanges> {
+    return request<MindMapChanges>(`/api/mindmaps/${id}/changes?since=${since}`);
+  },
+
   getMindmapNodes(mindmapId: number): Promise<NodeResponse[]> {
     return request<NodeResponse[]>(`/api/mindmaps/${mindmapId}/nodes`);
   },
 
+  // Only the given fields of each node (id always included), e.g. what the canvas draws
+  getMindmapNodeFields<K extends keyof NodeResponse>(
+    mindmapId: number,
+    fields: K[]
+  ): Promise<Pick<NodeResponse, K | "id">[]> {
+    const query = encodeURIComponent(fields.join(","));
+    return request<Pick<NodeResponse, K | "id">[]>(`/api/mindmaps/${mindmapId}/nodes?fields=${query}`);
+  },
+
+  // Content of several nodes at once (at most 500), for reads that left it out
+  getNodesContent(mindmapId: number, nodeIds: number[]): Promise<NodeContent[]> {
+    const query = nodeIds.map((id) => `ids=${id}`).join("&");
+    return request<NodeContent[]>(`/api/mindmaps/${mindmapId}/nodes/content?${query}`);
+  },
+
   createNode(input: {
     mindmapId: number;
     title: string;
     content?: string;
     parent_id: number;
-  }): Promise<{ id: number; mindmap_id: number; x_position: number; y_position: number; order_index: number; created_at: string }> {
+    after_id?: number;
+    before_id?: number;
+  }): Promise<{ id: number; mindmap_id: number; x_position: number; y_position: number; order_key: string; created_at: string }> {
     const { mindmapId, ...body } = input;
     return request(`/api/mindmaps/${mindmapId}/nodes`, {
       method: "POST",
@@ -83,13 +114,35 @@ export const api = {
     });
   },
 
-  updateNode(id: number, payload: Partial<Pick<NodeResponse, "title" | "content" | "x_position" | "y_position" | "parent_id" | "order_index">>): Promise<NodeResponse> {
+  createNodesBatch(input: {
+    mindmapId: number;
+    parent_id: number;
+    nodes: NodeBatchItem[];
+  }): Promise<NodeResponse[]> {
+    const { mindmapId, ...body } = input;
+    return request<NodeResponse[]>(`/api/mindmaps/${mindmapId}/nodes:batch`, {
+      method: "POST",
+      body: JSON.stringify(body),
+    });
+  },
+
+  updateNode(id: number, payload: Partial<Pick<NodeResponse, "title" | "content" | "x_position" | "y_position" | "parent_id">> & { after_id?: number; before_id?: number }): Promise<NodeResponse> {
     return request<NodeResponse>(`/api/nodes/${id}`, {
       method: "PUT",
       body: JSON.stringify(payload),
     });
   },
 
+  updateNodesBatch(
+    mindmapId: number,
+    updates: Array<{ id: number } & Partial<Pick<NodeResponse, "title" | "content" | "x_position" | "y_position" | "parent_id">> & { after_id?: number; before_id?: number }>
+  ): Promise<NodeResponse[]> {
+    return request<NodeResponse[]>(`/api/mindmaps/${mindmapId}/nodes:batch`, {
+      method: "PUT",
+      body: JSON.stringify({ updates }),
+    });
+  },
+
   deleteNode(id: number): Promise<{ message: string }> {
     return request<{ message: string }>(`/api/nodes/${id}`, {
       method: "DELETE",
@@ -109,6 +162,14 @@ export const api = {
     });
   },
 
+  // Several node / vote writes in one request, applied in order; with atomic, any failure cancels them all
+  batch(operations: BatchOperation[], atomic = false): Promise<BatchOperationResult[]> {
+    return request<{ results: BatchOperationResult[] }>("/api/batch", {
+      method: "POST",
+      body: JSON.stringify({ operations, atomic }),
+    }).then((response) => response.results);
+  },
+
   // Collaborators
   inviteCollaborator(
     mindmapId: number,
@@ -0,0 +1,101 @@
+import { API_BASE } from "./api";
+import { getAuthToken } from "./supabase";
+
+// One connected socket: its selected node and cursor (see backend services/presence.py)
+export type PresenceSession = {
+  session: string;
+  user_id: string;
+  node_id: number | null;
+  cursor: [number, number] | null;
+};
+
+export type MindmapSocketMessage =
+  | { type: "hello"; mindmap_id: number; version: number; session: string }
+  | { type: "change"; mindmap_id: number; version: number; kinds: string[]; node_ids: number[] | null }
+  | { type: "move"; mindmap_id: number; positions: [number, number, number][] }
+  // Deltas: new sessions come whole, known ones with their changed fields only
+  | { type: "presence"; mindmap_id: number; updated: (Partial<PresenceSession> & { session: string })[]; left: string[] }
+  | { type: "error"; detail: string }
+  | { type: "pong" };
+
+export type MindmapSocket = {
+  // Stream node positions while dragging: [[node_id, x, y], ...] (editors only).
+  // The server coalesces them, relays them to other viewers and saves them.
+  sendPositions: (positions: [number, number, number][]) => void;
+  // Report this socket's selected node and cursor; the server throttles what it relays
+  sendPresence: (nodeId: number | null, cursor?: [number, number] | null) => void;
+  close: () => void;
+};
+
+// Refused sockets are closed with 4000 + the HTTP status: don't retry those,
+// except when the token merely expired (reconnecting fetches a fresh one)
+const PERMANENT_CLOSE_CODES = [4401, 4403, 4404];
+const TOKEN_EXPIRED_REASON = "Token expired";
+const PING_INTERVAL_MS = 25_000;
+const MAX_RETRY_MS = 30_000;
+
+// Opens the backend's realtime channel for a mindmap and keeps it open
+// (pings, reconnects with backoff).
+export function connectMindmapSocket(
+  mindmapId: number,
+  onMessage: (message: MindmapSocketMessage) => void
+): MindmapSocket {
+  let socket: WebSocket | null = null;
+  let pingTimer: ReturnType<typeof setInterval> | undefined;
+  let retryTimer: ReturnType<typeof setTimeout> | undefined;
+  let retryMs = 1_000;
+  let closed = false;
+
+  const open = async () => {
+    const token = await getAuthToken();
+    if (closed || !token) return;
+
+    const url = `${API_BASE.replace(/^http/, "ws")}/ws/mindmaps/${mindmapId}?token=${encodeURIComponent(token)}`;
+    socket = new WebSocket(url);
+
+    socket.onopen = () => {
+      retryMs = 1_000;
+      pingTimer = setInterval(() => socket?.send("ping"), PING_INTERVAL_MS);
+    };
+    socket.onmessage = (event) => {
+      try {
+        onMessage(JSON.parse(event.data) as MindmapSocketMessage);
+      } catch {
+        // Ignore malformed frames
+      }
+    };
+    socket.onclose = (event) => {
+      clearInterval(pingTimer);
+      if (closed) return;
+      if (event.code === 4401 && event.reason === TOKEN_EXPIRED_REASON) {
+        open().catch(() => {});
+        return;
+      }
+      if (PERMANENT_CLOSE_CODES.includes(event.code)) return;
+      retryTimer = setTimeout(open, retryMs);
+      retryMs = Math.min(retryMs * 2, MAX_RETRY_MS);
+    };
+  };
+
+  open().catch(() => {});
+
+  return {
+    sendPositions(positions) {
+      // Positions are transient: drop them while (re)connecting
+      if (socket?.readyState === WebSocket.OPEN && positions.length > 0) {
+        socket.send(JSON.stringify({ type: "move", positions }));
+      }
+    },
+    sendPresence(nodeId, cursor = null) {
+      if (socket?.readyState === WebSocket.OPEN) {
+        socket.send(JSON.stringify({ type: "presence", node_id: nodeId, cursor }));
+      }
+    },
+    close() {
+      closed = true;
+      clearInterval(pingTimer);
+      clearTimeout(retryTimer);
+      socket?.close();
+    },
+  };
+}
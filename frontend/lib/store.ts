@@ -3,11 +3,13 @@ import {
   CurrentUser,
   MindMapListItem,
   NodeResponse,
+  NodeBatchItem,
   VoteResponse,
   InvitationResponse,
   CollaboratorListResponse,
 } from "./types";
 import { api } from "./api";
+import type { PresenceSession } from "./realtime";
 
 type MindmapState = {
   // States
@@ -15,6 +17,10 @@ type MindmapState = {
   authReady: boolean;
   mindmaps: MindMapListItem[];
   nodesByMindmapId: Record<number, NodeResponse[]>;
+  // Server version each loaded map was synced to (for delta sync)
+  versionByMindmapId: Record<number, number>;
+  // Other sockets on each open map, by presence session id
+  presenceByMindmapId: Record<number, Record<string, PresenceSession>>;
   selectedNodeId: number | null;
   invitations: InvitationResponse[];
   loading: boolean;
@@ -25,6 +31,14 @@ type MindmapState = {
   setSelectedNodeId: (id: number | null) => void;
   fetchMindmaps: () => Promise<void>;
   fetchMindmapNodes: (mindmapId: number) => Promise<void>;
+  syncMindmapNodes: (mindmapId: number) => Promise<void>;
+  applyNodePositions: (mindmapId: number, positions: [number, number, number][]) => void;
+  applyPresence: (
+    mindmapId: number,
+    updated: (Partial<PresenceSession> & { session: string })[],
+    left: string[],
+    reset?: boolean
+  ) => void;
   createMindmap: (title: string) => Promise<void>;
   deleteMindmap: (id: number) => Promise<void>;
   createNode: (input: {
@@ -33,7 +47,12 @@ type MindmapState = {
     content?: string;
     parent_id: number;
   }) => Promise<number>;
-  updateNode: (id: number, payload: Partial<Pick<NodeResponse, "title" | "content" | "x_position" | "y_position" | "parent_id" | "order_index">>) => Promise<void>;
+  createNodesBatch: (input: {
+    mindmapId: number;
+    parent_id: number;
+    nodes: NodeBatchItem[];
+  }) => Promise<number[]>;
+  updateNode: (id: number, payload: Partial<Pick<NodeResponse, "title" | "content" | "x_position" | "y_position" | "parent_id">> & { after_id?: number; before_id?: number }) => Promise<void>;
   deleteNode: (id: number, mindmapId: number) => Promise<void>;
   toggleVote: (node: NodeResponse) => Promise<void>;
   fetchInvitations: () => Promise<void>;
@@ -48,6 +67,8 @@ export const useMindmapStore = create<MindmapState>((set, get) => ({
   authReady: false,
   mindmaps: [],
   nodesByMindmapId: {},
+  versionByMindmapId: {},
+  presenceByMindmapId: {},
   selectedNodeId: null,
   invitations: [],
   loading: false,
@@ -74,9 +95,12 @@ export const useMindmapStore = create<MindmapState>((set, get) => ({
   async fetchMindmapNodes(mindmapId: number) {
     set({ loading: true, error: null });
     try {
-      const nodes = await api.getMindmapNodes(mindmapId);
+      // The full map also carries its version, the starting point for delta sync
+      const mindmap = await api.getMindmap(mindmapId);
+      const nodes = [...mindmap.nodes].sort((a, b) => a.id - b.id);
       set((state) => ({
         nodesByMindmapId: { ...state.nodesByMindmapId, [mindmapId]: nodes },
+        versionByMindmapId: { ...state.versionByMindmapId, [mindmapId]: mindmap.version },
         loading: false,
       }));
     } catch (err: any) {
@@ -84,6 +108,100 @@ export const useMindmapStore = create<MindmapState>((set, get) => ({
     }
   },
 
+  async syncMindmapNodes(mindmapId: number) {
+    const since = get().versionByMindmapId[mindmapId];
+    if (since === undefined) {
+      return get().fetchMindmapNodes(mindmapId);
+    }
+
+    try {
+      const changes = await api.getMindmapChanges(mindmapId, since);
+      if (changes.full_reload) {
+        return get().fetchMindmapNodes(mindmapId);
+      }
+
+      set((state) => {
+        // A concurrent sync or reload got further already
+        if ((state.versionByMindmapId[mindmapId] ?? -1) >= changes.version) {
+          return {};
+        }
+
+        const byId = new Map<number, NodeResponse>(
+          (state.nodesByMindmapId[mindmapId] ?? []).map((n): [number, NodeResponse] => [n.id, n])
+        );
+        for (const node of changes.nodes) byId.set(node.id, node);
+        for (const vote of changes.votes) {
+          const node = byId.get(vote.node_id);
+          if (node) byId.set(node.id, { ...node, vote_count: vote.vote_count, user_votes: vote.user_votes });
+        }
+        for (const position of changes.positions) {
+          const node = byId.get(position.id);
+          if (node) byId.set(node.id, { ...node, x_position: position.x_position, y_position: position.y_position });
+        }
+
+        // Deleting a node removes its whole subtree
+        const removed = new Set(changes.deleted_node_ids);
+        let grew = removed.size > 0;
+        while (grew) {
+          grew = false;
+          byId.forEach((node) => {
+            if (!removed.has(node.id) && node.parent_id !== null && removed.has(node.parent_id)) {
+              removed.add(node.id);
+              grew = true;
+            }
+          });
+        }
+        removed.forEach((id) => byId.delete(id));
+
+        return {
+          nodesByMindmapId: {
+            ...state.nodesByMindmapId,
+            [mindmapId]: Array.from(byId.values()).sort((a, b) => a.id - b.id),
+          },
+          versionByMindmapId: { ...state.versionByMindmapId, [mindmapId]: changes.version },
+        };
+      });
+    } catch (err: any) {
+      set({ error: err.message ?? "Failed to sync nodes" });
+    }
+  },
+
+  // Live drag positions relayed by the realtime socket (not versioned: saved server side in batches)
+  applyNodePositions(mindmapId: number, positions: [number, number, number][]) {
+    set((state) => {
+      const nodes = state.nodesByMindmapId[mindmapId];
+      if (!nodes) return {};
+      const moved = new Map<number, [number, number]>(
+        positions.map(([id, x, y]): [number, [number, number]] => [id, [x, y]])
+      );
+      return {
+        nodesByMindmapId: {
+          ...state.nodesByMindmapId,
+          [mindmapId]: nodes.map((node) => {
+            const position = moved.get(node.id);
+            return position ? { ...node, x_position: position[0], y_position: position[1] } : node;
+          }),
+        },
+      };
+    });
+  },
+
+  applyPresence(mindmapId, updated, left, reset = false) {
+    set((state) => {
+      const sessions: Record<string, PresenceSession> = reset ? {} : { ...state.presenceByMindmapId[mindmapId] };
+      for (const delta of updated) {
+        const known = sessions[delta.session];
+        if (known) {
+          sessions[delta.session] = { ...known, ...delta };
+        } else if (delta.user_id !== undefined) {
+          sessions[delta.session] = { node_id: null, cursor: null, ...delta } as PresenceSession;
+        }
+      }
+      for (const session of left) delete sessions[session];
+      return { presenceByMindmapId: { ...state.presenceByMindmapId, [mindmapId]: sessions } };
+    });
+  },
+
   async createMindmap(title: string) {
     set({ error: null });
     // Optimistic update: add to UI immediately
@@ -147,8 +265,8 @@ export const useMindmapStore = create<MindmapState>((set, get) => ({
     const existing = state.nodesByMindmapId[mindmapId] ?? [];
     const parent = existing.find((n) => n.id === parent_id) ?? null;
 
-    // Determine which child the new node is gonna be
-    let order_index = existing.filter((n) => n.parent_id === parent_id).length;
+    // The new node is appended: "~" sorts after every backend order key ([0-9a-z])
+    const order_key = "~";
 
     const computeFullLayout = (): Record<number, [number, number]> => {
       // Mirror backend layout constants from backend/app/utils/layout.py
@@ -164,7 +282,7 @@ export const useMindmapStore = create<MindmapState>((set, get) => ({
         content: content ?? "",
         x_position: 0,
         y_position: 0,
-        order_index,
+        order_key,
         is_ai_generated: false,
         vote_count: 0,
         user_votes: [],
@@ -188,7 +306,10 @@ export const useMindmapStore = create<MindmapState>((set, get) => ({
       }
 
       for (const parentId of Object.keys(childrenMap)) {
-        childrenMap[Number(parentId)].sort((a, b) => a.order_index - b.order_index);
+        // Mirror backend sibling order: (order_key, id), compared as plain strings
+        childrenMap[Number(parentId)].sort((a, b) =>
+          a.order_key < b.order_key ? -1 : a.order_key > b.order_key ? 1 : a.id - b.id
+        );
       }
 
       const root = allNodes.find((n) => n.parent_id === null);
@@ -310,7 +431,7 @@ export const useMindmapStore = create<MindmapState>((set, get) => ({
       content: content ?? "",
       x_position,
       y_position,
-      order_index,
+      order_key,
       is_ai_generated: false,
       vote_count: 0,
       user_votes: [],
@@ -357,7 +478,7 @@ export const useMindmapStore = create<MindmapState>((set, get) => ({
                 mindmap_id: created.mindmap_id,
                 x_position: created.x_position,
                 y_position: created.y_position,
-                order_index: created.order_index,
+                order_key: created.order_key,
                 created_at: created.created_at,
               },
             ];
@@ -387,6 +508,32 @@ export const useMindmapStore = create<MindmapState>((set, get) => ({
     }
   },
 
+  // Creates several nodes in one request; the backend runs a single layout pass.
+  // Positions of the other nodes are refreshed from the backend afterwards.
+  async createNodesBatch(input) {
+    const { mindmapId } = input;
+    set({ error: null });
+
+    try {
+      const created = await api.createNodesBatch(input);
+      set((s) => {
+        const list = s.nodesByMindmapId[mindmapId] ?? [];
+        const createdIds = new Set(created.map((n) => n.id));
+        return {
+          nodesByMindmapId: {
+            ...s.nodesByMindmapId,
+            [mindmapId]: [...list.filter((n) => !createdIds.has(n.id)), ...created],
+          },
+        };
+      });
+      await get().fetchMindmapNodes(mindmapId);
+      return created.map((n) => n.id);
+    } catch (err: any) {
+      set({ error: err.message ?? "Failed to create nodes" });
+      throw err;
+    }
+  },
+
   async updateNode(id, payload) {
     set({ error: null });
 
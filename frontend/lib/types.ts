@@ -15,13 +15,49 @@ export type NodeResponse = {
   content: string | null;
   x_position: number;
   y_position: number;
-  order_index: number;
+  order_key: string;
   is_ai_generated: boolean;
   vote_count: number;
   user_votes: string[];
   created_at: string;
 };
 
+export type NodeBatchItem = {
+  title: string;
+  content?: string | null;
+  is_ai_generated?: boolean;
+  children?: NodeBatchItem[];
+};
+
+// One operation of POST /api/batch; *_ref names a node created earlier in the same batch
+export type BatchOperation =
+  | {
+      op: "create_node";
+      mindmap_id: number;
+      title: string;
+      content?: string | null;
+      parent_id?: number;
+      parent_ref?: string;
+      after_id?: number;
+      before_id?: number;
+      ref?: string;
+    }
+  | ({ op: "update_node"; node_id?: number; node_ref?: string } & Partial<
+      Pick<NodeResponse, "title" | "content" | "x_position" | "y_position" | "parent_id">
+    > & { after_id?: number; before_id?: number })
+  | { op: "delete_node" | "vote" | "unvote"; node_id?: number; node_ref?: string };
+
+export type BatchOperationResult = {
+  index: number;
+  op: BatchOperation["op"];
+  status: number;
+  ref: string | null;
+  node: NodeResponse | null;
+  node_id: number | null;
+  vote_count: number | null;
+  error: string | null;
+};
+
 export type CurrentUser = {
   id: string;
   email: string;
@@ -41,6 +77,24 @@ export type MindMapDetail = {
   nodes: NodeResponse[];
   total_collaborators: number;
   created_at: string;
+  version: number;
+};
+
+export type NodeContent = {
+  id: number;
+  content: string | null;
+};
+
+// Delta since a version; full_reload means the whole map must be fetched again
+export type MindMapChanges = {
+  mindmap_id: number;
+  title: string;
+  version: number;
+  full_reload: boolean;
+  nodes: NodeResponse[];
+  deleted_node_ids: number[];
+  votes: { node_id: number; vote_count: number; user_votes: string[] }[];
+  positions: { id: number; x_position: number; y_position: number }[];
 };
 
 export type CollaboratorResponse = {